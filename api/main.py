@@ -5,6 +5,14 @@ Key Components:
 - FastAPI Application: Initializes the FastAPI app with necessary middleware and routes.
 - CORS Middleware: Configures Cross-Origin Resource Sharing (CORS) to allow requests from any origin.
 - API Routing: Includes a router from the `api.controller` module to manage endpoint handlers.
+- RAG Engine: A single `RAGEngine` is created at startup, stored in `app.state` and closed on shutdown.
+  Its heavy dependencies are only imported then, and GCS only outside the local environment.
+- Metrics: `MetricsMiddleware` times every request and adds a Server-Timing header with the pipeline
+  stages, and GET /metrics exposes them to Prometheus with the cache counters of the RAG engine.
+- Index Reload: New index versions are swapped in without a restart, by a background task polling
+  the manifest every `INDEX_RELOAD_INTERVAL` seconds or by `POST /admin/reload`.
+- Request Ids: `RequestIdMiddleware` tags the JSON log records of each request with the id from the
+  `X-Request-ID` header, or a generated one, and echoes it in the response.
 
 Environment Configurations:
 - PORT: The server's port can be defined via the `APP_PORT` environment variable or defaults from `ApiConfig`.
@@ -15,18 +23,38 @@ Execute this script to start the FastAPI application with predefined configurati
 """
 from dotenv import load_dotenv
 load_dotenv()
+import asyncio
+import importlib
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 
-from seed_index.populate_faiss_index import _populate_faiss_index
 from api.router.query import router as query_router
+from api.router.stats import router as stats_router
+from api.router.admin import router as admin_router
+from api.router.metrics import router as metrics_router
+from api.services.index_service import watch_index
+from monitoring.metrics import REGISTRY, register_cache_metrics
+from monitoring.middleware import MetricsMiddleware, RequestIdMiddleware
 from custom_logger import logger
 
 # Import configuration class for API settings
-from configurations.config import ApiConfig
+from configurations.config import ApiConfig, ModelConfig
+
+def _prepare_engine(env: str) -> type:
+    """
+    Populates the index, then imports the RAG engine and returns its class.
+
+    Both run in the same thread, one after the other: building an index imports
+    most of the modules the engine does, and importing them from two threads at
+    once only works as long as neither import graph has a cycle.
+    """
+    from seed_index.populate_faiss_index import _populate_index
+
+    _populate_index(env)
+    return importlib.import_module("model.rag_engine").RAGEngine
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -34,16 +62,37 @@ async def lifespan(app: FastAPI):
     Context manager for application startup and shutdown events.
     Code before 'yield' runs on startup.
     Code after 'yield' runs on shutdown.
+
+    The RAG engine is built once here and shared by every request through
+    `app.state.rag_engine`, so the FAISS index, embedding model and OpenAI
+    client are loaded a single time per process. The modules pulling in
+    FAISS, LangChain, the model runtime and Google Cloud Storage are imported
+    here rather than with this module, so importing the app stays cheap. The
+    index is fetched or built and the model stack imported in one worker
+    thread, off the event loop.
     """
     logger._log("Application lifespan: Startup initiated.")
-    await _populate_faiss_index(os.getenv("env", "local"))
+    env = os.getenv("env", "local")
+    RAGEngine = await asyncio.to_thread(_prepare_engine, env)
+    app.state.rag_engine = RAGEngine()
+    cache_metrics = register_cache_metrics(app.state.rag_engine.stats)
+    index_watcher = None
+    if model_config.INDEX_RELOAD_INTERVAL > 0:
+        index_watcher = asyncio.create_task(
+            watch_index(app.state.rag_engine, env, model_config.INDEX_RELOAD_INTERVAL))
     logger._log(f"FastAPI server is starting on {selected_host}:{selected_port}")
     yield
+    logger._log("Application lifespan: Shutdown initiated.")
+    if index_watcher is not None:
+        index_watcher.cancel()
+    REGISTRY.unregister(cache_metrics)
+    await app.state.rag_engine.aclose()
 
 # Initialize the FastAPI app
 app: FastAPI = FastAPI(lifespan=lifespan)
 # Load configuration settings
 cnf: ApiConfig = ApiConfig()
+model_config: ModelConfig = ModelConfig()
 
 # Set the port and host using environment variables or fallback to config defaults
 selected_port: int = int(os.environ.get("APP_PORT", cnf.PORT))
@@ -59,4 +108,12 @@ app.add_middleware(
 )
 
 # Include router for process handling
-app.include_router(query_router)
\ No newline at end of file
+app.include_router(query_router)
+app.include_router(stats_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
+
+# Time requests and pipeline stages for /metrics and the Server-Timing header
+app.add_middleware(MetricsMiddleware)
+# Tag log records with the id of their request, outermost so every middleware logs with it
+app.add_middleware(RequestIdMiddleware)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+
+class Filters(BaseModel):
+    """
+    Metadata filters restricting the quotes used as context.
+
+    Values of the same field are alternatives, and all given fields must match.
+    Matching ignores case, and unknown fields are rejected.
+    
+    Attributes
+    ----------
+    author : Optional[List[str]]
+        Only use quotes by one of these authors.
+    category : Optional[List[str]]
+        Only use quotes tagged with one of these categories.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+    author: Optional[List[str]] = Field(None, description="Only use quotes by one of these authors")
+    category: Optional[List[str]] = Field(None, description="Only use quotes tagged with one of these categories")
@@ -1,4 +1,6 @@
 from pydantic import BaseModel, Field
+from typing import Optional
+from api.model.filters import Filters
 
 class Input(BaseModel):
     """
@@ -8,5 +10,14 @@ class Input(BaseModel):
     ----------
     query : str
         An issue you want to ask famous people.
+    nprobe : Optional[int]
+        The number of IVF lists to search, for IVF indexes. Higher is more accurate and slower.
+    efSearch : Optional[int]
+        The HNSW search queue size, for HNSW indexes. Higher is more accurate and slower.
+    filters : Optional[Filters]
+        Restricts the retrieved quotes to some authors and categories.
     """
     query: str = Field(..., description="The issue you want to ask famous people")
+    nprobe: Optional[int] = Field(None, ge=1, description="The number of IVF lists to search, for IVF indexes")
+    efSearch: Optional[int] = Field(None, ge=1, description="The HNSW search queue size, for HNSW indexes")
+    filters: Optional[Filters] = Field(None, description="Restricts the retrieved quotes to some authors and categories")
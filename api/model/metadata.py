@@ -8,12 +8,18 @@ class Metadata(BaseModel):
     Attributes
     ----------
     retrievalScores : List[float]
-        The scores of the retrieved documents by similarity.
+        The scores of the retrieved documents, in the order of `retrievedDocuments`. With hybrid
+        search (ModelConfig.HYBRID_SEARCH, the default) they are reciprocal-rank fusion scores of
+        the dense and BM25 rankings, higher is better, at most 2 / (RRF_K + 1), about 0.033. With
+        dense-only search they are squared L2 distances of the embeddings, lower is better.
     embeddingsModel : str
         The model used for generating embeddings and similarity.
     promptUsed : str
         The prompt used to generate the final response.
     """
-    retrievalScores: List[float] = Field(..., description="The scores of the retrieved documents by similarity")
+    retrievalScores: List[float] = Field(..., description="The scores of the retrieved documents, best first: "
+                                                          "reciprocal-rank fusion scores (higher is better) with "
+                                                          "hybrid search, the default, or squared L2 distances "
+                                                          "(lower is better) with dense-only search")
     embeddingsModel: str = Field(..., description="The model used for generating embeddings and similarity")
     promptUsed: str = Field(..., description="The prompt used to generate the final response")
\ No newline at end of file
@@ -0,0 +1,45 @@
+import os
+import traceback
+from fastapi import APIRouter, Depends, HTTPException, Request
+from api.auth import check_key
+from api.services.index_service import refresh_index
+from custom_logger import logger
+from typing import Annotated
+
+router: APIRouter = APIRouter()
+
+@router.post(
+    "/admin/reload",
+    summary="Swap in the latest published version of the index",
+    responses={
+        200: {"description": "Whether a new version was loaded, and the version now served"},
+        500: {"description": "Internal Server Error"}
+    }
+)
+async def reload_index(request: Request,
+                       api_key: Annotated[str, Depends(check_key)],
+                       force: bool = False) -> dict:
+    """
+    Loads the index version named by the manifest next to the current one and swaps it in.
+
+    Requests in flight finish on the previous version, which is closed once
+    they are done. Nothing is reloaded if the version did not change, unless `force` is set.
+
+    Returns
+    -------
+    dict
+        Whether the index was reloaded, and the folder and version now served.
+    """
+    rag_engine = request.app.state.rag_engine
+    try:
+        logger._log("POST /admin/reload", format="info")
+        reloaded = await refresh_index(rag_engine, os.getenv("env", "local"), force)
+    except Exception as e:
+        logger._log(f"Internal Server Error: /admin/reload", format="error")
+        logger._log(str(e), format="error")
+        logger._log(traceback.format_exc(), format="error")
+        raise HTTPException(
+            status_code=500,
+            detail="The index could not be reloaded, the previous version is still served."
+        )
+    return {"reloaded": reloaded, "folder": rag_engine.faiss_index.folder, "version": rag_engine.faiss_index.version}
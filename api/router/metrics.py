@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router: APIRouter = APIRouter()
+
+@router.get(
+    "/metrics",
+    summary="Get the Prometheus metrics of the server",
+    response_class=Response,
+    responses={
+        200: {"description": "Stage and request latency histograms, in-flight requests and cache counters"}
+    }
+)
+async def metrics() -> Response:
+    """
+    Exposes the metrics of the process in the Prometheus text format.
+
+    The endpoint is meant for the scraper on the internal network and needs no API key.
+    
+    Returns
+    -------
+    Response
+        The Prometheus exposition of the default registry.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
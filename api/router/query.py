@@ -1,16 +1,21 @@
+import json
+import time
 import traceback
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from custom_logger import logger
 from api.model.input import Input
 from api.model.output import Output
 from api.services.query_service import QueryService
 from api.auth import check_key
-from typing import Annotated
+from configurations.config import ModelConfig
+from typing import Annotated, Any, AsyncIterator, List
 
 router: APIRouter = APIRouter()
+model_config: ModelConfig = ModelConfig()
 
-async def get_query_service() -> QueryService:
-    return QueryService()
+async def get_query_service(request: Request) -> QueryService:
+    return QueryService(request.app.state.rag_engine)
 
 @router.post(
     "/query",
@@ -40,7 +45,8 @@ async def query(query: Input,
     """
     try:
         logger._log(f"POST /query", format="info")
-        output_object: Output = query_service.get_life_advice(query.query)
+        output_object: Output = await query_service.aget_life_advice(query.query, query.nprobe, query.efSearch,
+                                                                     query.filters)
         return output_object
     except Exception as e:
         logger._log(f"Internal Server Error: /query", format="error")
@@ -49,4 +55,113 @@ async def query(query: Input,
         raise HTTPException(
             status_code=500,
             detail="An unexpected error occurred. Please try again later."
-        )
\ No newline at end of file
+        )
+
+@router.post(
+    "/query/batch",
+    response_model=List[Output],
+    summary="Get life advice for a batch of input queries",
+    responses={
+        200: {"model": List[Output]}, 
+        500: {"description": "Internal Server Error"}, 
+        422: {"description": "Validation Error"}
+    }
+)
+async def query_batch(queries: List[Input],
+                      api_key: Annotated[str, Depends(check_key)], 
+                      query_service: QueryService = Depends(get_query_service)) -> List[Output]:
+    """
+    Gets life advice for a batch of input queries in one request.
+
+    Parameters
+    ----------
+    queries : List[Input]
+        The input queries, at most `MAX_BATCH_SIZE` of them.
+    
+    Returns
+    -------
+    JSONResponse
+        JSON list containing the advice for each query, in order.
+    """
+    if len(queries) > model_config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"A batch can contain at most {model_config.MAX_BATCH_SIZE} queries."
+        )
+    try:
+        logger._log(f"POST /query/batch", format="info")
+        return await query_service.aget_life_advice_batch(queries)
+    except Exception as e:
+        logger._log(f"Internal Server Error: /query/batch", format="error")
+        logger._log(str(e), format="error")
+        logger._log(traceback.format_exc(), format="error")
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred. Please try again later."
+        )
+
+def _sse(event: str, data: Any) -> str:
+    """
+    Formats one Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post(
+    "/query/stream",
+    response_class=StreamingResponse,
+    summary="Stream a life advice based on the input query",
+    responses={
+        200: {"content": {"text/event-stream": {}},
+              "description": "Server-Sent Events: context, token (repeated), then done or error"},
+        422: {"description": "Validation Error"}
+    }
+)
+async def query_stream(query: Input,
+                       request: Request,
+                       api_key: Annotated[str, Depends(check_key)], 
+                       query_service: QueryService = Depends(get_query_service)) -> StreamingResponse:
+    """
+    Streams a life advice based on the input query as Server-Sent Events.
+
+    A `context` event carries the retrieved documents and metadata, `token` events
+    carry the advice as it is generated, and a final `done` event reports the
+    time to first byte and the total time. Generation stops when the client disconnects.
+
+    Parameters
+    ----------
+    query : str
+        This is the input query for which the life advice is to be generated.
+    
+    Returns
+    -------
+    StreamingResponse
+        The `text/event-stream` response.
+    """
+    logger._log(f"POST /query/stream", format="info")
+    started = time.perf_counter()
+
+    async def events() -> AsyncIterator[str]:
+        first_byte = None
+        stream = query_service.astream_life_advice(query.query, query.nprobe, query.efSearch, query.filters)
+        try:
+            async for event, data in stream:
+                if await request.is_disconnected():
+                    logger._log("Client disconnected from /query/stream", format="info")
+                    return
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                    logger._log("/query/stream time to first byte: %.1f ms", first_byte * 1000, format="info",
+                                timeToFirstByteMs=first_byte * 1000)
+                yield _sse(event, data)
+            yield _sse("done", {"timeToFirstByteMs": (first_byte or 0.0) * 1000,
+                                "totalMs": (time.perf_counter() - started) * 1000})
+        except Exception as e:
+            logger._log(f"Internal Server Error: /query/stream", format="error")
+            logger._log(str(e), format="error")
+            logger._log(traceback.format_exc(), format="error")
+            yield _sse("error", {"detail": "An unexpected error occurred. Please try again later."})
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
\ No newline at end of file
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Request
+from api.auth import check_key
+from typing import Annotated
+
+router: APIRouter = APIRouter()
+
+@router.get(
+    "/stats",
+    summary="Get the cache and batching statistics of the RAG engine",
+    responses={
+        200: {"description": "Cache hit rates and embedding batcher histograms"}
+    }
+)
+async def stats(request: Request,
+                api_key: Annotated[str, Depends(check_key)]) -> dict:
+    """
+    Gets the cache and batching statistics of the process-wide RAG engine.
+    
+    Returns
+    -------
+    dict
+        Size, hits, misses and hit rate of the embedding and answer caches, and
+        the batch-size and queue-wait histograms of the embedding batcher.
+    """
+    return request.app.state.rag_engine.stats()
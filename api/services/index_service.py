@@ -0,0 +1,46 @@
+import asyncio
+from typing import TYPE_CHECKING
+from configurations.config import ModelConfig
+from custom_logger import logger
+
+if TYPE_CHECKING:
+    from model.rag_engine import RAGEngine
+
+model_config: ModelConfig = ModelConfig()
+
+async def refresh_index(rag_engine: "RAGEngine", env: str, force: bool = False) -> bool:
+    """
+    Swaps the index of the engine for the latest published version, if it changed.
+
+    Outside the local environment the version is first downloaded from cloud storage.
+
+    Parameters
+    ----------
+    rag_engine : RAGEngine
+        The process-wide RAG engine.
+    env : str
+        The environment, "local" to skip cloud storage.
+    force : bool, optional
+        Whether to reload the index even if its version did not change.
+
+    Returns
+    -------
+    bool
+        Whether a new version was swapped in.
+    """
+    if env != "local":
+        from seed_index.populate_faiss_index import _download_index
+
+        await asyncio.to_thread(_download_index)
+    return await rag_engine.areload_index(force)
+
+async def watch_index(rag_engine: "RAGEngine", env: str, interval: float) -> None:
+    """
+    Checks for a new index version every `interval` seconds until cancelled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_index(rag_engine, env)
+        except Exception as e:
+            logger._log(f"Index reload failed, keeping the current version: {e}", format="error")
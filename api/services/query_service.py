@@ -1,25 +1,68 @@
 
 
-from model.rag_engine import RAGEngine
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+from api.model.filters import Filters
+from api.model.input import Input
 from api.model.output import Output 
 from custom_logger import logger 
 from api.model.output import Output
 
+if TYPE_CHECKING:
+    from model.rag_engine import RAGEngine
+
+def _filters_dict(filters: Optional[Filters]) -> Optional[Dict[str, List[str]]]:
+    """
+    Converts the request filters into the field-to-values mapping used by the RAG engine.
+    """
+    return filters.model_dump(exclude_none=True) if filters is not None else None
+
 class QueryService:
-    def __init__(self):
-        self.rag_engine = RAGEngine()
-        logger._log("QueryService initialized with RAGEngine", format="info")
+    def __init__(self, rag_engine: "RAGEngine"):
+        """
+        Wraps the process-wide RAGEngine created in the application lifespan.
+        """
+        self.rag_engine = rag_engine
 
     def get_life_advice(self, input_query: str) -> Output:
         """
         Executes the RAG pipeline to get life advice.
         This method contains the core business logic.
         """
-        logger._log(f"Executing RAG pipeline for query: '{input_query}'", format="info")
+        logger._log("Executing RAG pipeline for query: '%s'", input_query, format="info")
         
         # Call the RAG engine
         output_data: Output = self.rag_engine.run_rag_pipeline(input_query)
         
         # Validate and return the Output Pydantic model
         # This ensures the service always returns a well-defined structure
-        return output_data
\ No newline at end of file
+        return output_data
+
+    async def aget_life_advice(self, input_query: str,
+                               nprobe: Optional[int] = None,
+                               ef_search: Optional[int] = None,
+                               filters: Optional[Filters] = None) -> Output:
+        """
+        Executes the RAG pipeline without blocking the event loop.
+        """
+        logger._log("Executing RAG pipeline for query: '%s'", input_query, format="info")
+        return await self.rag_engine.arun_rag_pipeline(input_query, nprobe, ef_search, _filters_dict(filters))
+
+    async def aget_life_advice_batch(self, inputs: List[Input]) -> List[Output]:
+        """
+        Executes the RAG pipeline for a batch of queries, returning the outputs in order.
+        """
+        logger._log("Executing batch RAG pipeline for %d queries", len(inputs), format="info")
+        from model.rag_engine import SearchRequest
+
+        return await self.rag_engine.arun_rag_pipeline_batch(
+            [SearchRequest(item.query, item.nprobe, item.efSearch, _filters_dict(item.filters)) for item in inputs])
+
+    def astream_life_advice(self, input_query: str,
+                            nprobe: Optional[int] = None,
+                            ef_search: Optional[int] = None,
+                            filters: Optional[Filters] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streams the RAG pipeline: the retrieved context first, then the advice tokens.
+        """
+        logger._log("Streaming RAG pipeline for query: '%s'", input_query, format="info")
+        return self.rag_engine.astream_rag_pipeline(input_query, nprobe, ef_search, _filters_dict(filters))
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Checks that concurrent queries overlap on the async pipeline instead of serialising.
+
+A fake LLM with a fixed latency replaces OpenAI. With `arun_rag_pipeline` the wall time
+of N concurrent queries should stay close to one LLM latency; with the blocking
+`run_rag_pipeline` it grows to N latencies.
+
+Usage:
+    python -m benchmarks.async_overlap --concurrency 8 --latency 0.5
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fakes import FakeOpenAIModel
+from model import rag_engine
+from model.rag_engine import RAGEngine
+
+QUERIES = [
+    "How do I stay motivated?",
+    "What is the meaning of friendship?",
+    "How can I be happier at work?",
+    "Is failure necessary for success?",
+]
+
+async def run_async(engine: RAGEngine, concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(engine.arun_rag_pipeline(QUERIES[i % len(QUERIES)])
+                           for i in range(concurrency)))
+    return time.perf_counter() - start
+
+async def run_blocking(engine: RAGEngine, concurrency: int) -> float:
+    async def one(query: str) -> None:
+        engine.run_rag_pipeline(query)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(QUERIES[i % len(QUERIES)]) for i in range(concurrency)))
+    return time.perf_counter() - start
+
+async def main(concurrency: int, latency: float) -> None:
+    # Disable the answer cache, which would serve the repeated queries without calling the LLM.
+    rag_engine.model_config.ANSWER_CACHE_SIZE = 0
+    engine = RAGEngine(openai_model=FakeOpenAIModel(latency=latency))
+    # Warm up the embedding model so the first measurement is not skewed.
+    await engine.arun_rag_pipeline(QUERIES[0])
+
+    blocking = await run_blocking(engine, concurrency)
+    overlapped = await run_async(engine, concurrency)
+    engine.close()
+
+    print(f"blocking  : {blocking:.2f} s for {concurrency} queries")
+    print(f"async     : {overlapped:.2f} s for {concurrency} queries")
+    print(f"speed-up  : {blocking / overlapped:.1f}x (ideal {concurrency}x)")
+    if overlapped >= latency * concurrency * 0.5:
+        raise SystemExit("Async queries did not overlap.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent queries")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.latency))
@@ -0,0 +1,93 @@
+"""
+Reports the memory saved and the recall kept by compressed vector storage.
+
+The bundled quotes are indexed into a temporary folder once per index type: exact
+float32 "flat", then float16 and 8-bit scalar-quantised vectors. Queries are the first
+half of sampled quotes. Recall@k is the share of the exact flat top-k found by each
+compressed index, searched on its codes alone and with the shortlist re-scored from
+the memory-mapped full-precision vectors (`RERANK_FACTOR`). Memory is the size of the
+FAISS index, which is what a worker keeps resident; the full-precision file is only
+paged in for the rows of re-ranked candidates. Search is dense only, without BM25.
+
+Usage:
+    python -m benchmarks.compressed_vectors --queries 500 --k 5
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from model import faiss_index
+from model.faiss_index import FAISSIndex
+from seed_index.populate_faiss_index import _document_batches
+
+INDEX_TYPES = ["flat", "sq_fp16", "sq8"]
+
+def _search(index: FAISSIndex, vectors: np.ndarray, k: int) -> tuple:
+    latencies, results = [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        found = index.search(vector[None, :], k)[0]
+        latencies.append(time.perf_counter() - start)
+        results.append({document.id for document, _ in found})
+    return np.percentile(np.asarray(latencies) * 1000, 50), results
+
+def _recall(results: list, exact: list) -> float:
+    return float(np.mean([len(found & truth) / max(1, len(truth)) for found, truth in zip(results, exact)]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--k", type=int, default=5, help="Number of documents retrieved per query")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the sampled queries")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="compressed_vectors_")
+    rerank_factor = faiss_index.model_config.RERANK_FACTOR
+    try:
+        chunks = [chunk for batch in _document_batches() for chunk in batch]
+        rng = random.Random(args.seed)
+        texts = [" ".join(chunk.page_content.split()[:max(3, len(chunk.page_content.split()) // 2)])
+                 for chunk in rng.sample(chunks, args.queries)]
+
+        exact, vectors = None, None
+        print(f"{'index':<8} {'index MB':>9} {'B/vector':>9} {'full MB':>8} | "
+              f"{'recall':>7} {'p50 ms':>7} | {'reranked':>8} {'p50 ms':>7}")
+        for index_type in INDEX_TYPES:
+            folder = os.path.join(root, index_type)
+            faiss_index.model_config.INDEX_PATH = folder
+            faiss_index.model_config.INDEX_TYPE = index_type
+            index = FAISSIndex()
+            index.build_index([chunks], resume=False)
+            index.close()
+
+            index = FAISSIndex()
+            index.load_index(mmap=True)
+            if vectors is None:
+                vectors = np.asarray(index.embedding_model.embedding_model.embed_documents(texts), dtype=np.float32)
+            ntotal = index.vectorstore.index.ntotal
+            index_bytes = os.path.getsize(os.path.join(folder, faiss_index.model_config.INDEX_FILE_NAME))
+            vectors_path = os.path.join(folder, faiss_index.model_config.VECTORS_FILE_NAME)
+            full_bytes = os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0
+
+            faiss_index.model_config.RERANK_FACTOR = 0
+            latency, results = _search(index, vectors, args.k)
+            if exact is None:
+                exact = results
+            line = (f"{index_type:<8} {index_bytes / 1e6:>9.2f} {index_bytes / ntotal:>9.0f} "
+                    f"{full_bytes / 1e6:>8.2f} | {_recall(results, exact):>7.1%} {latency:>7.3f} | ")
+            if index.vectors is not None:
+                faiss_index.model_config.RERANK_FACTOR = rerank_factor
+                latency, results = _search(index, vectors, args.k)
+                line += f"{_recall(results, exact):>8.1%} {latency:>7.3f}"
+            else:
+                line += f"{'-':>8} {'-':>7}"
+            print(line)
+            index.close()
+    finally:
+        faiss_index.model_config.RERANK_FACTOR = rerank_factor
+        shutil.rmtree(root, ignore_errors=True)
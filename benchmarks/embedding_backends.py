@@ -0,0 +1,81 @@
+"""
+Compares the embedding backends on latency, throughput and agreement with PyTorch.
+
+Each backend embeds the same quotes. Single-query latency (p50/p99) is measured
+with `embed_query`, as for a request missing the cache, and batch throughput with
+`embed_documents` in batches of `--batch-size`, as during ingestion. Agreement with
+the PyTorch reference is the cosine similarity of the embeddings of each text and
+the overlap of the top-10 nearest quotes of each query. The script exits with an
+error if the mean cosine of a backend falls below its threshold.
+
+Usage:
+    python -m benchmarks.embedding_backends --texts 2000 --queries 200 --batch-size 64
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from configurations import config
+from model.embedding_model import backend_model_kwargs
+
+model_config = config.ModelConfig()
+
+# (label, backend, int8, minimum mean cosine with the PyTorch embeddings)
+VARIANTS = [("torch", "torch", False, 1.0),
+            ("onnx", "onnx", False, 0.999),
+            ("onnx-int8", "onnx", True, 0.98)]
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int = 10) -> np.ndarray:
+    return np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000, help="Number of quotes embedded in batches")
+    parser.add_argument("--queries", type=int, default=200, help="Number of quotes embedded one by one")
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per embed_documents call")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(model_config.CSV_PATH, nrows=args.texts)[model_config.COLUMN_NAME].dropna().tolist()
+    queries = texts[:args.queries]
+
+    reference = None
+    failed = False
+    print(f"{'backend':<10} {'load s':>7} | {'query p50':>9} {'p99 ms':>7} | {'texts/s':>8} | "
+          f"{'cos mean':>8} {'cos min':>8} {'top10':>6}")
+    for label, backend, int8, min_cosine in VARIANTS:
+        start = time.perf_counter()
+        model = HuggingFaceEmbeddings(model_name=model_config.MODEL_NAME,
+                                      model_kwargs=backend_model_kwargs(backend, int8))
+        model.embed_query("warm up")
+        load = time.perf_counter() - start
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            model.embed_query(query)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vectors = []
+        for i in range(0, len(texts), args.batch_size):
+            vectors.extend(model.embed_documents(texts[i:i + args.batch_size]))
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        if reference is None:
+            reference = vectors
+        cosines = np.sum(vectors * reference, axis=1)
+        overlap = np.mean([len(set(a) & set(b)) / len(a) for a, b in
+                           zip(top_k(vectors[:len(queries)], vectors), top_k(reference[:len(queries)], reference))])
+        p50, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 99])
+        print(f"{label:<10} {load:>7.1f} | {p50:>9.2f} {p99:>7.2f} | {throughput:>8.0f} | "
+              f"{cosines.mean():>8.5f} {cosines.min():>8.5f} {overlap:>6.1%}")
+        if cosines.mean() < min_cosine:
+            print(f"{label}: mean cosine {cosines.mean():.5f} is below {min_cosine}", file=sys.stderr)
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,55 @@
+"""
+Compares the latency of building a RAGEngine per request against sharing one engine.
+
+The per-request path mirrors the old `get_query_service` behaviour: every call loads the
+FAISS index, the embedding model and the OpenAI client before retrieving. The shared path
+builds the engine once, like the application lifespan does, and only retrieves.
+The LLM is never called, so no OpenAI credentials are needed.
+
+Usage:
+    python -m benchmarks.engine_lifecycle --requests 20
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from model.rag_engine import RAGEngine
+
+QUERY = "How can I stay motivated when things get hard?"
+
+def _summarise(name: str, timings: list) -> None:
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<12} mean={statistics.mean(timings) * 1000:9.1f} ms  "
+          f"p50={statistics.median(timings) * 1000:9.1f} ms  p99={p99 * 1000:9.1f} ms")
+
+def per_request(n: int) -> list:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        engine = RAGEngine()
+        engine.retrieve(QUERY)
+        engine.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def shared(n: int) -> list:
+    engine = RAGEngine()
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        engine.retrieve(QUERY)
+        timings.append(time.perf_counter() - start)
+    engine.close()
+    return timings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Number of simulated requests per path")
+    args = parser.parse_args()
+
+    _summarise("per-request", per_request(args.requests))
+    _summarise("shared", shared(args.requests))
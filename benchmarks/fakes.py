@@ -0,0 +1,81 @@
+"""
+Local stand-ins for external services so benchmarks run without network access.
+"""
+import asyncio
+import re
+import time
+import zlib
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD = re.compile(r"\w+")
+
+class FakeOpenAIModel:
+    """
+    Drop-in replacement for OpenAIModel that sleeps instead of calling OpenAI.
+
+    Attributes
+    ----------
+    latency : float
+        Seconds each generation takes.
+    token_delay : float
+        Seconds between two streamed tokens.
+    """
+    def __init__(self, latency: float = 0.5, token_delay: float = 0.02) -> None:
+        self.latency = latency
+        self.token_delay = token_delay
+
+    def _answer(self, query: str) -> str:
+        return f"Fake advice for a prompt of {len(query)} characters."
+
+    def generate_response(self, query: str, functions: list) -> str:
+        time.sleep(self.latency)
+        return self._answer(query)
+
+    async def agenerate_response(self, query: str, functions: list) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(query)
+
+    async def astream_response(self, query: str, functions: list) -> AsyncIterator[str]:
+        for token in self._answer(query).split(" "):
+            await asyncio.sleep(self.token_delay)
+            yield token + " "
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+class DeterministicFakeEmbedding(Embeddings):
+    """
+    Drop-in replacement for HuggingFaceEmbeddings hashing words into a fixed-size vector.
+
+    Each word adds +1 or -1 to one dimension chosen by its CRC32, and vectors are
+    L2-normalised, so the same text always gets the same embedding and texts sharing
+    words are close. No model is downloaded and embedding costs microseconds, which
+    keeps the benchmarks on retrieval and indexing rather than on the model.
+
+    Attributes
+    ----------
+    size : int
+        The number of dimensions, 384 as for all-MiniLM-L6-v2.
+    """
+    def __init__(self, model_name: str = "", model_kwargs: Optional[dict] = None, size: int = 384) -> None:
+        self.size = size
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            code = zlib.crc32(word.encode("utf-8"))
+            vector[code % self.size] += 1.0 if code & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,98 @@
+"""
+Reports filtered search latency as metadata filters get more selective.
+
+Filters on single authors and categories are picked so they match from about half of
+the chunks down to a handful. For each, the bitmap pre-filter applied inside FAISS is
+compared with over-fetching `--overfetch` results and filtering them afterwards, on
+latency (p50/p99) and on the share of queries that still get k results, or every
+matching chunk when fewer match.
+
+Run seed_index first so that faiss_index/ holds the vectors and the metadata index.
+
+Usage:
+    python -m benchmarks.filtered_search --queries 200 --k 5 --overfetch 100
+"""
+import argparse
+import time
+
+import numpy as np
+
+from model.faiss_index import FAISSIndex
+from model.metadata_index import normalise_value
+
+SELECTIVITIES = [0.5, 0.1, 0.01, 0.001, 0.0001]
+
+def pick_filters(index: FAISSIndex) -> list:
+    """
+    Picks, for each target selectivity, the author or category whose share of chunks is closest to it.
+
+    Returns
+    -------
+    list
+        The filters and the number of chunks they match.
+    """
+    sizes = [(len(positions), field, value)
+             for field, values in index.metadata_index.postings.items()
+             for value, positions in values.items()]
+    num_chunks = index.metadata_index.num_chunks
+    picked = {}
+    for selectivity in SELECTIVITIES:
+        size, field, value = min(sizes, key=lambda item: abs(np.log((item[0] + 0.5) / (selectivity * num_chunks))))
+        picked[(field, value)] = ({field: [value]}, size)
+    return list(picked.values())
+
+def post_filter(index: FAISSIndex, vector: np.ndarray, k: int, overfetch: int, filters: dict) -> list:
+    field, values = next(iter(filters.items()))
+    accepted = {normalise_value(value) for value in values}
+    results = []
+    for document, score in index.search(vector, overfetch)[0]:
+        metadata = document.metadata.get(field) or []
+        metadata = [metadata] if isinstance(metadata, str) else metadata
+        if accepted & {normalise_value(value) for value in metadata}:
+            results.append((document, score))
+    return results[:k]
+
+def _timed(func) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def _percentiles(seconds: list) -> str:
+    p50, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 99])
+    return f"{p50:8.3f} {p99:8.3f}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per filter")
+    parser.add_argument("--k", type=int, default=5, help="Number of documents retrieved per query")
+    parser.add_argument("--overfetch", type=int, default=100, help="Results fetched before post-filtering")
+    args = parser.parse_args()
+
+    index = FAISSIndex()
+    index.load_index()
+    if index.metadata_index is None:
+        raise SystemExit("No metadata index found next to the FAISS index, rebuild it with seed_index.")
+    texts = [f"What should I do about problem number {i}?" for i in range(args.queries)]
+    vectors = np.asarray(index.embedding_model.embedding_model.embed_documents(texts), dtype=np.float32)
+
+    print(f"{'filter':<40} {'share':>8} | {'pre p50':>8} {'pre p99':>8} {'full':>5} | "
+          f"{'post p50':>8} {'post p99':>8} {'full':>5}")
+    num_chunks = index.metadata_index.num_chunks
+    for filters, size in [({}, num_chunks)] + pick_filters(index):
+        expected = min(args.k, size)
+        pre_times, post_times, pre_full, post_full = [], [], 0, 0
+        for vector in vectors:
+            vector = vector[None, :]
+            elapsed, results = _timed(lambda: index.search(vector, args.k, filters=filters))
+            pre_times.append(elapsed)
+            pre_full += len(results[0]) == expected
+            if filters:
+                elapsed, results = _timed(lambda: post_filter(index, vector, args.k, args.overfetch, filters))
+                post_times.append(elapsed)
+                post_full += len(results) == expected
+        label = ", ".join(f"{field}={values[0]}" for field, values in filters.items()) or "(none)"
+        post = (f"{_percentiles(post_times)} {post_full / len(vectors):>5.0%}" if filters
+                else f"{'-':>8} {'-':>8} {'-':>5}")
+        pre = f"{_percentiles(pre_times)} {pre_full / len(vectors):>5.0%}"
+        print(f"{label[:40]:<40} {size / num_chunks:>8.2%} | {pre} | {post}")
+    index.close()
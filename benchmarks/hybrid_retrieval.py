@@ -0,0 +1,100 @@
+"""
+Compares the recall of dense and hybrid (dense + BM25) retrieval on rare-word queries.
+
+Each query is made of the rarest words of a sampled chunk of the built index, as when a
+user asks for a quote by a name or a title, and that chunk is the only relevant result.
+Dense recall at a small k is reported next to hybrid recall at the same k and dense
+recall at a large k, with the latency of the lexical step and of the whole search.
+
+Run seed_index first so that faiss_index/ holds the vectors and the BM25 index.
+
+Usage:
+    python -m benchmarks.hybrid_retrieval --queries 500 --terms 3 --k 5 --large-k 50
+"""
+import argparse
+import time
+
+import numpy as np
+
+from model import faiss_index
+from model.bm25_index import tokenize
+from model.faiss_index import FAISSIndex
+
+def _percentiles(seconds: list) -> str:
+    p50, p99 = np.percentile(np.asarray(seconds) * 1000, [50, 99])
+    return f"p50 {p50:7.3f} ms  p99 {p99:7.3f} ms"
+
+def rare_word_queries(index: FAISSIndex, queries: int, terms: int, seed: int) -> tuple:
+    """
+    Samples chunks and builds a query from the `terms` rarest words of each.
+
+    Returns
+    -------
+    tuple
+        The query texts and the document id each of them must retrieve.
+    """
+    bm25 = index.bm25_index
+    document_frequency = np.diff(bm25.matrix.indptr)
+    words = np.empty(len(bm25.vocabulary), dtype=object)
+    for word, row in bm25.vocabulary.items():
+        words[row] = word
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(bm25.matrix.shape[1], size=queries, replace=False)
+    documents = index.document_store.documents_at(positions.tolist())
+    texts, targets = [], []
+    for position in positions:
+        if int(position) not in documents:
+            continue
+        document = documents[int(position)]
+        rows = np.unique([bm25.vocabulary[word] for word in tokenize(document.page_content)])
+        rarest = rows[np.argsort(document_frequency[rows], kind="stable")[:terms]]
+        texts.append(" ".join(words[rarest]))
+        targets.append(document.id)
+    return texts, targets
+
+def recall(results: list, targets: list) -> float:
+    return float(np.mean([any(document.id == target for document, _ in found)
+                          for found, target in zip(results, targets)]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500, help="Number of sampled rare-word queries")
+    parser.add_argument("--terms", type=int, default=3, help="Rare words per query")
+    parser.add_argument("--k", type=int, default=5, help="Number of documents retrieved per query")
+    parser.add_argument("--large-k", type=int, default=50, help="Dense k to match with hybrid search")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the chunk sample")
+    args = parser.parse_args()
+
+    index = FAISSIndex()
+    index.load_index()
+    if index.bm25_index is None:
+        raise SystemExit("No BM25 index found next to the FAISS index, rebuild it with seed_index.")
+    texts, targets = rare_word_queries(index, args.queries, args.terms, args.seed)
+    vectors = np.asarray(index.embedding_model.embedding_model.embed_documents(texts), dtype=np.float32)
+
+    dense, dense_large, hybrid = [], [], []
+    lexical_times, dense_times, hybrid_times = [], [], []
+    for text, vector in zip(texts, vectors):
+        vector = vector[None, :]
+        start = time.perf_counter()
+        dense.append(index.search(vector, args.k)[0])
+        dense_times.append(time.perf_counter() - start)
+        dense_large.append(index.search(vector, args.large_k)[0])
+
+        start = time.perf_counter()
+        index.bm25_index.search(text, faiss_index.model_config.HYBRID_CANDIDATES)
+        lexical_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hybrid.append(index.search(vector, args.k, queries=[text])[0])
+        hybrid_times.append(time.perf_counter() - start)
+
+    print(f"{len(texts)} queries of {args.terms} rare words, "
+          f"{index.bm25_index.matrix.shape[1]} chunks, {len(index.bm25_index.vocabulary)} terms")
+    print(f"dense  recall@{args.k:<4} {recall(dense, targets):.3f}")
+    print(f"dense  recall@{args.large_k:<4} {recall(dense_large, targets):.3f}")
+    print(f"hybrid recall@{args.k:<4} {recall(hybrid, targets):.3f}")
+    print(f"BM25 top-{faiss_index.model_config.HYBRID_CANDIDATES} {_percentiles(lexical_times)}")
+    print(f"dense search   {_percentiles(dense_times)}")
+    print(f"hybrid search  {_percentiles(hybrid_times)}")
+    index.close()
@@ -0,0 +1,52 @@
+"""
+Measures FAISS index startup time and resident memory with and without memory-mapping.
+
+Each mode is loaded in a fresh subprocess so RSS is not shared between measurements.
+The index at ModelConfig.INDEX_PATH must exist; build it first by starting the API or
+running `_populate_faiss_index("local")`.
+
+Usage:
+    python -m benchmarks.index_load --runs 3
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, re, time
+import numpy as np
+from model.faiss_index import FAISSIndex
+
+def rss_mb():
+    status = open("/proc/self/status").read()
+    return int(re.search(r"VmRSS:\\s+(\\d+)", status).group(1)) / 1024
+
+index = FAISSIndex()
+before = rss_mb()
+start = time.perf_counter()
+vectorstore = index.load_index(mmap={mmap})
+elapsed = time.perf_counter() - start
+loaded = rss_mb()
+index.search(np.zeros((1, vectorstore.index.d), dtype=np.float32), 5)
+print(json.dumps({{"load_s": elapsed, "rss_mb": loaded - before, "rss_after_search_mb": rss_mb() - before}}))
+"""
+
+def measure(mmap: bool) -> dict:
+    output = subprocess.run([sys.executable, "-c", _PROBE.format(mmap=mmap)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Number of subprocesses per mode")
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'load ms':>9} {'index RSS MB':>13} {'RSS after search MB':>20}")
+    for mmap in (False, True):
+        runs = [measure(mmap) for _ in range(args.runs)]
+        print(f"{'mmap' if mmap else 'heap':<6} "
+              f"{statistics.median(r['load_s'] for r in runs) * 1000:>9.1f} "
+              f"{statistics.median(r['rss_mb'] for r in runs):>13.1f} "
+              f"{statistics.median(r['rss_after_search_mb'] for r in runs):>20.1f}")
@@ -0,0 +1,125 @@
+"""
+Compares a full index build with an incremental update of a small share of the corpus.
+
+The bundled quotes are indexed from scratch into a temporary folder. Then `--share` of
+them are edited: half are rewritten, which gives them new content-derived ids and
+deletes the old ones, and half get new categories, which keeps their ids. The other
+quotes are upserted unchanged and must be skipped. Reported times include embedding,
+SQLite writes and saving every file. After reloading the index from disk, rewritten
+quotes must be found by their new text and filters, and deleted ones never returned.
+The reloaded index is memory-mapped, as the server loads it by default, so an upsert,
+delete or save on it must be refused before anything is written.
+
+Usage:
+    python -m benchmarks.index_update --share 0.01
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from model import faiss_index
+from model.bm25_index import BM25Index
+from model.document_chunker import DocumentChunker
+from model.document_store import document_id
+from model.faiss_index import FAISSIndex
+from model.metadata_index import MetadataIndex
+from seed_index.populate_faiss_index import _document_batches
+
+def edit_corpus(chunks: list, share: float, seed: int) -> tuple:
+    """
+    Edits a share of the source documents.
+
+    Returns
+    -------
+    tuple
+        The chunks of the edited corpus, the ids of the rewritten documents and their new chunks.
+    """
+    documents = {}
+    for chunk in chunks:
+        documents.setdefault(chunk.metadata["doc_id"], chunk)
+    rng = random.Random(seed)
+    edited = rng.sample(sorted(documents), max(2, int(len(documents) * share)))
+    rewritten, retagged = set(edited[::2]), set(edited[1::2])
+    chunker = DocumentChunker()
+    new_chunks, rewritten_chunks = [], []
+    for chunk in chunks:
+        doc_id = chunk.metadata["doc_id"]
+        if doc_id in retagged:
+            chunk = chunk.model_copy(deep=True)
+            chunk.metadata["category"] = chunk.metadata["category"] + ["benchmark-retagged"]
+        if doc_id not in rewritten:
+            new_chunks.append(chunk)
+    for doc_id in rewritten:
+        source = documents[doc_id]
+        text = f"Benchmark rewrite {doc_id}: {source.page_content}"
+        metadata = {"doc_id": document_id(text), "author": source.metadata["author"],
+                    "category": ["benchmark-rewritten"]}
+        source = source.model_copy(update={"page_content": text, "metadata": metadata})
+        rewritten_chunks.extend(chunker.split_documents([source]))
+    return new_chunks + rewritten_chunks, rewritten, rewritten_chunks
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--share", type=float, default=0.01, help="Share of the documents edited")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the edited sample")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="index_update_")
+    faiss_index.model_config.INDEX_PATH = folder
+    try:
+        chunks = [chunk for batch in _document_batches() for chunk in batch]
+
+        start = time.perf_counter()
+        index = FAISSIndex()
+        index.build_index([chunks], resume=False)
+        BM25Index.build(chunk.page_content for chunk in chunks).save(folder)
+        MetadataIndex.build(chunk.metadata for chunk in chunks).save(folder)
+        index.close()
+        full = time.perf_counter() - start
+
+        edited, rewritten, rewritten_chunks = edit_corpus(chunks, args.share, args.seed)
+        index = FAISSIndex()
+        index.load_index(mmap=False)
+        start = time.perf_counter()
+        added, deleted = index.upsert_documents(edited)
+        deleted += index.delete_documents(rewritten)
+        index.save()
+        update = time.perf_counter() - start
+        index.close()
+
+        print(f"full build      {full:8.2f}s  {len(chunks)} chunks")
+        print(f"update {args.share:>6.1%}   {update:8.2f}s  {added} chunks added, {deleted} deleted "
+              f"({update / full:.1%} of a full build)")
+
+        index = FAISSIndex()
+        index.load_index(mmap=True)
+        texts = [chunk.page_content for chunk in rewritten_chunks]
+        vectors = np.asarray(index.embedding_model.embedding_model.embed_documents(texts), dtype=np.float32)
+        found = index.search(vectors, 5, queries=texts, filters={"category": ["benchmark-rewritten"]})
+        hits = np.mean([any(doc.page_content == text for doc, _ in results) for text, results in zip(texts, found)])
+        stale = sum(doc.metadata["doc_id"] in rewritten
+                    for results in index.search(vectors, 20, queries=texts) for doc, _ in results)
+        print(f"after reload: rewritten chunks found {hits:.0%}, deleted chunks returned {stale}, "
+              f"live vectors {int(index.live.sum()) if index.live is not None else index.vectorstore.index.ntotal}"
+              f"/{index.vectorstore.index.ntotal}")
+
+        ntotal = index.vectorstore.index.ntotal
+        refused = []
+        for name, update_mmap in (("upsert", lambda: index.upsert_documents(rewritten_chunks)),
+                                  ("delete", lambda: index.delete_documents(rewritten)),
+                                  ("save", index.save)):
+            try:
+                update_mmap()
+            except RuntimeError:
+                refused.append(name)
+        print(f"mmap index: refused {', '.join(refused) or 'nothing'}, "
+              f"vectors unchanged {index.vectorstore.index.ntotal == ntotal}")
+        index.close()
+        if len(refused) < 3:
+            raise SystemExit("A memory-mapped index accepted an update.")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
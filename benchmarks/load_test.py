@@ -0,0 +1,199 @@
+"""
+Open-loop load test of POST /query, reporting throughput, latency and errors per arrival rate.
+
+Requests arrive as a Poisson process at each `--rates` value for `--duration` seconds,
+whether or not earlier ones have returned, as real users do; a closed loop would slow
+down with the server and hide its queueing. Latency is measured from the scheduled
+arrival, so time spent waiting for a client connection counts too. Each step reports
+the throughput (answers completed while requests were arriving), p50/p90/p99 latency,
+error rate and whether it met the SLO (`--slo-p99-ms`, `--slo-error-rate`). The table
+over the rates is the saturation curve; the report ends with the highest rate meeting
+the SLO.
+
+With `--spawn` the script starts the mock OpenAI server (benchmarks/mock_openai.py)
+and the API on local ports, with the API pointed at the mock, so the only cost measured
+is the server's own plus the configured LLM latency. Otherwise it targets `--url`.
+Queries are the first half of sampled quotes; they repeat after `--queries`, when the
+answer cache starts serving them.
+
+Usage:
+    python -m benchmarks.load_test --spawn --rates 5 10 20 40 --duration 30 --llm-latency 0.5
+    python -m benchmarks.load_test --url http://localhost:8000 --rates 10 20 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from configurations import config
+
+model_config = config.ModelConfig()
+
+READY_TIMEOUT = 600.0
+
+def _sample_queries(count: int, seed: int) -> List[str]:
+    quotes = pd.read_csv(model_config.CSV_PATH)[model_config.COLUMN_NAME].dropna().tolist()
+    rng = random.Random(seed)
+    return [" ".join(quote.split()[:max(3, len(quote.split()) // 2)])
+            for quote in rng.sample(quotes, min(count, len(quotes)))]
+
+async def _send(client: httpx.AsyncClient, query: str, scheduled: float) -> Tuple[float, float, Optional[str]]:
+    """
+    Posts one query and returns when it finished, its latency from the scheduled arrival and its error, if any.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        response = await client.post("/query", json={"query": query})
+        error = None if response.status_code == 200 else f"http {response.status_code}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    finished = loop.time()
+    return finished, finished - scheduled, error
+
+async def run_step(client: httpx.AsyncClient, queries: List[str], offset: int,
+                   rate: float, duration: float, rng: random.Random) -> dict:
+    """
+    Sends queries at Poisson arrivals of `rate` per second for `duration` seconds and waits for all of them.
+    """
+    loop = asyncio.get_running_loop()
+    tasks = []
+    start = loop.time()
+    at = rng.expovariate(rate)
+    while at < duration:
+        delay = start + at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        query = queries[(offset + len(tasks)) % len(queries)]
+        tasks.append(asyncio.create_task(_send(client, query, start + at)))
+        at += rng.expovariate(rate)
+    outcomes = await asyncio.gather(*tasks)
+
+    latencies = np.asarray([latency for _, latency, error in outcomes if error is None]) * 1000
+    errors = Counter(error for _, _, error in outcomes if error is not None)
+    # Throughput counts the answers completed during the arrivals, so draining the backlog does not inflate it.
+    completed = sum(1 for finished, _, error in outcomes if error is None and finished - start <= duration)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]).tolist() if len(latencies) else (None, None, None)
+    return {"offeredRate": rate, "sent": len(outcomes), "ok": len(latencies),
+            "throughput": completed / duration, "errorRate": sum(errors.values()) / max(1, len(outcomes)),
+            "errors": dict(errors), "p50Ms": p50, "p90Ms": p90, "p99Ms": p99,
+            "maxMs": float(latencies.max()) if len(latencies) else None}
+
+def _meets_slo(step: dict, p99_ms: float, error_rate: float) -> bool:
+    return step["p99Ms"] is not None and step["p99Ms"] <= p99_ms and step["errorRate"] <= error_rate
+
+def _print_step(step: dict) -> None:
+    def ms(value: Optional[float]) -> str:
+        return f"{value:>8.0f}" if value is not None else f"{'-':>8}"
+    bar = "#" * round(20 * min(1.0, step["throughput"] / step["offeredRate"]))
+    print(f"{step['offeredRate']:>8.1f} {step['throughput']:>8.1f} {ms(step['p50Ms'])} {ms(step['p90Ms'])} "
+          f"{ms(step['p99Ms'])} {step['errorRate']:>7.1%} {'yes' if step['slo'] else 'no':>4}  {bar:<20}"
+          + (f"  {step['errors']}" if step["errors"] else ""))
+
+async def run(args: argparse.Namespace, url: str) -> List[dict]:
+    queries = _sample_queries(args.queries, args.seed)
+    rng = random.Random(args.seed)
+    headers = {"X-API-Key": os.getenv("API_AUTH_KEY", "default_secret_key_if_not_set")}
+    # No connection limit: a bounded pool would turn the open loop into a closed one.
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits,
+                                 timeout=args.timeout) as client:
+        for query in queries[:args.warmup]:
+            await _send(client, query, asyncio.get_running_loop().time())
+
+        print(f"{'offered':>8} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'errors':>7} {'slo':>4}  throughput/offered")
+        steps, offset = [], args.warmup
+        for rate in args.rates:
+            step = await run_step(client, queries, offset, rate, args.duration, rng)
+            step["slo"] = _meets_slo(step, args.slo_p99_ms, args.slo_error_rate)
+            offset += step["sent"]
+            steps.append(step)
+            _print_step(step)
+    return steps
+
+def _wait_ready(url: str, processes: List[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if any(process.poll() is not None for process in processes):
+            raise SystemExit("A spawned server exited before becoming ready.")
+        try:
+            if httpx.get(f"{url}/openapi.json", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{url} was not ready after {READY_TIMEOUT:.0f} s.")
+
+def _spawn(args: argparse.Namespace) -> Tuple[str, List[subprocess.Popen]]:
+    """
+    Starts the mock OpenAI server and the API pointed at it, and waits until both answer.
+    """
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    processes = [subprocess.Popen([sys.executable, "-m", "benchmarks.mock_openai", "--port", str(args.mock_port),
+                                   "--latency", str(args.llm_latency), "--jitter", str(args.llm_jitter),
+                                   "--tokens", str(args.llm_tokens),
+                                   "--tokens-per-sec", str(args.llm_tokens_per_sec)])]
+    _wait_ready(mock_url, processes)
+    env = {**os.environ, "env": "local", "OPENAI_BASE_URL": f"{mock_url}/v1",
+           "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "mock")}
+    processes.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1",
+                                       "--port", str(args.api_port), "--workers", str(args.workers),
+                                       "--log-level", "warning"], env=env))
+    _wait_ready(api_url, processes)
+    return api_url, processes
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of a running API")
+    parser.add_argument("--spawn", action="store_true", help="Start the mock OpenAI server and the API")
+    parser.add_argument("--api-port", type=int, default=8090, help="Port of the spawned API")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers of the spawned API")
+    parser.add_argument("--mock-port", type=int, default=8091, help="Port of the spawned mock OpenAI server")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mock seconds before the first token")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Mock relative spread of the latency")
+    parser.add_argument("--llm-tokens", type=int, default=60, help="Mock tokens per answer")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=80.0, help="Mock token rate")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 2, 5, 10, 20, 40],
+                        help="Arrival rates in requests per second, one step each")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals per step")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a request counts as an error")
+    parser.add_argument("--queries", type=int, default=5000, help="Number of distinct queries")
+    parser.add_argument("--warmup", type=int, default=5, help="Sequential requests sent before the first step")
+    parser.add_argument("--slo-p99-ms", type=float, default=2000.0, help="p99 latency objective in ms")
+    parser.add_argument("--slo-error-rate", type=float, default=0.01, help="Error rate objective")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the queries and arrivals")
+    parser.add_argument("--output", help="File the JSON report is written to")
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    try:
+        url = args.url
+        if args.spawn:
+            url, processes = _spawn(args)
+        steps = asyncio.run(run(args, url))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    sustained = [step["offeredRate"] for step in steps if step["slo"]]
+    print(f"SLO p99 <= {args.slo_p99_ms:.0f} ms, errors <= {args.slo_error_rate:.1%}: "
+          + (f"met up to {max(sustained):g} req/s" if sustained else "not met at any rate"))
+    if args.output:
+        report = {"url": url, "durationSec": args.duration,
+                  "slo": {"p99Ms": args.slo_p99_ms, "errorRate": args.slo_error_rate},
+                  "llm": {"latency": args.llm_latency, "jitter": args.llm_jitter, "tokens": args.llm_tokens,
+                          "tokensPerSec": args.llm_tokens_per_sec} if args.spawn else None,
+                  "maxSustainedRate": max(sustained) if sustained else None, "steps": steps}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
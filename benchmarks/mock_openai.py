@@ -0,0 +1,108 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests without network access.
+
+Serves `POST /v1/chat/completions`, regular and streamed, with a configurable time to
+the first token and token rate, so the API under test waits on the LLM as it would in
+production without spending tokens. The answer is `--tokens` words, sent at
+`--tokens-per-sec` after `--latency` seconds; `--jitter` spreads the latency uniformly by
+that fraction. Point the API at it with `OPENAI_BASE_URL=http://<host>:<port>/v1`.
+
+Usage:
+    python -m benchmarks.mock_openai --port 8081 --latency 0.5 --tokens 60 --tokens-per-sec 80
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("Patience", "grows", "from", "small", "steady", "steps", "and", "kind", "choices", "made", "daily")
+
+class MockSettings:
+    """
+    Timing of the mock answers.
+
+    Attributes
+    ----------
+    latency : float
+        Seconds before the first token.
+    jitter : float
+        Fraction by which each latency is spread uniformly around `latency`.
+    tokens : int
+        Number of tokens in each answer.
+    tokens_per_sec : float
+        Rate at which tokens are generated after the first one, 0 for all at once.
+    """
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0,
+                 tokens: int = 60, tokens_per_sec: float = 80.0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens = tokens
+        self.tokens_per_sec = tokens_per_sec
+
+    def first_token_delay(self) -> float:
+        return max(0.0, self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+def create_app(settings: MockSettings) -> FastAPI:
+    """
+    Builds the mock API serving answers timed by `settings`.
+    """
+    app = FastAPI()
+
+    def _chunk(completion_id: str, model: str, delta: dict, finish_reason: Any = None) -> str:
+        return "data: " + json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Any:
+        body = await request.json()
+        model = body.get("model", "mock")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+        words = [WORDS[i % len(WORDS)] for i in range(settings.tokens)]
+
+        if body.get("stream"):
+            async def events() -> AsyncIterator[str]:
+                await asyncio.sleep(settings.first_token_delay())
+                yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for i, word in enumerate(words):
+                    if i:
+                        await asyncio.sleep(settings.token_delay())
+                    yield _chunk(completion_id, model, {"content": word if i == 0 else " " + word})
+                yield _chunk(completion_id, model, {}, "stop")
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(settings.first_token_delay() + settings.token_delay() * max(0, len(words) - 1))
+        return JSONResponse({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": " ".join(words)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)},
+        })
+
+    return app
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8081, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Relative spread of the latency, e.g. 0.2")
+    parser.add_argument("--tokens", type=int, default=60, help="Tokens per answer")
+    parser.add_argument("--tokens-per-sec", type=float, default=80.0, help="Token rate, 0 for all at once")
+    args = parser.parse_args()
+    settings = MockSettings(args.latency, args.jitter, args.tokens, args.tokens_per_sec)
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
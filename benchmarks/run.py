@@ -0,0 +1,282 @@
+"""
+Offline benchmark suite of the indexing, retrieval and prompt-building hot paths.
+
+Runs without network access: embeddings come from DeterministicFakeEmbedding, which
+hashes words into vectors instead of running the model, and generation from
+FakeOpenAIModel with no delay. Each corpus is indexed into a temporary INDEX_PATH:
+the bundled `data/quotes.csv` and synthetic CSVs of 100k and 1M rows, whose quotes
+are random words of the bundled vocabulary with its authors and categories. For each
+corpus and component the suite reports ops/sec, p50/p99 latency in ms and the peak
+RSS reached while the component ran:
+
+- populate: `_populate_faiss_index` building the FAISS, BM25 and metadata indexes, one op per CSV row.
+- get_embedding_miss / get_embedding_hit: `EmbeddingModel.get_embedding` of new and of cached queries.
+- retrieve: `RAGEngine.retrieve`, query embedding included, k=5.
+- truncate_documents: `PromptEngine.truncate_documents` of the top `--pack-k` chunks of a query.
+- rag_pipeline: `RAGEngine.run_rag_pipeline` with the fake LLM.
+
+Queries are the first half of sampled quotes, a separate sample per component so no
+component runs on the caches warmed by another. Peak RSS is the process high-water
+mark, reset before each component where the kernel allows it (Linux); elsewhere it is
+the peak since the process started.
+
+Results are written as JSON with the commit and configuration they were measured
+at. `--baseline` compares a run to an earlier file and `--compare` two files without
+running; both exit with an error when ops/sec dropped or p99 rose by more than
+`--threshold`.
+
+Usage:
+    python -m benchmarks.run --corpora quotes 100k --output results.json
+    python -m benchmarks.run --corpora quotes --baseline results.json
+    python -m benchmarks.run --compare old.json new.json --threshold 0.1
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fakes import DeterministicFakeEmbedding, FakeOpenAIModel
+from configurations import config
+from model import embedding_model
+from model.rag_engine import RAGEngine
+from seed_index.populate_faiss_index import _populate_faiss_index
+
+model_config = config.ModelConfig()
+
+# Number of CSV rows of each corpus; None for the bundled quotes.
+CORPORA = {"quotes": None, "100k": 100_000, "1m": 1_000_000}
+SYNTHETIC_CHUNK_ROWS = 100_000
+# The bundled quotes, kept since _configure points CSV_PATH at each corpus in turn.
+BUNDLED_CSV_PATH = model_config.CSV_PATH
+
+def _configure(**values) -> None:
+    # Every module holds its own ModelConfig, so the settings are applied to all of them.
+    for module in list(sys.modules.values()):
+        module_config = getattr(module, "model_config", None)
+        if isinstance(module_config, config.ModelConfig):
+            for name, value in values.items():
+                setattr(module_config, name, value)
+
+def _reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _result(corpus: str, component: str, ops: int, seconds: float,
+            latencies: Optional[Sequence[float]] = None) -> dict:
+    p50, p99 = (np.percentile(np.asarray(latencies) * 1000, [50, 99]).tolist()
+                if latencies else (None, None))
+    return {"corpus": corpus, "component": component, "ops": ops,
+            "opsPerSec": ops / max(seconds, 1e-9), "p50Ms": p50, "p99Ms": p99,
+            "peakRssMb": _peak_rss_mb()}
+
+def _measure(corpus: str, component: str, func: Callable, inputs: Sequence) -> dict:
+    """
+    Calls `func` once per input and reports its throughput, latency percentiles and peak RSS.
+    """
+    _reset_peak_rss()
+    latencies = []
+    started = time.perf_counter()
+    for item in inputs:
+        start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - start)
+    return _result(corpus, component, len(inputs), time.perf_counter() - started, latencies)
+
+def _write_synthetic_corpus(path: str, rows: int, seed: int) -> None:
+    """
+    Writes a CSV of `rows` quotes of random words drawn from the bundled quotes.
+
+    Quote lengths, authors and categories are drawn from the bundled rows too, so
+    chunking, BM25 and metadata filtering see realistic sizes and cardinalities.
+    """
+    source = pd.read_csv(BUNDLED_CSV_PATH).dropna(subset=[model_config.COLUMN_NAME])
+    quotes = source[model_config.COLUMN_NAME].str.split()
+    vocabulary = np.asarray(sorted({word for words in quotes for word in words}))
+    lengths = quotes.str.len().to_numpy()
+    authors = source[model_config.AUTHOR_COLUMN_NAME].fillna("").to_numpy()
+    categories = source[model_config.CATEGORY_COLUMN_NAME].fillna("").to_numpy()
+    rng = np.random.default_rng(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([model_config.COLUMN_NAME, model_config.AUTHOR_COLUMN_NAME,
+                         model_config.CATEGORY_COLUMN_NAME])
+        for start in range(0, rows, SYNTHETIC_CHUNK_ROWS):
+            count = min(SYNTHETIC_CHUNK_ROWS, rows - start)
+            sizes = rng.choice(lengths, count)
+            words = vocabulary[rng.integers(0, len(vocabulary), int(sizes.sum()))]
+            offsets = np.concatenate(([0], np.cumsum(sizes)))
+            writer.writerows([" ".join(words[offsets[i]:offsets[i + 1]]), authors[a], categories[c]]
+                             for i, a, c in zip(range(count), rng.integers(0, len(authors), count),
+                                                rng.integers(0, len(categories), count)))
+
+def _sample_queries(csv_path: str, count: int, seed: int) -> List[str]:
+    # The first half of sampled quotes, from the first rows so sampling stays cheap on large corpora.
+    quotes = pd.read_csv(csv_path, nrows=max(10 * count, 10_000))[model_config.COLUMN_NAME].dropna().tolist()
+    rng = random.Random(seed)
+    return [" ".join(quote.split()[:max(3, len(quote.split()) // 2)])
+            for quote in rng.sample(quotes, min(count, len(quotes)))]
+
+def run_corpus(corpus: str, root: str, args: argparse.Namespace) -> List[dict]:
+    """
+    Indexes one corpus into `root` and benchmarks every component on it.
+    """
+    rows = CORPORA[corpus]
+    csv_path = BUNDLED_CSV_PATH
+    if rows is not None:
+        csv_path = os.path.join(root, f"{corpus}.csv")
+        _write_synthetic_corpus(csv_path, rows, args.seed)
+    else:
+        rows = len(pd.read_csv(csv_path, usecols=[model_config.COLUMN_NAME]))
+    _configure(CSV_PATH=csv_path, INDEX_PATH=os.path.join(root, f"{corpus}_index"))
+
+    results = []
+    _reset_peak_rss()
+    started = time.perf_counter()
+    asyncio.run(_populate_faiss_index("local"))
+    results.append(_result(corpus, "populate", rows, time.perf_counter() - started))
+
+    queries = _sample_queries(csv_path, 3 * args.queries, args.seed)
+    embedding_queries, retrieve_queries, pipeline_queries = (queries[i::3] for i in range(3))
+    engine = RAGEngine(openai_model=FakeOpenAIModel(latency=0.0, token_delay=0.0))
+    try:
+        model = engine.embedding_model
+        results.append(_measure(corpus, "get_embedding_miss", model.get_embedding, embedding_queries))
+        results.append(_measure(corpus, "get_embedding_hit", model.get_embedding, embedding_queries))
+        results.append(_measure(corpus, "retrieve", engine.retrieve, retrieve_queries))
+        documents = [engine.retrieve(query, args.pack_k) for query in retrieve_queries]
+        results.append(_measure(corpus, "truncate_documents", engine.prompt_engine.truncate_documents, documents))
+        results.append(_measure(corpus, "rag_pipeline", engine.run_rag_pipeline, pipeline_queries))
+    finally:
+        engine.close()
+    return results
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _print_results(results: List[dict]) -> None:
+    print(f"{'corpus':<7} {'component':<19} {'ops':>8} {'ops/sec':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8}")
+    for r in results:
+        p50 = f"{r['p50Ms']:>8.3f}" if r["p50Ms"] is not None else f"{'-':>8}"
+        p99 = f"{r['p99Ms']:>8.3f}" if r["p99Ms"] is not None else f"{'-':>8}"
+        print(f"{r['corpus']:<7} {r['component']:<19} {r['ops']:>8} {r['opsPerSec']:>10.1f} "
+              f"{p50} {p99} {r['peakRssMb']:>8.0f}")
+
+def compare(baseline: dict, current: dict, threshold: float) -> bool:
+    """
+    Prints the change of each result shared by two runs and returns whether any regressed.
+
+    A result regresses when its ops/sec dropped, or its p99 latency rose, by more
+    than `threshold`, a fraction of the baseline value.
+    """
+    previous = {(r["corpus"], r["component"]): r for r in baseline["results"]}
+    regressed = False
+    print(f"baseline {baseline['meta'].get('commit')} -> current {current['meta'].get('commit')}")
+    print(f"{'corpus':<7} {'component':<19} {'ops/sec':>10} {'change':>8} {'p99 ms':>8} {'change':>8}")
+    for r in current["results"]:
+        old = previous.get((r["corpus"], r["component"]))
+        if old is None:
+            continue
+        throughput = r["opsPerSec"] / old["opsPerSec"] - 1
+        latency = r["p99Ms"] / old["p99Ms"] - 1 if r["p99Ms"] and old["p99Ms"] else 0.0
+        flag = throughput < -threshold or latency > threshold
+        regressed |= flag
+        p99 = f"{r['p99Ms']:>8.3f}" if r["p99Ms"] is not None else f"{'-':>8}"
+        print(f"{r['corpus']:<7} {r['component']:<19} {r['opsPerSec']:>10.1f} {throughput:>+8.1%} "
+              f"{p99} {latency:>+8.1%}{'  REGRESSED' if flag else ''}")
+    return regressed
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpora", nargs="+", choices=list(CORPORA), default=["quotes", "100k"],
+                        help="Corpora to index and benchmark")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries per component")
+    parser.add_argument("--pack-k", type=int, default=50, help="Number of chunks given to truncate_documents")
+    parser.add_argument("--index-type", default=model_config.INDEX_TYPE, help="ModelConfig.INDEX_TYPE to build")
+    parser.add_argument("--real-embeddings", action="store_true",
+                        help="Run the configured embedding model instead of the fake one")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpora and sampled queries")
+    parser.add_argument("--output", help="File the JSON results are written to")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare this run to")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two JSON results without running")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative ops/sec drop or p99 rise reported as a regression")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary corpora and indexes")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(_load(args.compare[0]), _load(args.compare[1]), args.threshold) else 0)
+
+    if not args.real_embeddings:
+        embedding_model.HuggingFaceEmbeddings = DeterministicFakeEmbedding
+    # Start every run cold: no persisted embedding cache, a fresh index per corpus.
+    _configure(INDEX_TYPE=args.index_type, EMBEDDING_CACHE_PATH=None)
+
+    root = tempfile.mkdtemp(prefix="benchmark_")
+    results = []
+    try:
+        for corpus in args.corpora:
+            results.extend(run_corpus(corpus, root, args))
+    finally:
+        if args.keep:
+            print(f"Corpora and indexes kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    current = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "embeddings": "model" if args.real_embeddings else "fake",
+            "indexType": args.index_type,
+            "queries": args.queries,
+            "packK": args.pack_k,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    _print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.baseline:
+        sys.exit(1 if compare(_load(args.baseline), current, args.threshold) else 0)
@@ -0,0 +1,162 @@
+"""
+Measures the cold start of the API and fails when it regresses.
+
+Each measurement runs in a fresh interpreter. Import time is the wall time of
+`import api.main`, whose heavy dependencies (FAISS, LangChain, the embedding runtime,
+the OpenAI client, Google Cloud Storage) are deferred to the application lifespan; the
+script fails if any of DEFERRED_MODULES is imported with the module, or if the median
+import time exceeds `--max-import-ms`. The import-time profile (`python -X importtime`)
+of the last run is summarised as the `--top` slowest modules by cumulative time.
+
+With `--serve`, the API is also started with uvicorn in the local environment and the
+time until it answers is measured, which includes the lifespan: loading the index,
+the embedding model and the OpenAI client. The index must exist; build it first by
+starting the API or running `_populate_faiss_index("local")`. `--max-ready-s` bounds it.
+
+With `--cold`, the API is started once from a temporary working directory holding
+only the CSV, so the lifespan has no local index and builds one before importing the
+engine, and the time until it answers is bounded by `--max-cold-ready-s`.
+
+Usage:
+    python -m benchmarks.startup --runs 5 --max-import-ms 1500
+    python -m benchmarks.startup --serve --max-ready-s 30 --output startup.json
+    python -m benchmarks.startup --runs 1 --cold --max-cold-ready-s 600
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+
+from configurations import config
+
+model_config = config.ModelConfig()
+
+# Modules `import api.main` must not load; they belong to the lifespan or to env != local.
+DEFERRED_MODULES = ("google.cloud.storage", "faiss", "langchain_openai", "langchain_huggingface",
+                    "sentence_transformers", "torch", "onnxruntime", "scipy",
+                    "model.rag_engine", "seed_index.populate_faiss_index", "gcp_utils.storage_handler")
+
+_PROBE = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import api.main
+elapsed = time.perf_counter() - start
+loaded = sorted(name for name in set(sys.modules) - before if name in {deferred!r})
+print(json.dumps({{"import_s": elapsed, "deferred_loaded": loaded}}))
+"""
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+def measure_import() -> dict:
+    """
+    Imports api.main in a fresh interpreter and returns its wall time, the deferred modules
+    it loaded and its import-time profile.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                                _PROBE.format(deferred=set(DEFERRED_MODULES))],
+                               check=True, capture_output=True, text=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["profile"] = [{"module": match.group(4), "selfMs": int(match.group(1)) / 1000,
+                          "cumulativeMs": int(match.group(2)) / 1000, "depth": (len(match.group(3)) - 1) // 2}
+                         for match in map(_IMPORT_TIME.match, completed.stderr.splitlines()) if match]
+    return result
+
+def measure_ready(port: int, timeout: float, cwd: Optional[str] = None) -> float:
+    """
+    Starts the API with uvicorn, from `cwd` if given, and returns the seconds until it answers a request.
+    """
+    pythonpath = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "env": "local", "PYTHONPATH": pythonpath}
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1",
+                                "--port", str(port), "--log-level", "warning"], env=env, cwd=cwd)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise SystemExit("The API exited before becoming ready.")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise SystemExit(f"The API was not ready after {timeout:.0f} s.")
+    finally:
+        process.terminate()
+        process.wait()
+
+def measure_cold_ready(port: int, timeout: float) -> float:
+    """
+    Starts the API from a working directory without an index and returns the seconds until it answers.
+    """
+    workdir = tempfile.mkdtemp(prefix="startup_cold_")
+    try:
+        csv_path = os.path.join(workdir, model_config.CSV_PATH)
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        shutil.copyfile(model_config.CSV_PATH, csv_path)
+        return measure_ready(port, timeout, cwd=workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=15, help="Number of modules shown from the import profile")
+    parser.add_argument("--max-import-ms", type=float, default=1500.0, help="Budget of the median import time")
+    parser.add_argument("--serve", action="store_true", help="Also measure the time until uvicorn answers")
+    parser.add_argument("--port", type=int, default=8092, help="Port of the served API")
+    parser.add_argument("--max-ready-s", type=float, default=60.0, help="Budget of the median time to ready")
+    parser.add_argument("--cold", action="store_true", help="Also measure the time to ready without a local index")
+    parser.add_argument("--max-cold-ready-s", type=float, default=600.0,
+                        help="Budget of the time to ready when the index is built")
+    parser.add_argument("--output", help="File the JSON results are written to")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_s"] for run in imports) * 1000
+    deferred_loaded = sorted({name for run in imports for name in run["deferred_loaded"]})
+    profile = sorted(imports[-1]["profile"], key=lambda entry: entry["cumulativeMs"], reverse=True)[:args.top]
+
+    print(f"import api.main: {import_ms:.0f} ms median of {args.runs} (budget {args.max_import_ms:.0f} ms)")
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for entry in profile:
+        print(f"{entry['cumulativeMs']:>13.1f} {entry['selfMs']:>8.1f}  {'  ' * entry['depth']}{entry['module']}")
+
+    failures = []
+    if deferred_loaded:
+        failures.append(f"import api.main loaded deferred modules: {', '.join(deferred_loaded)}")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import api.main took {import_ms:.0f} ms, over {args.max_import_ms:.0f} ms")
+
+    ready_s = None
+    if args.serve:
+        ready_s = statistics.median(measure_ready(args.port, 10 * args.max_ready_s) for _ in range(args.runs))
+        print(f"time to ready: {ready_s:.2f} s median of {args.runs} (budget {args.max_ready_s:.0f} s)")
+        if ready_s > args.max_ready_s:
+            failures.append(f"the API took {ready_s:.2f} s to become ready, over {args.max_ready_s:.0f} s")
+
+    cold_ready_s = None
+    if args.cold:
+        cold_ready_s = measure_cold_ready(args.port, 10 * args.max_cold_ready_s)
+        print(f"time to ready without an index: {cold_ready_s:.2f} s (budget {args.max_cold_ready_s:.0f} s)")
+        if cold_ready_s > args.max_cold_ready_s:
+            failures.append(f"the API took {cold_ready_s:.2f} s to build the index and become ready, "
+                            f"over {args.max_cold_ready_s:.0f} s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"importMs": import_ms, "deferredLoaded": deferred_loaded, "readySec": ready_s,
+                       "coldReadySec": cold_ready_s, "profile": profile}, f, indent=2)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,123 @@
+"""
+Times index synchronisation with the bucket and checks its integrity guarantees.
+
+The index folder is uploaded to a bucket, uploaded again with nothing changed, then
+downloaded into an empty folder and downloaded again with nothing changed; unchanged
+syncs must skip every file. The peak Python heap of each transfer is reported, which
+stays near GCS_TRANSFER_WORKERS x GCS_BUFFER_SIZE whatever the file sizes. Finally
+one remote file is corrupted without updating its checksum, and the download must
+fail while leaving the local copy untouched, and one part of a composite upload is
+made to fail, which must leave no part in the bucket.
+
+A local directory stands in for the bucket unless `--gcs` is passed, in which case the
+configured bucket (or STORAGE_EMULATOR_HOST) is used. `--chunk-size` lowers
+Config.GCS_CHUNK_SIZE so that parallel ranged and composite transfers are exercised.
+
+Run seed_index first so that faiss_index/ holds the index. The current version named by
+its manifest is synchronised by default.
+
+Usage:
+    python -m benchmarks.storage_sync --chunk-size 1048576
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from configurations import config
+from gcp_utils import storage_handler
+from gcp_utils.local_bucket import LocalBlob, LocalBucket
+from model import index_manifest
+
+model_config = config.ModelConfig()
+
+def _timed(label: str, func) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<20} {elapsed:8.3f}s  peak heap {peak / 1e6:6.1f} MB")
+
+def _files(folder: str) -> list:
+    # Paths of every file under the folder, relative to it.
+    return sorted(os.path.relpath(os.path.join(root, file), folder)
+                  for root, _, files in os.walk(folder) for file in files)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", default=index_manifest.current_folder(model_config.INDEX_PATH),
+                        help="Index folder to synchronise")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Override of Config.GCS_CHUNK_SIZE in bytes")
+    parser.add_argument("--gcs", action="store_true", help="Use the configured bucket instead of a local one")
+    args = parser.parse_args()
+    if args.chunk_size:
+        storage_handler.config.GCS_CHUNK_SIZE = args.chunk_size
+
+    workdir = tempfile.mkdtemp(prefix="storage_sync_")
+    source = os.path.abspath(args.folder)
+    bucket = storage_handler._get_bucket() if args.gcs else LocalBucket(os.path.join(workdir, "bucket"))
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        shutil.copytree(source, "faiss_index")
+        folder = "faiss_index"
+        size = sum(os.path.getsize(os.path.join(folder, file)) for file in _files(folder))
+        print(f"{len(_files(folder))} files, {size / 1e6:.1f} MB")
+
+        _timed("upload", lambda: storage_handler._write_to_cloud_storage(folder, bucket))
+        _timed("upload unchanged", lambda: storage_handler._write_to_cloud_storage(folder, bucket))
+        shutil.move(folder, "uploaded")
+        _timed("download", lambda: storage_handler._read_from_cloud_storage(folder, bucket))
+        _timed("download unchanged", lambda: storage_handler._read_from_cloud_storage(folder, bucket))
+        match, mismatch, errors = filecmp.cmpfiles("uploaded", folder, _files("uploaded"), shallow=False)
+        print(f"round trip: {len(match)} identical, {len(mismatch) + len(errors)} different")
+
+        if not args.gcs:
+            name = sorted(_files(folder), key=lambda file: os.path.getsize(os.path.join(folder, file)))[-1]
+            os.remove(os.path.join(folder, name))
+            with open(os.path.join(folder, name), "wb") as f:
+                f.write(b"stale local copy")
+            corrupted = bucket.blob(f"{folder}/{name}")
+            crc32c, actual = corrupted.crc32c, LocalBlob.crc32c
+            LocalBlob.crc32c = property(lambda blob: crc32c if blob.name == corrupted.name else actual.fget(blob))
+            with open(corrupted.path, "r+b") as f:
+                f.write(b"\x00" * 16)
+            try:
+                storage_handler._read_from_cloud_storage(folder, bucket)
+                print(f"corrupted {name}: NOT detected")
+            except IOError as error:
+                with open(os.path.join(folder, name), "rb") as f:
+                    untouched = f.read() == b"stale local copy"
+                leftovers = [file for file in os.listdir(folder) if file.endswith(".download")]
+                print(f"corrupted {name}: detected ({error}); local copy untouched: {untouched}, "
+                      f"temporary files left: {len(leftovers)}")
+            LocalBlob.crc32c = actual
+
+            failed = LocalBucket(os.path.join(workdir, "failed_bucket"))
+            upload = LocalBlob.upload_from_file
+            def _fail_second_part(blob, file_obj, size=None):
+                if blob.name.endswith(".part-01"):
+                    raise IOError("simulated part upload failure")
+                upload(blob, file_obj, size)
+            LocalBlob.upload_from_file = _fail_second_part
+            chunk_size = storage_handler.config.GCS_CHUNK_SIZE
+            # Splits the largest file into parts whatever --chunk-size is.
+            largest = max(os.path.getsize(os.path.join(folder, file)) for file in _files(folder))
+            storage_handler.config.GCS_CHUNK_SIZE = min(chunk_size, largest // 2)
+            try:
+                storage_handler._write_to_cloud_storage(folder, failed)
+                print("failed part upload: NOT raised")
+            except IOError:
+                parts = [blob.name for blob in failed.list_blobs(f"{folder}/") if ".part-" in blob.name]
+                print(f"failed part upload: raised, parts left in the bucket: {len(parts)}")
+            finally:
+                LocalBlob.upload_from_file = upload
+                storage_handler.config.GCS_CHUNK_SIZE = chunk_size
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
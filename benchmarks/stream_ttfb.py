@@ -0,0 +1,54 @@
+"""
+Reports time to first byte of the streaming pipeline against the blocking one.
+
+A fake streaming LLM with a fixed delay per token replaces OpenAI. The answer cache is
+disabled so every query is generated.
+
+Usage:
+    python -m benchmarks.stream_ttfb --queries 10 --token-delay 0.03
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import FakeOpenAIModel
+from model import rag_engine
+from model.rag_engine import RAGEngine
+
+async def main(queries: int, latency: float, token_delay: float) -> None:
+    rag_engine.model_config.ANSWER_CACHE_SIZE = 0
+    engine = RAGEngine(openai_model=FakeOpenAIModel(latency=latency, token_delay=token_delay))
+    await engine.arun_rag_pipeline("warm up")
+
+    blocking, first_bytes, first_tokens, totals = [], [], [], []
+    for i in range(queries):
+        query = f"How do I keep going after failure number {i}?"
+        start = time.perf_counter()
+        await engine.arun_rag_pipeline(query)
+        blocking.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first_byte = first_token = None
+        async for event, _ in engine.astream_rag_pipeline(query):
+            now = time.perf_counter() - start
+            first_byte = first_byte if first_byte is not None else now
+            if event == "token" and first_token is None:
+                first_token = now
+        first_bytes.append(first_byte)
+        first_tokens.append(first_token)
+        totals.append(time.perf_counter() - start)
+    engine.close()
+
+    print(f"blocking response     p50={statistics.median(blocking) * 1000:8.1f} ms")
+    print(f"stream first byte     p50={statistics.median(first_bytes) * 1000:8.1f} ms")
+    print(f"stream first token    p50={statistics.median(first_tokens) * 1000:8.1f} ms")
+    print(f"stream complete       p50={statistics.median(totals) * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=10, help="Number of queries per pipeline")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency of the blocking call in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="Fake LLM delay between streamed tokens in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.latency, args.token_delay))
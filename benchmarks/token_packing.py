@@ -0,0 +1,65 @@
+"""
+Micro-benchmark of context packing in PromptEngine.truncate_documents.
+
+Compares the previous quadratic routine, which re-tokenised the whole growing context
+for every chunk, with the incremental routine, at MAX_TOKENS from 2k to 32k. Chunks are
+built from the bundled quotes with DocumentChunker, as at ingestion time, so they carry
+precomputed token counts and the budget is actually reached. Both routines must
+produce the same context.
+
+Usage:
+    python -m benchmarks.token_packing --repeat 5
+"""
+import argparse
+import time
+
+import pandas as pd
+from langchain.docstore.document import Document
+
+from model import prompt_engine
+from model.document_chunker import DocumentChunker
+from model.prompt_engine import PromptEngine
+from model.token_counter import get_encoder
+
+BUDGETS = [2000, 4000, 8000, 16000, 32000]
+
+def quadratic_pack(chunks: list, max_tokens: int) -> str:
+    encoder = get_encoder()
+    final_context = ""
+    for chunk in chunks:
+        tokens = len(encoder.encode_ordinary(final_context + chunk))
+        if tokens > max_tokens:
+            break
+        final_context += "\n\n" + chunk
+    return final_context.strip()
+
+def _best_of(func, repeat: int) -> tuple:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, best one is kept")
+    args = parser.parse_args()
+
+    df = pd.read_csv(prompt_engine.model_config.CSV_PATH)
+    texts = df[prompt_engine.model_config.COLUMN_NAME].dropna().tolist()
+    engine = PromptEngine()
+    chunks = DocumentChunker().split_documents(
+        [Document(page_content=text, metadata={"doc_id": str(i)}) for i, text in enumerate(texts)])
+
+    print(f"{'MAX_TOKENS':>10} {'quadratic ms':>14} {'linear ms':>11} {'speed-up':>9}")
+    for budget in BUDGETS:
+        documents = [(chunk, 0.0) for chunk in chunks[: budget // 4]]
+        prompt_engine.model_config.MAX_TOKENS = budget
+        all_chunks, _ = engine.truncate_documents(documents)
+
+        old_time, old_context = _best_of(lambda: quadratic_pack(all_chunks, budget), args.repeat)
+        new_time, (_, new_context) = _best_of(lambda: engine.truncate_documents(documents), args.repeat)
+        if old_context != new_context:
+            raise SystemExit(f"Packed contexts differ at MAX_TOKENS={budget}")
+        print(f"{budget:>10} {old_time * 1000:>14.1f} {new_time * 1000:>11.1f} {old_time / new_time:>8.1f}x")
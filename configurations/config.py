@@ -1,3 +1,4 @@
+from typing import Optional
 
 class Config:
     """
@@ -10,21 +11,72 @@ class Config:
     ----------
     COLUMN_NAME : str
         The name of the column in the CSV file that contains the text data.
+    AUTHOR_COLUMN_NAME : str
+        The name of the column in the CSV file that contains the author, kept as filterable metadata.
+    CATEGORY_COLUMN_NAME : str
+        The name of the column in the CSV file that contains the comma-separated tags, kept as filterable metadata.
     INDEX_PATH : str
         The path where the FAISS index will be stored.
+    INDEX_FILE_NAME : str
+        The name of the FAISS vector file inside INDEX_PATH.
+    DOCSTORE_FILE_NAME : str
+        The name of the SQLite document store inside INDEX_PATH.
+    BM25_FILE_NAME : str
+        The name of the BM25 term-frequency matrix inside INDEX_PATH.
+    BM25_VOCABULARY_FILE_NAME : str
+        The name of the BM25 vocabulary inside INDEX_PATH.
+    VECTORS_FILE_NAME : str
+        The name of the full-precision vectors of a compressed index inside INDEX_PATH.
+    METADATA_INDEX_FILE_NAME : str
+        The name of the author and category postings inside INDEX_PATH.
+    CHECKPOINT_FILE_NAME : str
+        The name of the checkpoint of an interrupted index build inside INDEX_PATH.
+    MANIFEST_FILE_NAME : str
+        The name of the manifest inside INDEX_PATH pointing at the current index version.
     CSV_PATH : str
         The path to the CSV file containing the dataset.
     PROJECT_NAME : str
         The name of the Google Cloud project.
     BUCKET_NAME : str
         The name of the Google Cloud Storage bucket where the index will be stored.
+    GCS_TRANSFER_WORKERS : int
+        The number of files or byte ranges transferred to and from the bucket concurrently.
+    GCS_CHUNK_SIZE : int
+        The minimum size in bytes of the ranges a large file is split into for parallel transfers.
+    GCS_BUFFER_SIZE : int
+        The size in bytes of the buffer each range is streamed through, a multiple of 256 KiB.
+    METRICS_ENABLED : bool
+        Whether pipeline stages and HTTP requests are timed for /metrics and the Server-Timing header.
+    LOG_FILE : str
+        The file JSON log records are appended to.
+    LOG_TO_CONSOLE : bool
+        Whether log records are also written to the standard output.
+    LOG_INFO_SAMPLE_RATE : float
+        The share of requests whose info records are written, between 0 and 1. Errors are always written.
     """
     def __init__(self) -> None:
         self.COLUMN_NAME: str = "quote"
+        self.AUTHOR_COLUMN_NAME: str = "author"
+        self.CATEGORY_COLUMN_NAME: str = "category"
         self.INDEX_PATH: str = "faiss_index"
+        self.INDEX_FILE_NAME: str = "index.faiss"
+        self.DOCSTORE_FILE_NAME: str = "docstore.sqlite"
+        self.BM25_FILE_NAME: str = "bm25.npz"
+        self.BM25_VOCABULARY_FILE_NAME: str = "bm25_vocabulary.json"
+        self.VECTORS_FILE_NAME: str = "vectors.f32"
+        self.METADATA_INDEX_FILE_NAME: str = "metadata_index.npz"
+        self.CHECKPOINT_FILE_NAME: str = "checkpoint.json"
+        self.MANIFEST_FILE_NAME: str = "manifest.json"
         self.CSV_PATH: str = "data/quotes.csv"
         self.PROJECT_NAME: str = "my-web-page-230207"
         self.BUCKET_NAME: str = "minimal-rag-bucket"
+        self.GCS_TRANSFER_WORKERS: int = 8
+        self.GCS_CHUNK_SIZE: int = 32 * 1024 * 1024
+        self.GCS_BUFFER_SIZE: int = 8 * 1024 * 1024
+        self.METRICS_ENABLED: bool = True
+        self.LOG_FILE: str = "app.log"
+        self.LOG_TO_CONSOLE: bool = True
+        self.LOG_INFO_SAMPLE_RATE: float = 1.0
 
 class ApiConfig(Config):
     """
@@ -50,6 +102,12 @@ class ModelConfig(Config):
     ----------
     MODEL_NAME : str
         The name of the model to be used for embeddings, defaulting to a lightweight model.
+    EMBEDDING_BACKEND : str
+        The runtime of the embedding model: "torch" (PyTorch) or "onnx" (ONNX Runtime on CPU).
+    EMBEDDING_INT8 : bool
+        Whether the ONNX backend runs the int8 dynamically quantised export of the model.
+    EMBEDDING_INT8_FILE : str
+        The int8 ONNX file of the model repository, matching the CPU, e.g. "onnx/model_qint8_arm64.onnx" on ARM.
     TOP_RESULTS : int
         The number of top results to return from the model.
     OPENAI_MODEL_NAME : str
@@ -60,6 +118,72 @@ class ModelConfig(Config):
         The number of overlapping characters between chunks to maintain context.
     PROMPT_TEMPLATE : str
         The template for prompts used in the model.
+    EXECUTOR_WORKERS : int
+        The number of threads used to run embedding, search and prompt building off the event loop.
+    EMBEDDING_CACHE_SIZE : int
+        The maximum number of query embeddings kept in the in-process cache.
+    EMBEDDING_CACHE_TTL : float
+        The number of seconds a cached query embedding stays valid.
+    EMBEDDING_CACHE_PATH : Optional[str]
+        The SQLite file persisting the embedding cache across restarts, or None to keep it in memory only.
+    ANSWER_CACHE_SIZE : int
+        The maximum number of generated answers kept in the semantic answer cache. 0 disables it.
+    ANSWER_CACHE_THRESHOLD : float
+        The minimum cosine similarity between two queries for a cached answer to be reused.
+    EMBEDDING_BATCHING : bool
+        Whether concurrent query embeddings are gathered into batched model calls.
+    EMBEDDING_BATCH_MAX_SIZE : int
+        The maximum number of queries embedded in one batched model call.
+    EMBEDDING_BATCH_MAX_WAIT_MS : float
+        The maximum number of milliseconds a query waits for others to join its batch.
+    INDEX_TYPE : str
+        The FAISS index built at ingestion: "flat" (exact), "ivf_flat", "hnsw", "ivf_pq",
+        or "sq_fp16" / "sq8", flat indexes of float16 or 8-bit scalar-quantised vectors.
+    IVF_NLIST : int
+        The number of IVF lists, capped so each list gets enough training points.
+    PQ_M : int
+        The number of product-quantizer sub-vectors of "ivf_pq". Must divide the embedding size.
+    PQ_NBITS : int
+        The number of bits per product-quantizer code of "ivf_pq".
+    HNSW_M : int
+        The number of neighbours per node of the "hnsw" graph.
+    HNSW_EF_CONSTRUCTION : int
+        The HNSW search queue size used while building the graph.
+    TRAIN_SAMPLE_SIZE : int
+        The maximum number of vectors sampled to train IVF, PQ and SQ8 indexes.
+    NPROBE : int
+        The default number of IVF lists visited per search.
+    EF_SEARCH : int
+        The default HNSW search queue size.
+    INDEX_MMAP : bool
+        Whether the API memory-maps the FAISS vector file instead of reading it onto the heap.
+    RERANK_FACTOR : int
+        For compressed indexes, the shortlist of `k * RERANK_FACTOR` candidates re-scored exactly
+        from the full-precision vectors. 0 disables re-ranking.
+    MAX_BATCH_SIZE : int
+        The maximum number of queries accepted by one /query/batch request.
+    BATCH_LLM_CONCURRENCY : int
+        The maximum number of concurrent LLM generations per /query/batch request.
+    HYBRID_SEARCH : bool
+        Whether dense results are fused with BM25 lexical results when a BM25 index is available.
+    HYBRID_CANDIDATES : int
+        The number of dense and of lexical candidates fused per query.
+    RRF_K : int
+        The rank offset of reciprocal-rank fusion. Larger values flatten the weight of the top ranks.
+    BM25_K1 : float
+        The BM25 term-frequency saturation.
+    BM25_B : float
+        The BM25 document-length normalisation.
+    METADATA_BITMAP_CACHE_SIZE : int
+        The maximum number of author and category bitmaps kept in memory for filtered search.
+    INGEST_BATCH_SIZE : int
+        The number of CSV rows read, chunked and embedded together at ingestion.
+    INGEST_CHECKPOINT_EVERY : int
+        The number of ingestion batches between two checkpoints of the partial index.
+    INDEX_RELOAD_INTERVAL : float
+        Seconds between two checks of the index manifest for a new version by the API. 0 disables polling.
+    INDEX_KEEP_VERSIONS : int
+        The number of published index versions kept on disk, the current one included.
     Methods
     -------
     __init__()
@@ -68,6 +192,9 @@ class ModelConfig(Config):
     def __init__(self) -> None:
         super().__init__()
         self.MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+        self.EMBEDDING_BACKEND: str = "torch"
+        self.EMBEDDING_INT8: bool = False
+        self.EMBEDDING_INT8_FILE: str = "onnx/model_quint8_avx2.onnx"
         self.TOP_RESULTS: int = 5
         self.OPENAI_MODEL_NAME = "gpt-4o-mini"
         self.MAX_TOKENS: int = 2000
@@ -80,4 +207,36 @@ class ModelConfig(Config):
         Question:
         {query}
         """
+        self.EXECUTOR_WORKERS: int = 8
+        self.EMBEDDING_CACHE_SIZE: int = 10000
+        self.EMBEDDING_CACHE_TTL: float = 24 * 60 * 60
+        self.EMBEDDING_CACHE_PATH: Optional[str] = "embedding_cache.sqlite"
+        self.ANSWER_CACHE_SIZE: int = 1000
+        self.ANSWER_CACHE_THRESHOLD: float = 0.92
+        self.EMBEDDING_BATCHING: bool = True
+        self.EMBEDDING_BATCH_MAX_SIZE: int = 32
+        self.EMBEDDING_BATCH_MAX_WAIT_MS: float = 2.0
+        self.INDEX_TYPE: str = "flat"
+        self.IVF_NLIST: int = 1024
+        self.PQ_M: int = 48
+        self.PQ_NBITS: int = 8
+        self.HNSW_M: int = 32
+        self.HNSW_EF_CONSTRUCTION: int = 200
+        self.TRAIN_SAMPLE_SIZE: int = 100000
+        self.NPROBE: int = 16
+        self.EF_SEARCH: int = 64
+        self.INDEX_MMAP: bool = True
+        self.RERANK_FACTOR: int = 4
+        self.MAX_BATCH_SIZE: int = 256
+        self.BATCH_LLM_CONCURRENCY: int = 8
+        self.HYBRID_SEARCH: bool = True
+        self.HYBRID_CANDIDATES: int = 20
+        self.RRF_K: int = 60
+        self.BM25_K1: float = 1.2
+        self.BM25_B: float = 0.75
+        self.METADATA_BITMAP_CACHE_SIZE: int = 4096
+        self.INGEST_BATCH_SIZE: int = 1024
+        self.INGEST_CHECKPOINT_EVERY: int = 10
+        self.INDEX_RELOAD_INTERVAL: float = 60.0
+        self.INDEX_KEEP_VERSIONS: int = 2
 
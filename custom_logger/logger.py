@@ -2,46 +2,139 @@
 This module provides a simple logging utility for recording informational and error messages
 to both the console and a log file. 
 
-- Log File: Logs are written to `app.log` in the current directory.
+- Log File: Logs are written to `app.log` (Config.LOG_FILE) in the current directory.
 - Log Levels: Supports 'info' and 'error' log levels.
+- Non-blocking: Callers only put records on an in-memory queue. A background listener thread
+  formats them and writes them to the console and the file, so logging never blocks a request on I/O.
+- Structured: Each record is one JSON object with its timestamp, level, message, logger name,
+  the id of the request being served and any extra fields passed to `_log`.
+- Lazy: `_log("Found %d documents", n)` only builds the message in the listener thread.
+- Sampling: Config.LOG_INFO_SAMPLE_RATE keeps the info records of a share of the requests,
+  chosen by request id so a kept request keeps all its lines. Errors are always written.
 """
 
-import logging
+import atexit
 import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import zlib
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from configurations.config import Config
+
+config = Config()
+
+# The id of the request being served, set by RequestIdMiddleware and copied into executor threads.
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_LEVELS = {"info": logging.INFO, "error": logging.ERROR}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one line of JSON.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+            "logger": record.name,
+            "requestId": getattr(record, "request_id", None),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class _RequestIdFilter(logging.Filter):
+    # Handler filters run in the calling thread, before the record is queued, which is the only
+    # place the request id contextvar can be read. Do not move this to the listener side.
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records unformatted, so their messages are built by the listener thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def _start_listener() -> logging.handlers.QueueListener:
+    """
+    Routes every record of the process through a queue to a background writer thread.
+    """
+    formatter = JsonFormatter()
+    handlers = [logging.FileHandler(config.LOG_FILE)]
+    if config.LOG_TO_CONSOLE:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _LazyQueueHandler(log_queue)
+    queue_handler.addFilter(_RequestIdFilter())
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+_listener = _start_listener()
+
+def shutdown() -> None:
+    """
+    Writes the queued records and stops the writer thread. Called when the process exits.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown)
+_logger = logging.getLogger("minimal_rag")
 
-# Configure the logging system
-logging.basicConfig(
-    filename='app.log',
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s'
-)
+def _sampled() -> bool:
+    rate = config.LOG_INFO_SAMPLE_RATE
+    if rate >= 1:
+        return True
+    current = request_id.get()
+    if current is None:
+        return random.random() < rate
+    return zlib.crc32(current.encode("utf-8")) / 2 ** 32 < rate
 
 def _log(txt: str, 
-         format: str = 'info') -> None:
+         *args: Any,
+         format: str = 'info',
+         **fields: Any) -> None:
     """
     Log a message to both the console and the log file, with a timestamp.
 
     Parameters
     ----------
     txt : str
-        The message to be logged.
+        The message to be logged, optionally with %-style placeholders filled from `args`.
+    *args : Any
+        The values of the placeholders, formatted only when the record is written.
     format : str, optional
         The logging level of the message ('info' or 'error'). Defaults to 'info'.
+    **fields : Any
+        Extra fields added to the JSON record, e.g. `docs_per_sec=120.5`.
 
     Returns
     -------
     None
     """
-    # Create the log message with a timestamp
-    log_message: str = f"{txt} | {datetime.datetime.now()}"
-    
-    # Print the log message to the console
-    print(log_message)
-    
-    # Write the log message to the file
-    if format.lower() == 'info':
-        logging.info(log_message)
-    elif format.lower() == 'error':
-        logging.error(log_message)
-    else:
-        raise ValueError("Invalid log format. Use 'info' or 'error'.")
\ No newline at end of file
+    level = _LEVELS.get(format.lower())
+    if level is None:
+        raise ValueError("Invalid log format. Use 'info' or 'error'.")
+    if level == logging.INFO and not _sampled():
+        return
+    _logger.log(level, txt, *args, extra={"fields": fields} if fields else None)
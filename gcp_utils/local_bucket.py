@@ -0,0 +1,137 @@
+"""
+This module provides a local-filesystem stand-in for a Google Cloud Storage bucket.
+
+It implements the subset of the `google.cloud.storage` Bucket and Blob interface used by
+storage_handler, so index synchronisation can be exercised without network access by
+setting the LOCAL_BUCKET_PATH environment variable.
+"""
+import base64
+import os
+import shutil
+from typing import BinaryIO, Iterator, List, Optional
+
+import google_crc32c
+
+BLOCK_SIZE = 1 << 20
+
+class _Limited:
+    """
+    Reads at most `size` bytes from a file object.
+    """
+    def __init__(self, file_obj: BinaryIO, size: int) -> None:
+        self._file = file_obj
+        self._remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        size = self._remaining if size < 0 else min(size, self._remaining)
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+class LocalBlob:
+    """
+    A file standing in for a blob. Its name is the path relative to the bucket root.
+    """
+    def __init__(self, bucket: "LocalBucket", name: str) -> None:
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.bucket.root, self.name)
+
+    @property
+    def size(self) -> Optional[int]:
+        return os.path.getsize(self.path) if self.exists() else None
+
+    @property
+    def crc32c(self) -> Optional[str]:
+        """
+        The base64 big-endian CRC32C of the content, formatted like the GCS metadata field.
+        """
+        if not self.exists():
+            return None
+        checksum = google_crc32c.Checksum()
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                checksum.update(block)
+        return base64.b64encode(checksum.digest()).decode("ascii")
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def reload(self) -> None:
+        if not self.exists():
+            raise FileNotFoundError(self.name)
+
+    def upload_from_filename(self, filename: str) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path + ".uploading")
+        os.replace(self.path + ".uploading", self.path)
+
+    def upload_from_file(self, file_obj: BinaryIO, size: Optional[int] = None) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".uploading", "wb") as f:
+            shutil.copyfileobj(file_obj if size is None else _Limited(file_obj, size), f, BLOCK_SIZE)
+        os.replace(self.path + ".uploading", self.path)
+
+    def upload_from_string(self, data: bytes) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".uploading", "wb") as f:
+            f.write(data)
+        os.replace(self.path + ".uploading", self.path)
+
+    def download_to_filename(self, filename: str) -> None:
+        shutil.copyfile(self.path, filename)
+
+    def download_as_bytes(self, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        """
+        Reads the content, or the byte range [start, end] with `end` inclusive as in GCS.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(end - (start or 0) + 1)
+
+    def download_to_file(self, file_obj: BinaryIO, start: Optional[int] = None, end: Optional[int] = None) -> None:
+        """
+        Streams the content, or the byte range [start, end] with `end` inclusive as in GCS, into a file object.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(start or 0)
+            source = f if end is None else _Limited(f, end - (start or 0) + 1)
+            shutil.copyfileobj(source, file_obj, BLOCK_SIZE)
+
+    def compose(self, sources: List["LocalBlob"]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".composing", "wb") as out:
+            for source in sources:
+                with open(source.path, "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(self.path + ".composing", self.path)
+
+    def delete(self) -> None:
+        os.remove(self.path)
+
+class LocalBucket:
+    """
+    A directory standing in for a bucket.
+
+    Attributes
+    ----------
+    root : str
+        The directory holding the blobs.
+    """
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.name = os.path.basename(os.path.abspath(root))
+        os.makedirs(root, exist_ok=True)
+
+    def blob(self, name: str, chunk_size: Optional[int] = None) -> LocalBlob:
+        return LocalBlob(self, name)
+
+    def list_blobs(self, prefix: str = "") -> Iterator[LocalBlob]:
+        for folder, _, files in os.walk(self.root):
+            for file in sorted(files):
+                name = os.path.relpath(os.path.join(folder, file), self.root).replace(os.sep, "/")
+                if name.startswith(prefix) and not name.endswith((".uploading", ".composing")):
+                    yield LocalBlob(self, name)
@@ -1,72 +1,246 @@
 """
 This module provides utility functions for interacting with Google Cloud Storage.
-It includes functionalities to write index to the storage and read it back.
+It includes functionalities to write index to the storage, read it back and delete old versions.
+
+Transfers are concurrent and split into byte ranges of `Config.GCS_CHUNK_SIZE`, each
+streamed through a buffer of `Config.GCS_BUFFER_SIZE` bytes so memory stays bounded
+whatever the file size. Files whose CRC32C already matches on the other side are
+skipped, every transferred file is verified against its CRC32C, and downloads are
+renamed into place only once verified.
 
 Configuration:
 - Relies on Config for project and bucket configurations.
+- STORAGE_EMULATOR_HOST points the client at a GCS emulator, with anonymous credentials.
+- LOCAL_BUCKET_PATH replaces the bucket with a local directory (see local_bucket.py).
 
 Dependencies:
 - google-cloud-storage: Google Cloud Client Library for Python.
+- google-crc32c: CRC32C checksums matching the ones stored by GCS.
 """
+import base64
+import io
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import google_crc32c
 from google.cloud import storage
+
 from configurations.config import Config
-import os
+from custom_logger import logger
+from gcp_utils.local_bucket import LocalBucket
 
-# Initialize configuration and storage client
+# Initialize configuration
 config = Config()
 
-def _write_to_cloud_storage(folder_path: str) -> None:
+# GCS composes at most 32 objects in one request.
+MAX_COMPOSE_PARTS = 32
+
+@lru_cache(maxsize=None)
+def _get_client() -> storage.Client:
+    """
+    Returns the storage client shared by every transfer of the process.
+    """
+    if os.getenv("STORAGE_EMULATOR_HOST"):
+        from google.auth.credentials import AnonymousCredentials
+        return storage.Client(project=config.PROJECT_NAME, credentials=AnonymousCredentials())
+    return storage.Client(config.PROJECT_NAME)
+
+@lru_cache(maxsize=None)
+def _get_bucket() -> Any:
+    """
+    Returns the index bucket, or a local directory standing in for it when LOCAL_BUCKET_PATH is set.
+    """
+    local_path = os.getenv("LOCAL_BUCKET_PATH")
+    if local_path:
+        return LocalBucket(local_path)
+    return _get_client().bucket(config.BUCKET_NAME)
+
+def _file_crc32c(path: str) -> str:
+    """
+    Computes the CRC32C of a local file, base64-encoded like the `crc32c` field of a blob.
+    """
+    checksum = google_crc32c.Checksum()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode("ascii")
+
+def _ranges(size: int) -> List[Tuple[int, int]]:
+    """
+    Splits a file into at most MAX_COMPOSE_PARTS (start, length) ranges of at least GCS_CHUNK_SIZE bytes.
+    """
+    part_size = max(config.GCS_CHUNK_SIZE, math.ceil(size / MAX_COMPOSE_PARTS))
+    return [(start, min(part_size, size - start)) for start in range(0, size, part_size)] or [(0, 0)]
+
+class _RangeReader(io.RawIOBase):
+    """
+    A read-only view of `length` bytes of a file from `start`, positioned relative to `start`.
+
+    Uploads read it in chunks of the blob's `chunk_size`, and may seek back to
+    resend a chunk, so a part never has to be held in memory at once.
+    """
+    def __init__(self, f: BinaryIO, start: int, length: int) -> None:
+        self._file = f
+        self._start = start
+        self._length = length
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = min(max(0, base + offset), self._length)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._length - self._position
+        size = remaining if size is None or size < 0 else min(size, remaining)
+        self._file.seek(self._start + self._position)
+        data = self._file.read(size)
+        self._position += len(data)
+        return data
+
+def _upload_part(bucket: Any, local_path: str, blob_name: str, start: int, length: int) -> None:
+    with open(local_path, "rb") as f:
+        bucket.blob(blob_name, chunk_size=config.GCS_BUFFER_SIZE).upload_from_file(
+            _RangeReader(f, start, length), size=length)
+
+def _download_part(blob: Any, local_path: str, start: int, length: int) -> None:
+    if not length:
+        return
+    # Each range streams into its own handle on the preallocated file, at its own offset.
+    with open(local_path, "r+b") as f:
+        f.seek(start)
+        blob.download_to_file(f, start=start, end=start + length - 1)
+
+def _verify(path: str, expected: Optional[str], name: str) -> None:
+    actual = _file_crc32c(path)
+    if actual != expected:
+        raise IOError(f"CRC32C mismatch for {name}: expected {expected}, got {actual}.")
+
+def _write_to_cloud_storage(folder_path: str, bucket: Optional[Any] = None) -> None:
     """
     Upload a the FAISS index to a specified path in Google Cloud Storage.
 
+    Files whose remote CRC32C already matches are skipped. Files larger than
+    `Config.GCS_CHUNK_SIZE` are uploaded as parts in parallel and composed into
+    one object; the parts are deleted even when an upload fails. Every uploaded
+    object is checked against the local CRC32C.
+
     Parameters
     ----------
-    index : str
-        The serialized FAISS index to upload.
     folder_path : str
         The destination folder path within the cloud storage bucket.
+    bucket : optional
+        The bucket to write to. Defaults to the shared index bucket.
 
     Returns
     -------
     None
     """
-    storage_client = storage.Client(config.PROJECT_NAME)
-    bucket = storage_client.bucket(config.BUCKET_NAME)
-    for file in os.listdir(folder_path):
+    bucket = bucket if bucket is not None else _get_bucket()
+    remote = {blob.name: blob.crc32c for blob in bucket.list_blobs(prefix=f"{folder_path}/")}
+    uploads: Dict[str, Tuple[str, str, List[str]]] = {}
+    tasks = []
+    for file in sorted(os.listdir(folder_path)):
         local_path = os.path.join(folder_path, file)
-        if os.path.isfile(local_path):
-            blob = bucket.blob(os.path.join(folder_path, file))
-            blob.upload_from_filename(local_path)
-            print(f"Uploaded {file} to GCS at {folder_path}.")
+        if not os.path.isfile(local_path):
+            continue
+        blob_name = f"{folder_path}/{file}"
+        checksum = _file_crc32c(local_path)
+        if remote.get(blob_name) == checksum:
+            logger._log(f"Skipped {file}, unchanged in GCS.")
+            continue
+        ranges = _ranges(os.path.getsize(local_path))
+        parts = [blob_name] if len(ranges) == 1 else [f"{blob_name}.part-{i:02d}" for i in range(len(ranges))]
+        uploads[blob_name] = (local_path, checksum, parts)
+        tasks.extend((local_path, part, start, length) for part, (start, length) in zip(parts, ranges))
 
-def _read_from_cloud_storage(folder_path: str) -> None:
+    try:
+        with ThreadPoolExecutor(max_workers=config.GCS_TRANSFER_WORKERS) as executor:
+            for future in [executor.submit(_upload_part, bucket, *task) for task in tasks]:
+                future.result()
+
+        for blob_name, (local_path, checksum, parts) in uploads.items():
+            blob = bucket.blob(blob_name)
+            if parts != [blob_name]:
+                blob.compose([bucket.blob(part) for part in parts])
+            blob.reload()
+            if blob.crc32c != checksum:
+                raise IOError(f"CRC32C mismatch after uploading {blob_name}: "
+                              f"expected {checksum}, got {blob.crc32c}.")
+            logger._log(f"Uploaded {os.path.basename(local_path)} to GCS at {folder_path}.")
+    finally:
+        part_blobs = [bucket.blob(part) for _, _, parts in uploads.values() if len(parts) > 1 for part in parts]
+        for part_blob in part_blobs:
+            if part_blob.exists():
+                part_blob.delete()
+
+def _read_from_cloud_storage(folder_path: str, bucket: Optional[Any] = None, recursive: bool = True) -> None:
     """
     Download a folder from Google Cloud Storage.
 
+    Files whose local CRC32C already matches the remote one are skipped. Each
+    file is streamed as byte ranges in parallel into a temporary file, which
+    is verified against the remote CRC32C and then atomically renamed into
+    place, so a failed or interrupted download never leaves a partial file.
+
     Parameters
     ----------
-    folder : str
+    folder_path : str
         The folder path within the cloud storage bucket to download from.
+    bucket : optional
+        The bucket to read from. Defaults to the shared index bucket.
+    recursive : bool, optional
+        Whether to download the subfolders too, or only the files directly in the folder.
 
     Returns
     -------
     None
     """
-    storage_client = storage.Client(config.PROJECT_NAME)
-    bucket = storage_client.bucket(config.BUCKET_NAME)
+    bucket = bucket if bucket is not None else _get_bucket()
     os.makedirs(folder_path, exist_ok=True)
-    required_files = ["index.faiss", "index.pkl"]
-    for file_name in required_files:
-        blob_path = os.path.join(folder_path, file_name)
-        local_path = os.path.join(folder_path, file_name)
-        blob = bucket.blob(blob_path)
-        if blob.exists():
-            blob.download_to_filename(local_path)
-            print(f"Downloaded {file_name} from GCS to {local_path}.")
-        else:
-            print(f"File {blob_path} does not exist in GCS.")
-    
-def _check_index_exists(folder_path: str) -> bool:
+    downloads = []
+    tasks = []
+    for blob in bucket.list_blobs(prefix=f"{folder_path}/"):
+        if not recursive and "/" in blob.name[len(folder_path) + 1:]:
+            continue
+        local_path = blob.name
+        if (os.path.isfile(local_path) and os.path.getsize(local_path) == blob.size
+                and _file_crc32c(local_path) == blob.crc32c):
+            logger._log(f"Skipped {blob.name}, unchanged locally.")
+            continue
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        temp_path = local_path + ".download"
+        with open(temp_path, "wb") as f:
+            f.truncate(blob.size)
+        downloads.append((blob, local_path, temp_path))
+        tasks.extend((blob, temp_path, start, length) for start, length in _ranges(blob.size))
+
+    try:
+        with ThreadPoolExecutor(max_workers=config.GCS_TRANSFER_WORKERS) as executor:
+            for future in [executor.submit(_download_part, *task) for task in tasks]:
+                future.result()
+        for blob, local_path, temp_path in downloads:
+            _verify(temp_path, blob.crc32c, blob.name)
+            os.replace(temp_path, local_path)
+            logger._log(f"Downloaded {blob.name} from GCS to {local_path}.")
+    finally:
+        for _, _, temp_path in downloads:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+def _check_index_exists(folder_path: str, bucket: Optional[Any] = None) -> bool:
 
     """
     Check if the FAISS index exists in the specified folder path in Google Cloud Storage.
@@ -75,17 +249,42 @@ def _check_index_exists(folder_path: str) -> bool:
     ----------
     folder_path : str
         The folder path within the cloud storage bucket to check for the index.
+    bucket : optional
+        The bucket to check. Defaults to the shared index bucket.
     Returns
     -------
     bool
     """
-    storage_client = storage.Client(config.PROJECT_NAME)
-    bucket = storage_client.bucket(config.BUCKET_NAME)
+    bucket = bucket if bucket is not None else _get_bucket()
     try:
-        required_files = {f"{folder_path}/index.faiss", f"{folder_path}/index.pkl"}
+        required_files = {f"{folder_path}/{config.INDEX_FILE_NAME}", f"{folder_path}/{config.DOCSTORE_FILE_NAME}"}
         blobs = bucket.list_blobs(prefix=folder_path)
 
         existing_files = {blob.name for blob in blobs}
-        return required_files.issubset(existing_files)
+        # A versioned index is complete once its manifest is uploaded, which happens last.
+        return (f"{folder_path}/{config.MANIFEST_FILE_NAME}" in existing_files
+                or required_files.issubset(existing_files))
     except:
         return False
+
+def _delete_from_cloud_storage(folder_path: str, bucket: Optional[Any] = None) -> None:
+    """
+    Delete a folder and everything under it from Google Cloud Storage.
+
+    Parameters
+    ----------
+    folder_path : str
+        The folder path within the cloud storage bucket to delete.
+    bucket : optional
+        The bucket to delete from. Defaults to the shared index bucket.
+
+    Returns
+    -------
+    None
+    """
+    bucket = bucket if bucket is not None else _get_bucket()
+    blobs = list(bucket.list_blobs(prefix=f"{folder_path}/"))
+    with ThreadPoolExecutor(max_workers=config.GCS_TRANSFER_WORKERS) as executor:
+        for future in [executor.submit(blob.delete) for blob in blobs]:
+            future.result()
+    logger._log(f"Deleted {len(blobs)} files from GCS at {folder_path}.")
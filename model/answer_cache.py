@@ -0,0 +1,143 @@
+import threading
+import time
+import numpy as np
+from typing import Any, List, Optional, Sequence
+
+class SemanticAnswerCache:
+    """
+    A capacity-bounded cache of generated answers indexed by query embedding.
+
+    A lookup returns the answer of the most similar cached query when their cosine
+    similarity reaches `threshold`, so paraphrased questions skip the LLM. All
+    entries are dropped when `set_version` moves the cache to a new index
+    version, because answers built on an older corpus may no longer be grounded
+    in it. Lookups and stores for any other version, such as requests still
+    pinned to the previous index during a reload, miss and are ignored without
+    touching the entries. Answers are only reused within the scope they were
+    stored in, e.g. the same metadata filters and search knobs.
+    
+    Attributes
+    ----------
+    capacity : int
+        The maximum number of cached answers. The least recently used one is replaced when full.
+    threshold : float
+        The minimum cosine similarity for a cached answer to be reused.
+    hits : int
+        The number of lookups answered from the cache.
+    misses : int
+        The number of lookups that fell through to the LLM.
+    """
+    def __init__(self, capacity: int, threshold: float) -> None:
+        self.capacity = capacity
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._answers: List[Any] = [None] * capacity
+        self._scopes: List[str] = [""] * capacity
+        self._last_used = np.zeros(capacity)
+        self._size = 0
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def set_version(self, version: str) -> None:
+        """
+        Moves the cache to the current index version, dropping every entry if it changed.
+
+        Parameters
+        ----------
+        version : str
+            The version of the index now serving requests.
+        """
+        with self._lock:
+            if version != self._version:
+                self._size = 0
+                self._answers = [None] * self.capacity
+                self._scopes = [""] * self.capacity
+                self._version = version
+
+    def lookup(self, embedding: Sequence[float], version: str, scope: str = "") -> Optional[Any]:
+        """
+        Returns a copy of the cached answer closest to the query, or None on a miss.
+        
+        Parameters
+        ----------
+        embedding : Sequence[float]
+            The embedding of the incoming query.
+        version : str
+            The version of the index the answer must have been built on.
+        scope : str, optional
+            The scope the answer must have been stored in.
+        
+        Returns
+        -------
+        Optional[Any]
+            A deep copy of the cached answer, or None.
+        """
+        query = self._normalise(embedding)
+        with self._lock:
+            if version != self._version or self._size == 0:
+                self.misses += 1
+                return None
+            similarities = self._vectors[:self._size] @ query
+            if scope or any(self._scopes[:self._size]):
+                similarities[np.asarray(self._scopes[:self._size]) != scope] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = time.monotonic()
+            answer = self._answers[best]
+        return answer.model_copy(deep=True)
+
+    def store(self, embedding: Sequence[float], answer: Any, version: str, scope: str = "") -> None:
+        """
+        Caches the answer generated for a query embedding.
+        
+        Parameters
+        ----------
+        embedding : Sequence[float]
+            The embedding of the query.
+        answer : Any
+            The pydantic model returned for the query.
+        version : str
+            The version of the index the answer was built on; ignored unless it is the current one.
+        scope : str, optional
+            The scope the answer is reused in.
+        """
+        if self.capacity == 0:
+            return
+        query = self._normalise(embedding)
+        with self._lock:
+            if version != self._version:
+                return
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, query.shape[0]), dtype=np.float32)
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = query
+            self._answers[slot] = answer
+            self._scopes[slot] = scope
+            self._last_used[slot] = time.monotonic()
+
+    def stats(self) -> dict:
+        """
+        Returns the size and hit rate of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
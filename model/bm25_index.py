@@ -0,0 +1,195 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from configurations import config
+
+model_config = config.ModelConfig()
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lower-cased word tokens.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """
+    An in-process BM25 inverted index over the chunks of the FAISS index.
+
+    The index keeps a sparse term-by-chunk matrix of term frequencies, from which
+    the BM25 weights are precomputed, so scoring a query is a sum of a few matrix
+    rows. Columns are FAISS positions, which lets lexical and dense results be
+    fused directly.
+
+    Attributes
+    ----------
+    term_frequencies : sparse.csr_matrix
+        The (terms x chunks) matrix of term counts.
+    vocabulary : Dict[str, int]
+        The row of each term in the matrices.
+    matrix : sparse.csr_matrix
+        The (terms x chunks) matrix of BM25 term weights.
+    """
+    def __init__(self, term_frequencies: sparse.csr_matrix, vocabulary: Dict[str, int]) -> None:
+        self.term_frequencies = term_frequencies
+        self.vocabulary = vocabulary
+        self.matrix = self._weights(term_frequencies)
+
+    @staticmethod
+    def _count_terms(texts: Iterable[str], vocabulary: Dict[str, int]) -> sparse.csr_matrix:
+        """
+        Counts the terms of each text, adding new terms to the vocabulary.
+        """
+        rows, columns, frequencies = [], [], []
+        num_texts = 0
+        for position, text in enumerate(texts):
+            num_texts = position + 1
+            for term, frequency in Counter(tokenize(text)).items():
+                rows.append(vocabulary.setdefault(term, len(vocabulary)))
+                columns.append(position)
+                frequencies.append(frequency)
+        return sparse.csr_matrix((np.asarray(frequencies, dtype=np.float32),
+                                  (np.asarray(rows, dtype=np.int32), np.asarray(columns, dtype=np.int32))),
+                                 shape=(len(vocabulary), num_texts))
+
+    @staticmethod
+    def _weights(term_frequencies: sparse.csr_matrix) -> sparse.csr_matrix:
+        """
+        Turns term frequencies into BM25 weights, vectorised over the non-zero entries.
+        """
+        coo = term_frequencies.tocoo()
+        num_chunks = term_frequencies.shape[1]
+        k1, b = model_config.BM25_K1, model_config.BM25_B
+        lengths = np.asarray(term_frequencies.sum(axis=0)).ravel()
+        document_frequency = np.diff(term_frequencies.indptr)
+        idf = np.log1p((num_chunks - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if num_chunks else 0.0
+        norm = k1 * (1 - b + b * lengths[coo.col] / max(average_length, 1e-9))
+        weights = idf[coo.row] * coo.data * (k1 + 1) / (coo.data + norm)
+        return sparse.csr_matrix((weights.astype(np.float32), (coo.row, coo.col)), shape=term_frequencies.shape)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "BM25Index":
+        """
+        Builds the index from the chunk texts, in FAISS position order.
+
+        Parameters
+        ----------
+        texts : Iterable[str]
+            The text of every chunk, the i-th text being stored at FAISS position i.
+
+        Returns
+        -------
+        BM25Index
+            The built index.
+        """
+        vocabulary: Dict[str, int] = {}
+        return cls(cls._count_terms(texts, vocabulary), vocabulary)
+
+    def add(self, texts: Sequence[str]) -> None:
+        """
+        Appends chunks stored at the next FAISS positions and refreshes the weights.
+
+        Chunks deleted from the FAISS index keep counting in the collection
+        statistics until the next full build; they are masked out of the results.
+        """
+        new = self._count_terms(texts, self.vocabulary)
+        old = self.term_frequencies.copy()
+        old.resize((len(self.vocabulary), old.shape[1]))
+        self.term_frequencies = sparse.hstack([old, new], format="csr")
+        self.matrix = self._weights(self.term_frequencies)
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Scores every chunk against the query.
+
+        Returns
+        -------
+        np.ndarray
+            The BM25 score of each FAISS position.
+        """
+        terms = [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary]
+        if not terms:
+            return np.zeros(self.matrix.shape[1], dtype=np.float32)
+        return np.asarray(self.matrix[terms].sum(axis=0)).ravel()
+
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the k best matching FAISS positions of a query.
+
+        Parameters
+        ----------
+        query : str
+            The query text.
+        k : int
+            The maximum number of positions to return.
+        mask : np.ndarray, optional
+            A boolean array selecting the positions that may be returned.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            The positions and their scores, best first. Chunks sharing no term with the query are left out.
+        """
+        scores = self.scores(query)
+        if mask is not None:
+            scores = np.where(mask[:len(scores)], scores, 0.0)
+        k = min(k, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] > 0]
+        return top, scores[top]
+
+    def save(self, folder_path: str) -> None:
+        """
+        Writes the term frequencies and the vocabulary next to the FAISS index.
+        """
+        sparse.save_npz(os.path.join(folder_path, model_config.BM25_FILE_NAME), self.term_frequencies,
+                        compressed=False)
+        with open(os.path.join(folder_path, model_config.BM25_VOCABULARY_FILE_NAME), "w") as f:
+            json.dump(self.vocabulary, f)
+
+    @classmethod
+    def load(cls, folder_path: str) -> Optional["BM25Index"]:
+        """
+        Loads the index saved in the folder, or returns None if there is none.
+        """
+        matrix_path = os.path.join(folder_path, model_config.BM25_FILE_NAME)
+        if not os.path.exists(matrix_path):
+            return None
+        with open(os.path.join(folder_path, model_config.BM25_VOCABULARY_FILE_NAME)) as f:
+            vocabulary = json.load(f)
+        return cls(sparse.load_npz(matrix_path).tocsr(), vocabulary)
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int, rrf_k: int) -> List[Tuple[int, float]]:
+    """
+    Fuses several rankings of FAISS positions with reciprocal-rank fusion.
+
+    Parameters
+    ----------
+    rankings : List[np.ndarray]
+        The positions of each ranking, best first.
+    k : int
+        The number of fused positions to return.
+    rrf_k : int
+        The rank offset damping the weight of the top ranks.
+
+    Returns
+    -------
+    List[Tuple[int, float]]
+        The fused positions and their scores, best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            fused[int(position)] = fused.get(int(position), 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
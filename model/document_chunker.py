@@ -0,0 +1,52 @@
+from configurations import config
+from model.token_counter import count_tokens
+
+from typing import Iterable, List
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+model_config = config.ModelConfig()
+
+class DocumentChunker:
+    """
+    A class to split source documents into index-ready chunks at ingestion time.
+
+    Every chunk keeps the metadata of its parent document and gains:
+    - chunk_index: the position of the chunk within its parent document.
+    - start_index: the character offset of the chunk in the parent text.
+    - num_tokens: the precomputed token count used when packing the prompt.
+    
+    Attributes
+    ----------
+    splitter : RecursiveCharacterTextSplitter
+        The splitter used to break documents into chunks.
+    """
+    def __init__(self) -> None:
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=model_config.CHUNK_SIZE,
+            chunk_overlap=model_config.CHUNK_OVERLAP,
+            add_start_index=True
+        )
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        Splits the documents into chunks annotated with their offsets and token counts.
+        
+        Parameters
+        ----------
+        documents : Iterable[Document]
+            The source documents. Their metadata should contain a `doc_id`.
+        
+        Returns
+        -------
+        List[Document]
+            The chunks of all documents, in order.
+        """
+        chunks = []
+        for document in documents:
+            parts = self.splitter.create_documents([document.page_content], [document.metadata])
+            for chunk_index, chunk in enumerate(parts):
+                chunk.metadata["chunk_index"] = chunk_index
+                chunk.metadata["num_tokens"] = count_tokens(chunk.page_content)
+                chunks.append(chunk)
+        return chunks
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import uuid
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from langchain.docstore.document import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS id_map (
+    faiss_id INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS id_map_doc_id ON id_map (doc_id);
+"""
+
+def document_id(text: str) -> str:
+    """
+    Derives the stable id of a source document from its text.
+
+    Re-ingesting an unchanged document yields the same id, so it can be skipped,
+    and identical texts collapse into one document.
+    """
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:32]
+
+def chunk_id(document: Document) -> str:
+    """
+    Builds the docstore id of a chunk from its parent document id and its position in it.
+    """
+    metadata = document.metadata
+    if "doc_id" not in metadata or "chunk_index" not in metadata:
+        return str(uuid.uuid4())
+    return f"{metadata['doc_id']}:{metadata['chunk_index']}"
+
+class _SQLiteConnection:
+    """
+    A SQLite connection shared by the threads of the RAG engine behind a lock.
+    """
+    def __init__(self, path: str, read_only: bool) -> None:
+        if read_only:
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.executescript(_SCHEMA)
+            self.connection.commit()
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+class SQLiteDocumentStore(Docstore, AddableMixin):
+    """
+    A document store kept on disk in SQLite instead of a pickled in-memory dict.
+
+    Documents are only read back for the ids returned by a search, so resident
+    memory holds the vectors and none of the texts or metadata.
+
+    Attributes
+    ----------
+    path : str
+        The path of the SQLite database.
+    index_to_docstore_id : SQLiteIdMap
+        The mapping from FAISS positions to document ids, stored in the same database.
+    """
+    def __init__(self, path: str, read_only: bool = False) -> None:
+        self.path = path
+        self._db = _SQLiteConnection(path, read_only)
+        self.index_to_docstore_id = SQLiteIdMap(self._db)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """
+        Adds documents keyed by id.
+        """
+        rows = [(doc_id, doc.page_content, json.dumps(doc.metadata)) for doc_id, doc in texts.items()]
+        with self._db.lock:
+            try:
+                with self._db.connection:
+                    self._db.connection.executemany(
+                        "INSERT INTO documents (id, content, metadata) VALUES (?, ?, ?)", rows)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Tried to add ids that already exist: {list(texts)}")
+
+    def delete(self, ids: List) -> None:
+        """
+        Deletes documents by id.
+        """
+        with self._db.lock, self._db.connection:
+            self._db.connection.executemany("DELETE FROM documents WHERE id = ?", [(i,) for i in ids])
+
+    def search(self, search: str) -> Union[str, Document]:
+        """
+        Looks up a document by id.
+
+        Returns
+        -------
+        Union[str, Document]
+            The document if found, else an error message.
+        """
+        documents = self.mget([search])
+        return documents[0] if documents else f"ID {search} not found."
+
+    def mget(self, ids: Sequence[str]) -> List[Document]:
+        """
+        Fetches several documents in a single query, in the order of `ids`. Missing ids are skipped.
+        """
+        with self._db.lock:
+            rows = self._db.connection.execute(
+                f"SELECT id, content, metadata FROM documents WHERE id IN ({','.join('?' * len(ids))})",
+                list(ids)
+            ).fetchall()
+        found = {doc_id: Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+                 for doc_id, content, metadata in rows}
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def documents_at(self, faiss_ids: Sequence[int]) -> Dict[int, Document]:
+        """
+        Fetches the documents stored at the given FAISS positions in a single query.
+
+        Parameters
+        ----------
+        faiss_ids : Sequence[int]
+            The positions returned by a FAISS search.
+
+        Returns
+        -------
+        Dict[int, Document]
+            The documents keyed by FAISS position.
+        """
+        with self._db.lock:
+            rows = self._db.connection.execute(
+                "SELECT m.faiss_id, d.id, d.content, d.metadata FROM id_map m "
+                "JOIN documents d ON d.id = m.doc_id "
+                f"WHERE m.faiss_id IN ({','.join('?' * len(faiss_ids))})",
+                [int(i) for i in faiss_ids]
+            ).fetchall()
+        return {faiss_id: Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+                for faiss_id, doc_id, content, metadata in rows}
+
+    def append(self, first_faiss_id: int, documents: Sequence[Document]) -> None:
+        """
+        Stores documents for consecutive FAISS positions, in a single transaction.
+
+        Parameters
+        ----------
+        first_faiss_id : int
+            The FAISS position of the first document.
+        documents : Sequence[Document]
+            The documents, in the order their vectors are added to FAISS.
+        """
+        ids = [chunk_id(document) for document in documents]
+        with self._db.lock, self._db.connection:
+            self._db.connection.executemany(
+                "INSERT INTO documents (id, content, metadata) VALUES (?, ?, ?)",
+                [(doc_id, doc.page_content, json.dumps(doc.metadata)) for doc_id, doc in zip(ids, documents)])
+            self._db.connection.executemany(
+                "INSERT INTO id_map (faiss_id, doc_id) VALUES (?, ?)",
+                [(first_faiss_id + i, doc_id) for i, doc_id in enumerate(ids)])
+
+    def truncate(self, num_vectors: int) -> None:
+        """
+        Drops the documents stored at FAISS positions `num_vectors` and above.
+
+        Used when resuming an interrupted build, whose last documents may have
+        been stored after the vectors were last checkpointed.
+        """
+        with self._db.lock, self._db.connection:
+            self._db.connection.execute(
+                "DELETE FROM documents WHERE id IN (SELECT doc_id FROM id_map WHERE faiss_id >= ?)", (num_vectors,))
+            self._db.connection.execute("DELETE FROM id_map WHERE faiss_id >= ?", (num_vectors,))
+
+    def chunks_of(self, doc_ids: Iterable[str]) -> Dict[str, List[Tuple[int, Document]]]:
+        """
+        Fetches the stored chunks of source documents with their FAISS positions.
+
+        Parameters
+        ----------
+        doc_ids : Iterable[str]
+            The ids of the source documents.
+
+        Returns
+        -------
+        Dict[str, List[Tuple[int, Document]]]
+            The chunks of each stored document, by chunk index. Unknown ids are left out.
+        """
+        chunks: Dict[str, List[Tuple[int, Document]]] = {}
+        doc_ids = list(dict.fromkeys(doc_ids))
+        # Chunk ids are "<doc_id>:<chunk_index>" and ";" sorts right after ":", so each
+        # document is a range scan on the primary key. Ranges are queried in pages to
+        # stay under SQLite's limit on bound parameters.
+        for start in range(0, len(doc_ids), 400):
+            page = doc_ids[start:start + 400]
+            bounds = [bound for doc_id in page for bound in (f"{doc_id}:", f"{doc_id};")]
+            with self._db.lock:
+                rows = self._db.connection.execute(
+                    "SELECT m.faiss_id, d.id, d.content, d.metadata FROM documents d "
+                    "JOIN id_map m ON m.doc_id = d.id WHERE "
+                    + " OR ".join(["(d.id >= ? AND d.id < ?)"] * len(page)),
+                    bounds
+                ).fetchall()
+            for faiss_id, i, content, metadata in rows:
+                document = Document(id=i, page_content=content, metadata=json.loads(metadata))
+                chunks.setdefault(i.rsplit(":", 1)[0], []).append((faiss_id, document))
+        for documents in chunks.values():
+            documents.sort(key=lambda item: item[1].metadata.get("chunk_index", 0))
+        return chunks
+
+    def delete_positions(self, faiss_ids: Sequence[int]) -> None:
+        """
+        Deletes the documents stored at the given FAISS positions, which are then no longer live.
+        """
+        ids = [(int(i),) for i in faiss_ids]
+        with self._db.lock, self._db.connection:
+            self._db.connection.executemany(
+                "DELETE FROM documents WHERE id IN (SELECT doc_id FROM id_map WHERE faiss_id = ?)", ids)
+            self._db.connection.executemany("DELETE FROM id_map WHERE faiss_id = ?", ids)
+
+    def live_positions(self, num_vectors: int) -> np.ndarray:
+        """
+        Returns a boolean array telling which of the first `num_vectors` FAISS positions hold a document.
+        """
+        with self._db.lock:
+            rows = self._db.connection.execute(
+                "SELECT faiss_id FROM id_map WHERE faiss_id < ?", (num_vectors,)).fetchall()
+        live = np.zeros(num_vectors, dtype=bool)
+        live[np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))] = True
+        return live
+
+    def iter_documents(self, page_size: int = 10000) -> Iterator[Document]:
+        """
+        Yields every document in FAISS position order, reading one page at a time.
+        """
+        last = -1
+        while True:
+            with self._db.lock:
+                rows = self._db.connection.execute(
+                    "SELECT m.faiss_id, d.id, d.content, d.metadata FROM id_map m "
+                    "JOIN documents d ON d.id = m.doc_id WHERE m.faiss_id > ? ORDER BY m.faiss_id LIMIT ?",
+                    (last, page_size)
+                ).fetchall()
+            if not rows:
+                return
+            for faiss_id, doc_id, content, metadata in rows:
+                yield Document(id=doc_id, page_content=content, metadata=json.loads(metadata))
+            last = rows[-1][0]
+
+    def close(self) -> None:
+        self._db.close()
+
+class SQLiteIdMap(MutableMapping):
+    """
+    The FAISS position to document id mapping of a SQLiteDocumentStore.
+
+    It implements the dict interface LangChain's FAISS vector store expects for
+    `index_to_docstore_id`, without loading the mapping into memory.
+    """
+    def __init__(self, db: _SQLiteConnection) -> None:
+        self._db = db
+
+    def __getitem__(self, faiss_id: int) -> str:
+        with self._db.lock:
+            row = self._db.connection.execute(
+                "SELECT doc_id FROM id_map WHERE faiss_id = ?", (int(faiss_id),)).fetchone()
+        if row is None:
+            raise KeyError(faiss_id)
+        return row[0]
+
+    def __setitem__(self, faiss_id: int, doc_id: str) -> None:
+        self.update({faiss_id: doc_id})
+
+    def __delitem__(self, faiss_id: int) -> None:
+        with self._db.lock, self._db.connection:
+            self._db.connection.execute("DELETE FROM id_map WHERE faiss_id = ?", (int(faiss_id),))
+
+    def update(self, other: Dict[int, str] = (), **kwargs) -> None:
+        rows = [(int(faiss_id), doc_id) for faiss_id, doc_id in dict(other, **kwargs).items()]
+        with self._db.lock, self._db.connection:
+            self._db.connection.executemany(
+                "INSERT OR REPLACE INTO id_map (faiss_id, doc_id) VALUES (?, ?)", rows)
+
+    def __iter__(self) -> Iterator[int]:
+        with self._db.lock:
+            rows = self._db.connection.execute("SELECT faiss_id FROM id_map ORDER BY faiss_id").fetchall()
+        return iter(row[0] for row in rows)
+
+    def __len__(self) -> int:
+        with self._db.lock:
+            return self._db.connection.execute("SELECT COUNT(*) FROM id_map").fetchone()[0]
@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence, Tuple
+
+class Histogram:
+    """
+    A thread-safe histogram with fixed bucket upper bounds.
+
+    Attributes
+    ----------
+    buckets : List[float]
+        The inclusive upper bounds of the buckets, in increasing order.
+    count : int
+        The number of observations.
+    sum : float
+        The sum of all observations.
+    """
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = sorted(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Returns the cumulative bucket counts, keyed by upper bound, with the count and sum.
+        """
+        with self._lock:
+            cumulative, total = {}, 0
+            for bound, bucket_count in zip(self.buckets + [float("inf")], self._counts):
+                total += bucket_count
+                cumulative[str(bound)] = total
+            return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+class EmbeddingBatcher:
+    """
+    Gathers concurrent single-text embedding calls into batched model calls.
+
+    Callers block on `embed` while a background thread collects queued texts
+    until `max_batch_size` is reached or the oldest one has waited `max_wait`
+    seconds, runs one forward pass for all of them and hands each caller its
+    own vector.
+
+    Attributes
+    ----------
+    max_batch_size : int
+        The maximum number of texts embedded in one model call.
+    max_wait : float
+        The maximum number of seconds a text waits for others to join its batch.
+    batch_sizes : Histogram
+        The distribution of the number of texts per model call.
+    queue_wait : Histogram
+        The distribution of the seconds texts spend queued before their batch starts.
+    """
+    def __init__(self, embed_batch: Callable[[List[str]], List[list]],
+                 max_batch_size: int, max_wait: float) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait = Histogram([0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1])
+        self._embed_batch = embed_batch
+        self._queue: "queue.Queue[Optional[Tuple[str, Future, float]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> list:
+        """
+        Embeds one text as part of the next batch and waits for its vector.
+
+        Parameters
+        ----------
+        text : str
+            The input text for which to generate an embedding.
+
+        Returns
+        -------
+        list
+            The generated embedding as a list of floats.
+        """
+        future: Future = Future()
+        # Checked and enqueued under the lock, so nothing is queued after the sentinel of `close`.
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The embedding batcher is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+            self._queue.put((text, future, time.monotonic()))
+        return future.result()
+
+    def _collect(self, first: Tuple[str, Future, float]) -> Tuple[list, bool]:
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+            started = time.monotonic()
+            for _, _, enqueued in batch:
+                self.queue_wait.observe(started - enqueued)
+            self.batch_sizes.observe(len(batch))
+            try:
+                vectors = self._embed_batch([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        """
+        Returns the batch-size and queue-wait histograms.
+        """
+        return {
+            "batchSize": self.batch_sizes.snapshot(),
+            "queueWaitSeconds": self.queue_wait.snapshot(),
+        }
+
+    def close(self) -> None:
+        """
+        Stops the background thread once the queued texts are embedded.
+
+        Any text still queued after the thread stopped is failed with a
+        RuntimeError, so no caller waits forever.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("The embedding batcher is closed."))
@@ -0,0 +1,186 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+def cache_key(text: str, model_name: str) -> str:
+    """
+    Builds the cache key of a query for a given embedding model.
+
+    The query is normalised by collapsing whitespace and lower-casing it, which is
+    lossless for uncased models such as all-MiniLM-L6-v2.
+    
+    Parameters
+    ----------
+    text : str
+        The raw query text.
+    model_name : str
+        The name of the model producing the embedding.
+    
+    Returns
+    -------
+    str
+        A hex digest identifying the (model, normalised query) pair.
+    """
+    normalised = " ".join(text.split()).lower()
+    return hashlib.sha256(f"{model_name}\n{normalised}".encode("utf-8")).hexdigest()
+
+class EmbeddingCacheBackend:
+    """
+    Base class for persistent stores backing an EmbeddingCache.
+    
+    Backends only mirror the in-memory cache; eviction decisions are taken by
+    the cache itself.
+    """
+    def load(self) -> Iterator[Tuple[str, List[float], float]]:
+        """
+        Yields the stored (key, vector, created_at) entries, oldest first.
+        """
+        return iter(())
+
+    def save(self, key: str, vector: List[float], created_at: float) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class SQLiteEmbeddingCacheBackend(EmbeddingCacheBackend):
+    """
+    Stores cached embeddings as float32 blobs in a SQLite file.
+    
+    Attributes
+    ----------
+    path : str
+        The path of the SQLite database.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def load(self) -> Iterator[Tuple[str, List[float], float]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, vector, created_at FROM embeddings ORDER BY created_at"
+            ).fetchall()
+        for key, blob, created_at in rows:
+            yield key, array("f", blob).tolist(), created_at
+
+    def save(self, key: str, vector: List[float], created_at: float) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, array("f", vector).tobytes(), created_at)
+            )
+            self._connection.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+class EmbeddingCache:
+    """
+    A thread-safe, bounded LRU cache of query embeddings with TTL expiry.
+    
+    Attributes
+    ----------
+    max_size : int
+        The maximum number of embeddings kept in memory.
+    ttl : float
+        The number of seconds an embedding stays valid.
+    backend : EmbeddingCacheBackend
+        The persistent store mirroring the cache, used to start warm after a restart.
+    hits : int
+        The number of lookups answered from the cache.
+    misses : int
+        The number of lookups that required computing the embedding.
+    """
+    def __init__(self, max_size: int, ttl: float,
+                 backend: Optional[EmbeddingCacheBackend] = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend if backend is not None else EmbeddingCacheBackend()
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._warm_up()
+
+    def _warm_up(self) -> None:
+        now = time.time()
+        for key, vector, created_at in self.backend.load():
+            if now - created_at > self.ttl:
+                self.backend.delete(key)
+                continue
+            self._entries[key] = (vector, created_at)
+        while len(self._entries) > self.max_size:
+            key, _ = self._entries.popitem(last=False)
+            self.backend.delete(key)
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """
+        Returns the cached embedding for the key, or None if it is missing or expired.
+        """
+        expired = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+                expired = True
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if expired:
+            self.backend.delete(key)
+        return None if entry is None else entry[0]
+
+    def set(self, key: str, vector: List[float]) -> None:
+        """
+        Stores an embedding, evicting the least recently used entries beyond `max_size`.
+        """
+        created_at = time.time()
+        evicted = []
+        with self._lock:
+            self._entries[key] = (vector, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted.append(self._entries.popitem(last=False)[0])
+        self.backend.save(key, vector, created_at)
+        for evicted_key in evicted:
+            self.backend.delete(evicted_key)
+
+    def stats(self) -> dict:
+        """
+        Returns the size and hit/miss counters of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self.backend.close()
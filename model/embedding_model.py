@@ -1,8 +1,49 @@
+from typing import List, Optional
 from langchain_huggingface import HuggingFaceEmbeddings
 from configurations import config
+from model.embedding_batcher import EmbeddingBatcher
+from model.embedding_cache import EmbeddingCache, SQLiteEmbeddingCacheBackend, cache_key
 
 model_config = config.ModelConfig()
 
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+def backend_model_kwargs(backend: str, int8: bool = False) -> dict:
+    """
+    Builds the SentenceTransformer arguments selecting the runtime of the model.
+
+    The ONNX backend swaps the PyTorch transformer for the ONNX export shipped in
+    the model repository, run by ONNX Runtime on the CPU. Tokenizer, pooling and
+    normalisation are the same SentenceTransformer modules in both cases.
+
+    Parameters
+    ----------
+    backend : str
+        "torch" or "onnx".
+    int8 : bool, optional
+        Whether to load the int8 dynamically quantised ONNX export, `ModelConfig.EMBEDDING_INT8_FILE`.
+
+    Returns
+    -------
+    dict
+        The `model_kwargs` of HuggingFaceEmbeddings.
+    """
+    if backend == "torch":
+        return {}
+    if backend == "onnx":
+        file_name = model_config.EMBEDDING_INT8_FILE if int8 else "onnx/model.onnx"
+        return {"backend": "onnx",
+                "model_kwargs": {"file_name": file_name, "provider": "CPUExecutionProvider"}}
+    raise ValueError(f"Invalid embedding backend '{backend}'. Use one of {', '.join(EMBEDDING_BACKENDS)}.")
+
+def embedding_model_id(backend: str, int8: bool = False) -> str:
+    """
+    Identifies the model and runtime producing an embedding, so cached vectors are never mixed across backends.
+    """
+    if backend == "torch":
+        return model_config.MODEL_NAME
+    return f"{model_config.MODEL_NAME}:{backend}{':int8' if int8 else ''}"
+
 class EmbeddingModel:
     """
     A class to handle the embedding model for text embeddings.
@@ -11,17 +52,47 @@ class EmbeddingModel:
     ----------
     embedding_model : HuggingFaceEmbeddings
         The embedding model used to generate embeddings from text.
+    model_id : str
+        The model name and runtime, part of every embedding cache key.
+    cache : EmbeddingCache
+        The LRU/TTL cache of query embeddings, optionally persisted to disk.
+    batcher : Optional[EmbeddingBatcher]
+        The micro-batcher merging concurrent cache misses into one forward pass, if enabled.
     """
     
-    def __init__(self) -> None:
+    def __init__(self, backend: Optional[str] = None, int8: Optional[bool] = None) -> None:
         """
         Initializes the EmbeddingModel with the specified configuration.
+
+        Parameters
+        ----------
+        backend : str, optional
+            The runtime of the model. Defaults to `ModelConfig.EMBEDDING_BACKEND`.
+        int8 : bool, optional
+            Whether to run the int8 ONNX export. Defaults to `ModelConfig.EMBEDDING_INT8`.
         """
-        self.embedding_model = HuggingFaceEmbeddings(model_name=model_config.MODEL_NAME)
+        backend = backend if backend is not None else model_config.EMBEDDING_BACKEND
+        int8 = int8 if int8 is not None else model_config.EMBEDDING_INT8
+        self.model_id = embedding_model_id(backend, int8)
+        self.embedding_model = HuggingFaceEmbeddings(model_name=model_config.MODEL_NAME,
+                                                     model_kwargs=backend_model_kwargs(backend, int8))
+        backend = (SQLiteEmbeddingCacheBackend(model_config.EMBEDDING_CACHE_PATH)
+                   if model_config.EMBEDDING_CACHE_PATH else None)
+        self.cache = EmbeddingCache(max_size=model_config.EMBEDDING_CACHE_SIZE,
+                                    ttl=model_config.EMBEDDING_CACHE_TTL,
+                                    backend=backend)
+        self.batcher = None
+        if model_config.EMBEDDING_BATCHING:
+            self.batcher = EmbeddingBatcher(self.embedding_model.embed_documents,
+                                            max_batch_size=model_config.EMBEDDING_BATCH_MAX_SIZE,
+                                            max_wait=model_config.EMBEDDING_BATCH_MAX_WAIT_MS / 1000)
     
     def get_embedding(self, text: str) -> list:
         """
-        Generates an embedding for the given text.
+        Generates an embedding for the given text, reusing a cached one when available.
+
+        Cache misses go through the micro-batcher, so concurrent callers share
+        one forward pass of the model.
         
         Parameters
         ----------
@@ -33,4 +104,48 @@ class EmbeddingModel:
         list
             The generated embedding as a list of floats.
         """
-        return self.embedding_model.embed_query(text)
\ No newline at end of file
+        key = cache_key(text, self.model_id)
+        embedding = self.cache.get(key)
+        if embedding is None:
+            if self.batcher is not None:
+                embedding = self.batcher.embed(text)
+            else:
+                embedding = self.embedding_model.embed_query(text)
+            self.cache.set(key, embedding)
+        return embedding
+
+    def get_embeddings(self, texts: List[str]) -> List[list]:
+        """
+        Generates embeddings for several texts, computing all cache misses in one batch.
+        
+        Parameters
+        ----------
+        texts : List[str]
+            The input texts for which to generate embeddings.
+        
+        Returns
+        -------
+        List[list]
+            The generated embeddings, in the order of `texts`.
+        """
+        keys = [cache_key(text, self.model_id) for text in texts]
+        embeddings = [self.cache.get(key) for key in keys]
+        missing = {}
+        for text, key, embedding in zip(texts, keys, embeddings):
+            if embedding is None:
+                missing.setdefault(key, text)
+        if missing:
+            computed = dict(zip(missing, self.embedding_model.embed_documents(list(missing.values()))))
+            for key, embedding in computed.items():
+                self.cache.set(key, embedding)
+            embeddings = [computed[key] if embedding is None else embedding
+                          for key, embedding in zip(keys, embeddings)]
+        return embeddings
+
+    def close(self) -> None:
+        """
+        Stops the micro-batcher and closes the persistent backend of the embedding cache.
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+        self.cache.close()
\ No newline at end of file
@@ -1,38 +1,653 @@
+import json
+import os
+import threading
+import time
+import faiss
+import numpy as np
 from langchain.vectorstores import FAISS
+from langchain.docstore.document import Document
+from model.bm25_index import BM25Index, reciprocal_rank_fusion
+from model.document_store import SQLiteDocumentStore, chunk_id
+from model.metadata_index import MetadataIndex
+from model import index_manifest
 from model.embedding_model import EmbeddingModel
 from configurations import config
+from custom_logger import logger
+from monitoring.metrics import stage
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 model_config = config.ModelConfig()
 
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq_fp16", "sq8")
+# Index types that must be trained on a sample of the vectors before any is added.
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq", "sq8")
+# Index types storing lossy codes, whose shortlists are re-scored from full-precision vectors.
+COMPRESSED_INDEX_TYPES = ("ivf_pq", "sq_fp16", "sq8")
+
 class FAISSIndex:
-    def __init__(self) -> None:
+    """
+    One version of the index: the vectors, documents, BM25 and metadata indexes of a folder.
+
+    A running server swaps in a new version without restarting. Requests
+    `acquire` the version current when they start and `release` it when they end,
+    and a replaced version is closed by `retire` once its last request releases it.
+
+    Attributes
+    ----------
+    folder : str
+        The folder holding the index files.
+    vectors : Optional[np.ndarray]
+        The memory-mapped full-precision vectors of a compressed index, used for exact re-ranking.
+    mmap : bool
+        Whether the index was loaded memory-mapped, and so read-only.
+    refs : int
+        The number of requests currently using this version.
+    """
+    def __init__(self, folder: Optional[str] = None,
+                 embedding_model: Optional[EmbeddingModel] = None) -> None:
         """
         Initializes the FAISS index loader with the model configuration.
+
+        Parameters
+        ----------
+        folder : str, optional
+            The folder of the index files. Defaults to the current version of `ModelConfig.INDEX_PATH`.
+        embedding_model : EmbeddingModel, optional
+            A shared embedding model, left open by `close`. Defaults to a new EmbeddingModel owned by the index.
+        """
+        self.folder = folder if folder is not None else index_manifest.current_folder(model_config.INDEX_PATH)
+        self._owns_embedding_model = embedding_model is None
+        self.embedding_model = embedding_model if embedding_model is not None else EmbeddingModel()
+        self.refs = 0
+        self._retired = False
+        self._refs_lock = threading.Lock()
+        self.version: str = ""
+        self.vectorstore: Optional[FAISS] = None
+        self.document_store: Optional[SQLiteDocumentStore] = None
+        self.bm25_index: Optional[BM25Index] = None
+        self.metadata_index: Optional[MetadataIndex] = None
+        self.live: Optional[np.ndarray] = None
+        self.live_bitmap: Optional[np.ndarray] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.mmap = False
+
+    def _factory_string(self, num_vectors: int) -> str:
+        """
+        Builds the `faiss.index_factory` description of the configured index type.
+
+        Parameters
+        ----------
+        num_vectors : int
+            The number of vectors to index, used to cap the number of IVF lists.
+
+        Returns
+        -------
+        str
+            The factory string, e.g. "IVF256,Flat".
+        """
+        index_type = model_config.INDEX_TYPE
+        # Faiss needs about 39 training points per IVF centroid.
+        nlist = max(1, min(model_config.IVF_NLIST, num_vectors // 39))
+        if index_type == "flat":
+            return "Flat"
+        if index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+        if index_type == "hnsw":
+            return f"HNSW{model_config.HNSW_M},Flat"
+        if index_type == "ivf_pq":
+            if num_vectors < 2 ** model_config.PQ_NBITS:
+                return "Flat"
+            return f"IVF{nlist},PQ{model_config.PQ_M}x{model_config.PQ_NBITS}"
+        if index_type == "sq_fp16":
+            return "SQfp16"
+        if index_type == "sq8":
+            return "SQ8"
+        raise ValueError(f"Invalid index type '{index_type}'. Use one of {', '.join(INDEX_TYPES)}.")
+
+    def _build_faiss_index(self, vectors: np.ndarray) -> Any:
         """
-        self.embedding_model = EmbeddingModel()
-    
+        Creates an empty FAISS index of the configured type, trained on a sample of the vectors.
+
+        Parameters
+        ----------
+        vectors : np.ndarray
+            The float32 matrix of document embeddings.
+
+        Returns
+        -------
+        faiss.Index
+            The trained index, ready for vectors to be added.
+        """
+        num_training = min(len(vectors), model_config.TRAIN_SAMPLE_SIZE)
+        index = faiss.index_factory(vectors.shape[1], self._factory_string(num_training), faiss.METRIC_L2)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efConstruction = model_config.HNSW_EF_CONSTRUCTION
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > model_config.TRAIN_SAMPLE_SIZE:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), model_config.TRAIN_SAMPLE_SIZE, replace=False)]
+            index.train(sample)
+        return index
+
     def create_index(self, documents) -> str:
         """
         Creates a FAISS index from the provided documents.
-        
+
+        The index type is selected by `ModelConfig.INDEX_TYPE`. Approximate types
+        (IVF-Flat, IVF-PQ, SQ8) are trained on a sample of the embeddings. Vectors are
+        written to `index.faiss` and documents to a SQLite document store next to it.
+        Compressed types also keep the full-precision vectors in `vectors.f32` for re-ranking.
+
         Parameters
         ----------
         documents : list of Document
             The documents to be indexed.
         """
-        self.vectorstore = FAISS.from_documents(documents, self.embedding_model.embedding_model)
-        self.vectorstore.save_local(model_config.INDEX_PATH)
-        return model_config.INDEX_PATH
-    
-    def load_index(self) -> FAISS:
+        return self.build_index([documents], resume=False)
+
+    def build_index(self, batches: Iterable[List[Document]], resume: bool = True) -> str:
+        """
+        Builds the FAISS index from batches of documents, adding them incrementally.
+
+        Each batch is embedded and added on its own, so memory holds one batch of
+        texts and vectors besides the index. Every `ModelConfig.INGEST_CHECKPOINT_EVERY`
+        batches the partial index is written next to a checkpoint recording how
+        many batches it holds. A build interrupted by a crash resumes from its
+        last checkpoint when it is run again with the same batches, which are then
+        skipped until the first unindexed one. IVF indexes are trained on the first
+        `ModelConfig.TRAIN_SAMPLE_SIZE` vectors, buffered before anything is added.
+
+        Parameters
+        ----------
+        batches : Iterable[List[Document]]
+            The documents to index, in a deterministic order of batches.
+        resume : bool, optional
+            Whether to resume from a checkpoint left by an interrupted build.
+
+        Returns
+        -------
+        str
+            The folder holding the index.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        index_path = os.path.join(self.folder, model_config.INDEX_FILE_NAME)
+        checkpoint_path = os.path.join(self.folder, model_config.CHECKPOINT_FILE_NAME)
+        docstore_path = os.path.join(self.folder, model_config.DOCSTORE_FILE_NAME)
+        vectors_path = os.path.join(self.folder, model_config.VECTORS_FILE_NAME)
+        compressed = model_config.INDEX_TYPE in COMPRESSED_INDEX_TYPES
+
+        index, done, checkpoint = None, 0, None
+        if resume and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        if checkpoint is not None:
+            done = checkpoint["batches"]
+            index = faiss.read_index(os.path.join(self.folder, checkpoint["indexFile"]))
+            self.document_store = SQLiteDocumentStore(docstore_path)
+            self.document_store.truncate(index.ntotal)
+            logger._log(f"Resuming the index build after {done} batches and {index.ntotal} documents.")
+        else:
+            for path in [docstore_path, checkpoint_path, vectors_path] + self._partial_files():
+                if os.path.exists(path):
+                    os.remove(path)
+            self.document_store = SQLiteDocumentStore(docstore_path)
+
+        # Documents and vectors waiting for enough vectors to train an IVF index.
+        pending: List[Tuple[List[Document], np.ndarray]] = []
+        pending_vectors = batch_number = indexed = 0
+        started = time.perf_counter()
+        for batch_number, documents in enumerate(batches, start=1):
+            if batch_number <= done:
+                continue
+            if documents:
+                vectors = np.asarray(self.embedding_model.embedding_model.embed_documents(
+                    [document.page_content for document in documents]), dtype=np.float32)
+                pending.append((documents, vectors))
+                pending_vectors += len(vectors)
+                indexed += len(documents)
+            trainable = (model_config.INDEX_TYPE not in TRAINED_INDEX_TYPES
+                         or pending_vectors >= model_config.TRAIN_SAMPLE_SIZE)
+            if index is None and pending and trainable:
+                index = self._build_faiss_index(np.concatenate([vectors for _, vectors in pending]))
+            if index is not None:
+                for documents, vectors in pending:
+                    self.document_store.append(index.ntotal, documents)
+                    if compressed:
+                        self._append_vectors(vectors, index.ntotal)
+                    index.add(vectors)
+                pending, pending_vectors = [], 0
+                if batch_number % model_config.INGEST_CHECKPOINT_EVERY == 0:
+                    self._write_checkpoint(index, checkpoint_path, batch_number)
+            elapsed = time.perf_counter() - started
+            logger._log("Batch %d: %d documents indexed in %.1fs (%.1f docs/sec).",
+                        batch_number, indexed, elapsed, indexed / max(elapsed, 1e-9))
+
+        if index is None:
+            if not pending:
+                raise ValueError("No documents to index.")
+            index = self._build_faiss_index(np.concatenate([vectors for _, vectors in pending]))
+        for documents, vectors in pending:
+            self.document_store.append(index.ntotal, documents)
+            if compressed:
+                self._append_vectors(vectors, index.ntotal)
+            index.add(vectors)
+
+        faiss.write_index(index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        for path in [checkpoint_path] + self._partial_files():
+            if os.path.exists(path):
+                os.remove(path)
+        self.vectorstore = FAISS(embedding_function=self.embedding_model.embedding_model,
+                                 index=index,
+                                 docstore=self.document_store,
+                                 index_to_docstore_id=self.document_store.index_to_docstore_id)
+        self.vectors = self._open_vectors(index)
+        return self.folder
+
+    def _append_vectors(self, vectors: np.ndarray, position: int) -> None:
+        """
+        Writes full-precision vectors at a FAISS position of the vectors file.
+
+        Rows past `position`, left by an interrupted build or an unsaved update,
+        are dropped first, so the file always lines up with the index.
+        """
+        with open(os.path.join(self.folder, model_config.VECTORS_FILE_NAME), "ab") as f:
+            f.truncate(position * vectors.shape[1] * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+    def _open_vectors(self, index: Any) -> Optional[np.ndarray]:
+        """
+        Memory-maps the full-precision vectors of the index, if it has a vectors file.
+        """
+        path = os.path.join(self.folder, model_config.VECTORS_FILE_NAME)
+        if not os.path.exists(path) or index.ntotal == 0:
+            return None
+        return np.memmap(path, dtype=np.float32, mode="r", shape=(index.ntotal, index.d))
+
+    def _partial_files(self) -> List[str]:
+        prefix = model_config.INDEX_FILE_NAME + "."
+        return [os.path.join(self.folder, name) for name in os.listdir(self.folder)
+                if name.startswith(prefix) and name.endswith(".partial")]
+
+    def _write_checkpoint(self, index: Any, checkpoint_path: str, batches: int) -> None:
+        """
+        Writes the partial index to a new file, then atomically points the checkpoint at it.
+
+        A crash at any point leaves the previous checkpoint and its partial index intact.
+        """
+        previous = self._partial_files()
+        index_file = f"{model_config.INDEX_FILE_NAME}.{batches}.partial"
+        faiss.write_index(index, os.path.join(self.folder, index_file))
+        with open(checkpoint_path + ".tmp", "w") as f:
+            json.dump({"batches": batches, "vectors": index.ntotal, "indexFile": index_file}, f)
+        os.replace(checkpoint_path + ".tmp", checkpoint_path)
+        for path in previous:
+            if not path.endswith(index_file):
+                os.remove(path)
+        logger._log(f"Checkpoint written after {batches} batches and {index.ntotal} documents.")
+
+    def load_index(self, mmap: Optional[bool] = None) -> FAISS:
         """
         Loads the FAISS index from the local path.
-        
+
+        In mmap mode the vector file is memory-mapped instead of copied onto the
+        heap, so startup does not scale with the index size and every worker on
+        the host shares the same pages of the OS page cache. A memory-mapped
+        index and its document store are opened read-only. Documents stay in
+        SQLite and are fetched only for the ids returned by a search. The BM25
+        and metadata indexes are loaded too when they were built next to the vectors,
+        and positions whose documents were deleted are excluded from every search.
+        The full-precision vectors of a compressed index are always memory-mapped,
+        so only the rows of re-ranked candidates are paged in.
+
+        Parameters
+        ----------
+        mmap : bool, optional
+            Whether to memory-map the vector file. Defaults to `ModelConfig.INDEX_MMAP`.
+
         Returns
         -------
         FAISS
             The loaded FAISS index.
         """
-        return FAISS.load_local(model_config.INDEX_PATH, 
-                                self.embedding_model.embedding_model, 
-                                allow_dangerous_deserialization=True)
\ No newline at end of file
+        if mmap is None:
+            mmap = model_config.INDEX_MMAP
+        self.mmap = mmap
+        self.version = self.index_version()
+        index_path = os.path.join(self.folder, model_config.INDEX_FILE_NAME)
+        index = self._read_index_mmap(index_path) if mmap else faiss.read_index(index_path)
+        self.document_store = SQLiteDocumentStore(
+            os.path.join(self.folder, model_config.DOCSTORE_FILE_NAME), read_only=mmap)
+        self.vectorstore = FAISS(embedding_function=self.embedding_model.embedding_model,
+                                 index=index,
+                                 docstore=self.document_store,
+                                 index_to_docstore_id=self.document_store.index_to_docstore_id)
+        self.bm25_index = BM25Index.load(self.folder)
+        self.metadata_index = MetadataIndex.load(self.folder)
+        self.vectors = self._open_vectors(index)
+        self.live = self.live_bitmap = None
+        if len(self.document_store.index_to_docstore_id) < index.ntotal:
+            self._set_live(self.document_store.live_positions(index.ntotal))
+        return self.vectorstore
+
+    def _set_live(self, live: np.ndarray) -> None:
+        """
+        Records which FAISS positions hold a document, packing them into the bitmap used as a selector.
+        """
+        self.live = None if live.all() else live
+        self.live_bitmap = None if self.live is None else np.packbits(live, bitorder="little")
+
+    def _live(self) -> np.ndarray:
+        num_vectors = self.vectorstore.index.ntotal
+        if self.live is None:
+            return np.ones(num_vectors, dtype=bool)
+        return np.concatenate([self.live, np.ones(num_vectors - len(self.live), dtype=bool)])
+
+    def upsert_documents(self, documents: Sequence[Document]) -> Tuple[int, int]:
+        """
+        Adds or replaces the chunks of source documents, embedding only what changed.
+
+        Chunks are grouped by the `doc_id` of their metadata. A document whose stored
+        chunks have the same texts and metadata is skipped. Otherwise its old chunks
+        are deleted and the new ones are embedded and appended at the next FAISS
+        positions, along with their BM25 and metadata entries. The index must be
+        loaded with `mmap=False`, otherwise a RuntimeError is raised, and `save`
+        persists the changes.
+
+        Parameters
+        ----------
+        documents : Sequence[Document]
+            The chunks of the documents to upsert, as produced by DocumentChunker.
+
+        Returns
+        -------
+        Tuple[int, int]
+            The numbers of chunks added and deleted.
+        """
+        self._require_writable("upsert documents")
+        # Drop chunks stored by an earlier upsert whose vectors were never saved.
+        self.document_store.truncate(self.vectorstore.index.ntotal)
+        grouped: Dict[str, List[Document]] = {}
+        for document in documents:
+            grouped.setdefault(document.metadata["doc_id"], []).append(document)
+        stored = self.document_store.chunks_of(grouped)
+        added: List[Document] = []
+        deleted: List[int] = []
+        for doc_id, chunks in grouped.items():
+            old = stored.get(doc_id, [])
+            if [(chunk_id(chunk), chunk.page_content, chunk.metadata) for chunk in chunks] == \
+                    [(document.id, document.page_content, document.metadata) for _, document in old]:
+                continue
+            deleted.extend(faiss_id for faiss_id, _ in old)
+            added.extend(chunks)
+        self._delete_positions(deleted)
+        if added:
+            vectors = np.asarray(self.embedding_model.embedding_model.embed_documents(
+                [document.page_content for document in added]), dtype=np.float32)
+            index = self.vectorstore.index
+            first = index.ntotal
+            self.document_store.append(first, added)
+            if self.vectors is not None:
+                self._append_vectors(vectors, first)
+            index.add(vectors)
+            if self.vectors is not None:
+                self.vectors = self._open_vectors(index)
+            if self.bm25_index is not None:
+                self.bm25_index.add([document.page_content for document in added])
+            if self.metadata_index is not None:
+                self.metadata_index.add(document.metadata for document in added)
+            if self.live is not None:
+                self._set_live(self._live())
+        return len(added), len(deleted)
+
+    def delete_documents(self, doc_ids: Iterable[str]) -> int:
+        """
+        Deletes every chunk of the given source documents.
+
+        The vectors stay in the FAISS index but their positions are excluded from
+        every search, so nothing is re-embedded or renumbered. The index must be
+        loaded with `mmap=False`, otherwise a RuntimeError is raised, and `save`
+        persists the changes.
+
+        Parameters
+        ----------
+        doc_ids : Iterable[str]
+            The ids of the source documents.
+
+        Returns
+        -------
+        int
+            The number of chunks deleted.
+        """
+        self._require_writable("delete documents")
+        stored = self.document_store.chunks_of(doc_ids)
+        deleted = [faiss_id for chunks in stored.values() for faiss_id, _ in chunks]
+        self._delete_positions(deleted)
+        return len(deleted)
+
+    def _require_writable(self, action: str) -> None:
+        # A memory-mapped index has read-only FAISS codes and a read-only document store,
+        # so an update would fail partway through.
+        if self.mmap:
+            raise RuntimeError(f"Cannot {action}: the index at {self.folder} was loaded with mmap; "
+                               f"load it with load_index(mmap=False) to update it.")
+
+    def _delete_positions(self, faiss_ids: List[int]) -> None:
+        if not faiss_ids:
+            return
+        self.document_store.delete_positions(faiss_ids)
+        live = self._live()
+        live[faiss_ids] = False
+        self._set_live(live)
+
+    def save(self) -> None:
+        """
+        Persists an index changed by `upsert_documents` or `delete_documents`.
+
+        Document changes are already committed to SQLite and full-precision
+        vectors appended to their file. The FAISS index, BM25 and metadata
+        indexes are each written to a temporary file and atomically renamed,
+        so a process memory-mapping the previous files keeps reading them. A
+        memory-mapped index cannot be saved and raises a RuntimeError.
+        """
+        self._require_writable("save the index")
+        index_path = os.path.join(self.folder, model_config.INDEX_FILE_NAME)
+        faiss.write_index(self.vectorstore.index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        if self.bm25_index is not None:
+            self.bm25_index.save(self.folder)
+        if self.metadata_index is not None:
+            self.metadata_index.save(self.folder)
+        self.version = self.index_version()
+
+    @staticmethod
+    def _read_index_mmap(path: str) -> Any:
+        """
+        Reads a FAISS index with its vectors memory-mapped from disk.
+
+        Flat, HNSW and scalar-quantised codes are mapped with `IO_FLAG_MMAP_IFC`.
+        IVF inverted lists only support `IO_FLAG_MMAP`, which faiss signals by
+        refusing the combined flags.
+        """
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC)
+        except RuntimeError:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+
+    def _search_parameters(self, k: int,
+                           nprobe: Optional[int] = None,
+                           ef_search: Optional[int] = None,
+                           bitmap: Optional[np.ndarray] = None) -> Optional[Any]:
+        """
+        Builds per-call search parameters, so concurrent requests never share mutable index state.
+
+        A bitmap of allowed positions becomes an id selector, so FAISS skips the
+        other vectors during the scan instead of the results being filtered afterwards.
+        """
+        index = self.vectorstore.index
+        options = {} if bitmap is None else {"sel": faiss.IDSelectorBitmap(bitmap)}
+        if faiss.try_extract_index_ivf(index) is not None:
+            return faiss.SearchParametersIVF(nprobe=nprobe or model_config.NPROBE, **options)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=max(k, ef_search or model_config.EF_SEARCH), **options)
+        return faiss.SearchParameters(**options) if options else None
+
+    def search(self, vectors: np.ndarray, k: int,
+               nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None,
+               queries: Optional[Sequence[str]] = None,
+               filters: Optional[Mapping[str, Sequence[str]]] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Searches the index for the nearest documents of one or more query vectors.
+
+        When the query texts are given and a BM25 index is loaded, the top
+        `ModelConfig.HYBRID_CANDIDATES` dense and lexical candidates of each
+        query are merged with reciprocal-rank fusion, so exact matches on rare
+        words are found without raising k. Filters restrict both searches to
+        the chunks of the given authors and categories. On a compressed index,
+        `ModelConfig.RERANK_FACTOR` times more candidates are found on the codes
+        and re-scored exactly from the full-precision vectors.
+
+        Parameters
+        ----------
+        vectors : np.ndarray
+            The float32 matrix of query embeddings, one row per query.
+        k : int
+            The number of documents to return per query.
+        nprobe : int, optional
+            The number of IVF lists to visit. Defaults to `ModelConfig.NPROBE`.
+        ef_search : int, optional
+            The HNSW search queue size. Defaults to `ModelConfig.EF_SEARCH`.
+        queries : Sequence[str], optional
+            The query texts, one per row of `vectors`, enabling hybrid search.
+        filters : Mapping[str, Sequence[str]], optional
+            The accepted authors and categories, applied to every query as a pre-filter.
+
+        Returns
+        -------
+        List[List[Tuple[Document, float]]]
+            For each query, the documents and their L2 distances, closest first,
+            or their fused scores, highest first, in hybrid search.
+        """
+        # Deleted positions are excluded like filtered-out ones.
+        bitmap = self.live_bitmap
+        if filters:
+            if self.metadata_index is None:
+                raise ValueError("Filtered search needs a metadata index, rebuild the index with seed_index.")
+            with stage("metadata_filter"):
+                selected = self.metadata_index.select(filters)
+            if selected is not None:
+                bitmap = selected if bitmap is None else selected & bitmap
+        if bitmap is not None and not bitmap.any():
+            return [[] for _ in vectors]
+        hybrid = model_config.HYBRID_SEARCH and queries is not None and self.bm25_index is not None
+        search_k = max(k, model_config.HYBRID_CANDIDATES) if hybrid else k
+        rerank = self.vectors is not None and model_config.RERANK_FACTOR > 0
+        shortlist_k = search_k * model_config.RERANK_FACTOR if rerank else search_k
+        params = self._search_parameters(shortlist_k, nprobe, ef_search, bitmap)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with stage("faiss_search"):
+            scores, indices = self.vectorstore.index.search(vectors, shortlist_k, params=params)
+        if rerank:
+            with stage("rerank"):
+                scores, indices = self._rerank(vectors, indices, search_k)
+        if hybrid:
+            mask = None if bitmap is None else np.unpackbits(bitmap, bitorder="little").astype(bool)
+            rankings = []
+            with stage("bm25"):
+                for query, row_indices in zip(queries, indices):
+                    lexical, _ = self.bm25_index.search(query, model_config.HYBRID_CANDIDATES, mask)
+                    # -1 marks missing results when fewer than k documents match.
+                    rankings.append(reciprocal_rank_fusion([row_indices[row_indices != -1], lexical],
+                                                           k, model_config.RRF_K))
+        else:
+            rankings = [[(int(i), float(score)) for score, i in zip(row_scores, row_indices) if i != -1]
+                        for row_scores, row_indices in zip(scores, indices)]
+        with stage("docstore"):
+            found = self.document_store.documents_at(sorted({i for ranking in rankings for i, _ in ranking}))
+        return [[(found[i], score) for i, score in ranking if i in found] for ranking in rankings]
+
+    def _rerank(self, vectors: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Re-scores the shortlist of each query with exact L2 distances to the full-precision vectors.
+
+        Parameters
+        ----------
+        vectors : np.ndarray
+            The float32 matrix of query embeddings.
+        indices : np.ndarray
+            The FAISS positions of the shortlists found on the compressed vectors, -1 when missing.
+        k : int
+            The number of candidates kept per query.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            The exact squared L2 distances and positions of the `k` closest candidates, as returned by FAISS.
+        """
+        scores = np.full((len(vectors), k), np.inf, dtype=np.float32)
+        reranked = np.full((len(vectors), k), -1, dtype=np.int64)
+        for row, (query, candidates) in enumerate(zip(vectors, indices)):
+            # Sorted positions read the memory-mapped rows in file order.
+            candidates = np.sort(candidates[candidates != -1])
+            if not len(candidates):
+                continue
+            distances = np.sum((self.vectors[candidates] - query) ** 2, axis=1)
+            order = np.argsort(distances)[:k]
+            scores[row, :len(order)] = distances[order]
+            reranked[row, :len(order)] = candidates[order]
+        return scores, reranked
+
+    def index_version(self) -> str:
+        """
+        Identifies the index on disk by the modification time and size of its vector file.
+
+        Returns
+        -------
+        str
+            A version string that changes whenever the index is rebuilt.
+        """
+        stat = os.stat(os.path.join(self.folder, model_config.INDEX_FILE_NAME))
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def acquire(self) -> "FAISSIndex":
+        """
+        Marks the index as used by one more request.
+        """
+        with self._refs_lock:
+            self.refs += 1
+        return self
+
+    def release(self) -> None:
+        """
+        Marks one request as done with the index, closing it if it was retired and this was the last one.
+        """
+        with self._refs_lock:
+            self.refs -= 1
+            drained = self._retired and self.refs == 0
+        if drained:
+            self.close()
+
+    def retire(self) -> None:
+        """
+        Closes the index once the requests still using it have released it.
+        """
+        with self._refs_lock:
+            self._retired = True
+            drained = self.refs == 0
+        if drained:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Releases the vectors, the document store and, if owned, the resources held by the embedding model.
+        """
+        if self.document_store is not None:
+            self.document_store.close()
+        self.vectorstore = None
+        self.vectors = None
+        if self._owns_embedding_model:
+            self.embedding_model.close()
+        logger._log(f"FAISS index at {self.folder} closed.")
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+from configurations import config
+
+model_config = config.ModelConfig()
+
+VERSIONS_DIR = "versions"
+STAGING_DIR = "staging"
+
+def read_manifest(root: str) -> Optional[dict]:
+    """
+    Reads the manifest of an index root, or returns None when the root has no manifest.
+    """
+    path = os.path.join(root, model_config.MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def current_folder(root: str) -> str:
+    """
+    Returns the folder holding the current index version.
+
+    Published versions live in `root/versions/<version>/` and the manifest names
+    the current one. A root without a manifest holds its index files directly.
+
+    Parameters
+    ----------
+    root : str
+        The index root, usually `ModelConfig.INDEX_PATH`.
+
+    Returns
+    -------
+    str
+        The folder to load the index files from.
+    """
+    manifest = read_manifest(root)
+    if manifest is None:
+        return root
+    return os.path.join(root, VERSIONS_DIR, manifest["version"])
+
+def staging_folder(root: str) -> str:
+    """
+    Returns the folder a new version is built in, kept across runs so an interrupted build resumes.
+    """
+    return os.path.join(root, STAGING_DIR)
+
+def publish(root: str, folder: str) -> str:
+    """
+    Publishes a fully built index folder as the current version.
+
+    The folder is moved to `root/versions/<version>/`, then the manifest is
+    atomically replaced to point at it, so readers see either the previous
+    version or the complete new one. Old versions are then pruned.
+
+    Parameters
+    ----------
+    root : str
+        The index root holding the manifest.
+    folder : str
+        The folder holding the new index files, usually the staging folder.
+
+    Returns
+    -------
+    str
+        The folder of the published version.
+    """
+    now = time.time_ns()
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now // 10 ** 9)) + f"{now % 10 ** 9:09d}"
+    versions = os.path.join(root, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    published = os.path.join(versions, version)
+    os.replace(folder, published)
+
+    manifest_path = os.path.join(root, model_config.MANIFEST_FILE_NAME)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump({"version": version, "publishedAt": now / 10 ** 9}, f)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    prune(root)
+    return published
+
+def prune(root: str) -> None:
+    """
+    Removes the oldest versions beyond `ModelConfig.INDEX_KEEP_VERSIONS`; a process still reading one keeps its open files.
+    """
+    versions = os.path.join(root, VERSIONS_DIR)
+    if not os.path.isdir(versions):
+        return
+    for old in sorted(os.listdir(versions))[:-max(1, model_config.INDEX_KEEP_VERSIONS)]:
+        shutil.rmtree(os.path.join(versions, old), ignore_errors=True)
@@ -0,0 +1,161 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from configurations import config
+
+model_config = config.ModelConfig()
+
+METADATA_FIELDS = ("author", "category")
+
+def normalise_value(value: str) -> str:
+    """
+    Normalises a metadata value so filters match regardless of case and surrounding spaces.
+    """
+    return " ".join(value.split()).lower()
+
+class MetadataIndex:
+    """
+    An inverted index from metadata values to the FAISS positions of their chunks.
+
+    Each value keeps the sorted positions of its chunks. The first time a value
+    is filtered on, they are turned into a packed bitmap over all positions,
+    which is cached. Combining filters is then a bitwise OR/AND of a few bitmaps
+    of `num_chunks / 8` bytes, whatever the number of matching chunks, and the
+    result is handed to FAISS as an id selector.
+
+    Attributes
+    ----------
+    num_chunks : int
+        The number of FAISS positions covered by the bitmaps.
+    postings : Dict[str, Dict[str, np.ndarray]]
+        For each field, the sorted positions of the chunks of each value.
+    """
+    def __init__(self, num_chunks: int, postings: Dict[str, Dict[str, np.ndarray]]) -> None:
+        self.num_chunks = num_chunks
+        self.postings = postings
+        self._bitmaps: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, metadatas: Iterable[Mapping]) -> "MetadataIndex":
+        """
+        Builds the index from the chunk metadata, in FAISS position order.
+
+        Parameters
+        ----------
+        metadatas : Iterable[Mapping]
+            The metadata of every chunk. A field may hold a single value or a list of values.
+
+        Returns
+        -------
+        MetadataIndex
+            The built index.
+        """
+        index = cls(0, {field: {} for field in METADATA_FIELDS})
+        index.add(metadatas)
+        return index
+
+    def add(self, metadatas: Iterable[Mapping]) -> None:
+        """
+        Appends chunks stored at the next FAISS positions.
+
+        Parameters
+        ----------
+        metadatas : Iterable[Mapping]
+            The metadata of the new chunks. A field may hold a single value or a list of values.
+        """
+        positions: Dict[str, Dict[str, List[int]]] = {field: {} for field in METADATA_FIELDS}
+        num_chunks = self.num_chunks
+        for position, metadata in enumerate(metadatas, start=self.num_chunks):
+            num_chunks = position + 1
+            for field in METADATA_FIELDS:
+                values = metadata.get(field) or []
+                for value in [values] if isinstance(values, str) else values:
+                    if value:
+                        positions[field].setdefault(normalise_value(value), []).append(position)
+        for field, values in positions.items():
+            postings = self.postings.setdefault(field, {})
+            for value, ids in values.items():
+                new = np.asarray(ids, dtype=np.int64)
+                postings[value] = np.concatenate([postings[value], new]) if value in postings else new
+        with self._lock:
+            self.num_chunks = num_chunks
+            self._bitmaps.clear()
+
+    def _bitmap(self, field: str, value: str) -> np.ndarray:
+        key = (field, value)
+        with self._lock:
+            bitmap = self._bitmaps.get(key)
+            if bitmap is not None:
+                self._bitmaps.move_to_end(key)
+                return bitmap
+        mask = np.zeros(self.num_chunks, dtype=bool)
+        ids = self.postings.get(field, {}).get(value)
+        if ids is not None:
+            mask[ids] = True
+        bitmap = np.packbits(mask, bitorder="little")
+        with self._lock:
+            self._bitmaps[key] = bitmap
+            if len(self._bitmaps) > model_config.METADATA_BITMAP_CACHE_SIZE:
+                self._bitmaps.popitem(last=False)
+        return bitmap
+
+    def select(self, filters: Mapping[str, Sequence[str]]) -> Optional[np.ndarray]:
+        """
+        Builds the bitmap of the positions matching the filters.
+
+        Values of the same field are alternatives and fields must all match,
+        e.g. {"author": ["Rumi", "Hafez"], "category": ["love"]}.
+
+        Parameters
+        ----------
+        filters : Mapping[str, Sequence[str]]
+            The accepted values of each filtered field.
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            The packed little-endian bitmap of the matching positions, or None when nothing is filtered.
+        """
+        selected = None
+        for field, values in filters.items():
+            if not values:
+                continue
+            if field not in self.postings:
+                raise ValueError(f"Invalid filter field '{field}'. Use one of {', '.join(METADATA_FIELDS)}.")
+            field_bitmap = np.bitwise_or.reduce([self._bitmap(field, normalise_value(value)) for value in values])
+            selected = field_bitmap if selected is None else selected & field_bitmap
+        return selected
+
+    def save(self, folder_path: str) -> None:
+        """
+        Writes the postings of every field next to the FAISS index.
+        """
+        arrays = {"num_chunks": np.asarray(self.num_chunks)}
+        for field, values in self.postings.items():
+            names = sorted(values)
+            arrays[f"{field}_values"] = np.asarray(names, dtype=str)
+            arrays[f"{field}_indptr"] = np.cumsum([0] + [len(values[name]) for name in names])
+            arrays[f"{field}_positions"] = (np.concatenate([values[name] for name in names])
+                                            if names else np.empty(0, dtype=np.int64))
+        np.savez(os.path.join(folder_path, model_config.METADATA_INDEX_FILE_NAME), **arrays)
+
+    @classmethod
+    def load(cls, folder_path: str) -> Optional["MetadataIndex"]:
+        """
+        Loads the index saved in the folder, or returns None if there is none.
+        """
+        path = os.path.join(folder_path, model_config.METADATA_INDEX_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as arrays:
+            postings = {}
+            for field in METADATA_FIELDS:
+                names, indptr = arrays[f"{field}_values"], arrays[f"{field}_indptr"]
+                positions = arrays[f"{field}_positions"]
+                postings[field] = {str(name): positions[indptr[i]:indptr[i + 1]] for i, name in enumerate(names)}
+            return cls(int(arrays["num_chunks"]), postings)
@@ -4,6 +4,7 @@ load_dotenv()
 from langchain_openai import ChatOpenAI
 from langchain.schema import SystemMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
+from typing import AsyncIterator
 
 from configurations import config
 model_config = config.ModelConfig()
@@ -23,7 +24,34 @@ class OpenAIModel:
         Initializes the OpenAI model with the specified configuration.
         """
         self.llm = ChatOpenAI(model=model_config.OPENAI_MODEL_NAME)
+
+    def close(self) -> None:
+        """
+        Closes the HTTP connection pool of the underlying OpenAI client.
+        """
+        root_client = getattr(self.llm, "root_client", None)
+        if root_client is not None:
+            root_client.close()
+
+    async def aclose(self) -> None:
+        """
+        Closes the HTTP connection pool of the async OpenAI client used by `ainvoke` and `astream`.
+        """
+        root_async_client = getattr(self.llm, "root_async_client", None)
+        if root_async_client is not None:
+            await root_async_client.close()
     
+    def _build_request(self, query: str, functions: list) -> tuple:
+        messages = [
+            SystemMessage(content="You are a wise advisor. Based on the following advice fragments, answer the user's question thoughtfully."),
+            HumanMessage(content=query)
+        ]
+        config_dict: RunnableConfig = { 
+            "tools": functions if functions else [],
+            "tool_choice": "auto" if functions else "none"
+        }
+        return messages, config_dict
+
     def generate_response(self, query: str, functions: list) -> str:
         """
         Generates a response based on the input query.
@@ -38,19 +66,61 @@ class OpenAIModel:
         str
             The generated response.
         """
-        messages = [
-            SystemMessage(content="You are a wise advisor. Based on the following advice fragments, answer the user's question thoughtfully."),
-            HumanMessage(content=query)
-        ]
-        config_dict: RunnableConfig = { 
-            "tools": functions if functions else [],
-            "tool_choice": "auto" if functions else "none"
-        }
+        messages, config_dict = self._build_request(query, functions)
         try:
             output = self.llm.invoke(
                 input=messages,
                 config=config_dict
             )
             return str(output.content)
+        except Exception as e:
+            raise RuntimeError(f"Error generating response: {e}")
+
+    async def agenerate_response(self, query: str, functions: list) -> str:
+        """
+        Generates a response based on the input query using the async OpenAI client.
+        
+        Parameters
+        ----------
+        query : str
+            The input query for which to generate a response.
+        
+        Returns
+        -------
+        str
+            The generated response.
+        """
+        messages, config_dict = self._build_request(query, functions)
+        try:
+            output = await self.llm.ainvoke(
+                input=messages,
+                config=config_dict
+            )
+            return str(output.content)
+        except Exception as e:
+            raise RuntimeError(f"Error generating response: {e}")
+
+    async def astream_response(self, query: str, functions: list) -> AsyncIterator[str]:
+        """
+        Streams the response to the input query token by token.
+        
+        Parameters
+        ----------
+        query : str
+            The input query for which to generate a response.
+        
+        Yields
+        ------
+        str
+            The content of each generated chunk, as soon as it arrives.
+        """
+        messages, config_dict = self._build_request(query, functions)
+        try:
+            async for chunk in self.llm.astream(
+                input=messages,
+                config=config_dict
+            ):
+                if chunk.content:
+                    yield str(chunk.content)
         except Exception as e:
             raise RuntimeError(f"Error generating response: {e}")
\ No newline at end of file
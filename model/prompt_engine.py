@@ -1,12 +1,15 @@
 from configurations import config
-from model.openai_model import OpenAIModel
+from model.token_counter import count_tokens
 
 from typing import List, Tuple, Any
 from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 model_config = config.ModelConfig()
 
+CHUNK_SEPARATOR = "\n\n"
+# Tokens by which a chunk boundary can make the summed counts undercount the joined context.
+BOUNDARY_TOKEN_MARGIN = 2
+
 class PromptEngine:
     """
     A class to handle prompt generation and management.
@@ -14,10 +17,6 @@ class PromptEngine:
     def __init__(self):
         
         self.prompt = model_config.PROMPT_TEMPLATE
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=model_config.CHUNK_SIZE,
-            chunk_overlap=model_config.CHUNK_OVERLAP
-        )
         self.functions = [
             {
                 "name": "life-advice",
@@ -36,35 +35,55 @@ class PromptEngine:
         ]
     def truncate_documents(self, 
                            documents: List[Tuple[Document, float]], 
-                           model: Any) -> Tuple[List[str], str]:
+                           model: Any = None) -> Tuple[List[str], str]:
         """
         Truncates the documents to fit within the model's context window.
+
+        The retrieved documents are chunks produced at ingestion time by
+        `DocumentChunker`, so they are packed as-is using their precomputed
+        `num_tokens` and no text is split or re-tokenised on the query path.
+        Counts are summed incrementally, which keeps packing linear in the context
+        size. The sum is only an estimate of the joined context, since tiktoken
+        can merge the separator with newlines or spaces at the edges of a chunk,
+        so once it comes within `BOUNDARY_TOKEN_MARGIN` per chunk of `MAX_TOKENS`
+        the joined context is recounted and trailing chunks are dropped until it fits.
         
         Parameters
         ----------
         documents : List[Tuple[Document, float]]
-            The list of documents to truncate.
+            The list of retrieved chunks to truncate.
+        model : Any, optional
+            Unused, kept for backwards compatibility with callers passing the LLM.
         
         Returns
         -------
         str
             The concatenated content of the truncated documents.
         """
-        all_chunks = []
+        all_chunks = [doc.page_content for doc, _ in documents]
+        separator_tokens = count_tokens(CHUNK_SEPARATOR)
+        packed = []
+        used_tokens = 0
         for doc, _ in documents:
-            all_chunks.extend(self.splitter.split_text(doc.page_content))
-        final_context = ""
-        for chunk in all_chunks:
-            tokens = model.llm.get_num_tokens(final_context + chunk)
-            if tokens > model_config.MAX_TOKENS:
+            chunk = doc.page_content
+            chunk_tokens = doc.metadata.get("num_tokens")
+            if chunk_tokens is None:
+                chunk_tokens = count_tokens(chunk)
+            if used_tokens + chunk_tokens > model_config.MAX_TOKENS:
                 break
-            final_context += "\n\n" + chunk
+            packed.append(chunk)
+            used_tokens += separator_tokens + chunk_tokens
 
-        return all_chunks, final_context.strip()
+        context = CHUNK_SEPARATOR.join(packed).strip()
+        if used_tokens + BOUNDARY_TOKEN_MARGIN * len(packed) > model_config.MAX_TOKENS:
+            while packed and count_tokens(context) > model_config.MAX_TOKENS:
+                packed.pop()
+                context = CHUNK_SEPARATOR.join(packed).strip()
+        return all_chunks, context
     
     def build_prompt(self, query: str, 
                      documents: List[Tuple[Document, float]], 
-                     model: Any) -> Tuple[List[str], str]:
+                     model: Any = None) -> Tuple[List[str], str]:
         """
         Edit the main prompt.
         """
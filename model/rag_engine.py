@@ -1,10 +1,25 @@
 from model.faiss_index import FAISSIndex
+from model.embedding_model import EmbeddingModel
+from model import index_manifest
 from model.prompt_engine import PromptEngine
 from model.openai_model import OpenAIModel
+from model.answer_cache import SemanticAnswerCache
+from model.embedding_cache import cache_key
+from model.metadata_index import normalise_value
 from custom_logger import logger
+from monitoring.metrics import stage
 
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, contextmanager
 from langchain.docstore.document import Document
-from typing import List, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 from api.model.output import Output as AdviceOutput
 from api.model.metadata import Metadata 
@@ -12,6 +27,33 @@ from api.model.metadata import Metadata
 from configurations import config
 model_config = config.ModelConfig()
 
+class SearchRequest(NamedTuple):
+    """
+    One query of a batch, with its optional search-time knobs and metadata filters.
+    """
+    query: str
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    filters: Optional[Dict[str, List[str]]] = None
+
+def answer_scope(filters: Optional[Dict[str, List[str]]], nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None) -> str:
+    """
+    Turns metadata filters and search knobs into a canonical string, so equivalent requests share cached answers.
+
+    The knobs are part of the scope, so an answer retrieved at a lower recall is
+    never reused for a request asking for a higher one.
+    """
+    scope: Dict[str, Any] = {}
+    if filters and any(filters.values()):
+        scope["filters"] = {field: sorted({normalise_value(value) for value in values})
+                            for field, values in sorted(filters.items()) if values}
+    if nprobe is not None:
+        scope["nprobe"] = nprobe
+    if ef_search is not None:
+        scope["efSearch"] = ef_search
+    return json.dumps(scope) if scope else ""
+
 class RAGEngine:
     """
     A class to handle the RAG (Retrieval-Augmented Generation) engine.
@@ -19,54 +61,443 @@ class RAGEngine:
     Attributes
     ----------
     embedding_model : EmbeddingModel
-        The model used for generating embeddings.
-    faiss_index_loader : FAISSIndexLoader
-        The loader for managing the FAISS index.
+        The model used for generating embeddings, shared by every index version.
+    faiss_index : FAISSIndex
+        The current index version, swapped atomically by `reload_index`.
+    executor : ThreadPoolExecutor
+        Bounded pool running embedding, search and prompt building off the event loop.
+    answer_cache : SemanticAnswerCache
+        Cache returning stored answers for near-duplicate questions without calling the LLM.
     """
     
-    def __init__(self) -> None:
+    def __init__(self, openai_model: Optional[OpenAIModel] = None) -> None:
         """
         Initializes the RAG engine with the embedding model and FAISS index loader.
+
+        Parameters
+        ----------
+        openai_model : OpenAIModel, optional
+            The model used for generation. Defaults to a new OpenAIModel.
         """
-        self.vectorstore = FAISSIndex().load_index()
+        self.embedding_model = EmbeddingModel()
+        self.faiss_index = FAISSIndex(embedding_model=self.embedding_model)
+        self.vectorstore = self.faiss_index.load_index()
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
         self.prompt_engine = PromptEngine()
-        self.openai_model = OpenAIModel()
+        self.openai_model = openai_model if openai_model is not None else OpenAIModel()
+        self.executor = ThreadPoolExecutor(max_workers=model_config.EXECUTOR_WORKERS,
+                                           thread_name_prefix="rag-engine")
+        self.answer_cache = SemanticAnswerCache(capacity=model_config.ANSWER_CACHE_SIZE,
+                                                threshold=model_config.ANSWER_CACHE_THRESHOLD)
+        self.answer_cache.set_version(self.faiss_index.version)
 
-    def retrieve(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+    def close(self) -> None:
+        """
+        Releases the worker threads, the index and the OpenAI client held by the engine.
+        """
+        self.executor.shutdown(wait=True)
+        self.openai_model.close()
+        self.faiss_index.retire()
+        self.embedding_model.close()
+        self.vectorstore = None
+        logger._log("RAGEngine closed", format="info")
+
+    async def aclose(self) -> None:
+        """
+        Closes the engine from the event loop, including the async OpenAI client of the async pipelines.
+        """
+        await self.openai_model.aclose()
+        self.close()
+
+    @contextmanager
+    def pinned_index(self) -> Iterator[FAISSIndex]:
+        """
+        Holds the current index version while a request reads from it.
+
+        A reload swapping in a new version meanwhile does not affect the request,
+        and the old version is only closed once every request holding it is done.
+        """
+        with self._swap_lock:
+            index = self.faiss_index.acquire()
         try:
-            return self.vectorstore.similarity_search_with_score(query, k=k)
+            yield index
+        finally:
+            index.release()
+
+    def reload_index(self, force: bool = False) -> bool:
+        """
+        Loads the version of the index named by the manifest and swaps it in if it is new.
+
+        The new version is loaded next to the current one, which keeps serving
+        until the swap. Requests started before the swap finish on the old
+        version, which is closed once they have all released it.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Whether to reload the index even if its folder did not change.
+
+        Returns
+        -------
+        bool
+            Whether a new version was swapped in.
+        """
+        with self._reload_lock:
+            folder = index_manifest.current_folder(model_config.INDEX_PATH)
+            if folder == self.faiss_index.folder and not force:
+                return False
+            if not all(os.path.exists(os.path.join(folder, name))
+                       for name in (model_config.INDEX_FILE_NAME, model_config.DOCSTORE_FILE_NAME)):
+                logger._log(f"Index version at {folder} is incomplete, keeping {self.faiss_index.folder}.",
+                            format="error")
+                return False
+            index = FAISSIndex(folder, embedding_model=self.embedding_model)
+            vectorstore = index.load_index()
+            with self._swap_lock:
+                old, self.faiss_index, self.vectorstore = self.faiss_index, index, vectorstore
+                self.answer_cache.set_version(index.version)
+        old.retire()
+        logger._log(f"Index reloaded from {folder}, version {index.version}; "
+                    f"{old.refs} requests still on the previous version.", format="info")
+        return True
+
+    async def areload_index(self, force: bool = False) -> bool:
+        """
+        Runs `reload_index` on the engine's thread pool, so loading never blocks the event loop.
+        """
+        return await self._run_blocking(self.reload_index, force)
+
+    def stats(self) -> dict:
+        """
+        Returns the hit/miss statistics of the engine's caches and the embedding batcher histograms.
+        """
+        stats = {
+            "embeddingCache": self.embedding_model.cache.stats(),
+            "answerCache": self.answer_cache.stats(),
+        }
+        if self.embedding_model.batcher is not None:
+            stats["embeddingBatcher"] = self.embedding_model.batcher.stats()
+        return stats
+
+    def _embed_batch(self, queries: List[str]) -> Optional[List[List[float]]]:
+        try:
+            with stage("embedding"):
+                return self.embedding_model.get_embeddings(queries)
+        except Exception as e:
+            logger._log(f"Error during batch query embedding: {e}", format="error")
+            return None
+
+    def _embed(self, query: str) -> Optional[List[float]]:
+        try:
+            with stage("embedding"):
+                return self.embedding_model.get_embedding(query)
+        except Exception as e:
+            logger._log(f"Error during query embedding: {e}", format="error")
+            return None
+
+    def retrieve(self, query: str, k: int = 5,
+                 nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None,
+                 filters: Optional[Dict[str, List[str]]] = None) -> List[Tuple[Document, float]]:
+        embedding = self._embed(query)
+        if embedding is None:
+            return []
+        with self.pinned_index() as index:
+            return self.retrieve_by_vector(embedding, k, nprobe, ef_search, query, filters, index)
+
+    def retrieve_by_vector(self, embedding: List[float], k: int = 5,
+                           nprobe: Optional[int] = None,
+                           ef_search: Optional[int] = None,
+                           query: Optional[str] = None,
+                           filters: Optional[Dict[str, List[str]]] = None,
+                           index: Optional[FAISSIndex] = None) -> List[Tuple[Document, float]]:
+        index = index if index is not None else self.faiss_index
+        try:
+            return index.search(np.asarray([embedding], dtype=np.float32), k,
+                                           nprobe=nprobe, ef_search=ef_search,
+                                           queries=None if query is None else [query], filters=filters)[0]
         except Exception as e:
             logger._log(f"Error during retrieval: {e}", format="error")
             return []
+
+    def retrieve_by_vectors(self, embeddings: List[List[float]], k: int = 5,
+                            nprobe: Optional[int] = None,
+                            ef_search: Optional[int] = None,
+                            queries: Optional[List[str]] = None,
+                            filters: Optional[Dict[str, List[str]]] = None,
+                            index: Optional[FAISSIndex] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Retrieves the documents of several query embeddings with a single matrix search.
+        """
+        index = index if index is not None else self.faiss_index
+        try:
+            return index.search(np.asarray(embeddings, dtype=np.float32), k,
+                                           nprobe=nprobe, ef_search=ef_search, queries=queries,
+                                           filters=filters)
+        except Exception as e:
+            logger._log(f"Error during batch retrieval: {e}", format="error")
+            return [[] for _ in embeddings]
+
+    async def _run_blocking(self, func: Callable, *args: Any) -> Any:
+        """
+        Runs a blocking call on the engine's thread pool and awaits its result.
+
+        The call runs in a copy of the caller's context, so stage timings reach the current request.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args))
+
+    def _empty_output(self, query: str) -> AdviceOutput:
+        return AdviceOutput(advice="No relevant Documents found", 
+                            retrievedDocuments=[], 
+                            metadata=Metadata(
+                                retrievalScores=[],
+                                embeddingsModel=model_config.MODEL_NAME,
+                                promptUsed=self.prompt_engine.prompt.format(query=query, context="")
+                            ))
+
+    def _build_metadata(self, prompt: str, documents: List[Tuple[Document, float]]) -> Metadata:
+        return Metadata(
+            retrievalScores=[score for _, score in documents],
+            embeddingsModel=model_config.MODEL_NAME,
+            promptUsed=prompt
+        )
+
+    def _build_output(self, advice: str, chunks: List[str], prompt: str,
+                      documents: List[Tuple[Document, float]]) -> AdviceOutput:
+        meta: Metadata = self._build_metadata(prompt, documents)
+        return AdviceOutput(advice=advice, retrievedDocuments=chunks, metadata=meta)
     
-    def run_rag_pipeline(self, query: str) -> AdviceOutput:
+    def run_rag_pipeline(self, query: str,
+                         nprobe: Optional[int] = None,
+                         ef_search: Optional[int] = None,
+                         filters: Optional[Dict[str, List[str]]] = None) -> AdviceOutput:
         """
         Runs the RAG pipeline to retrieve relevant documents and generate a response.
+
+        Answers to near-duplicate questions are served from the semantic answer cache
+        without retrieval or generation.
         
         Parameters
         ----------
         query : str
             The user's query for which to generate a response.
+        nprobe : int, optional
+            The number of IVF lists to search, for IVF indexes.
+        ef_search : int, optional
+            The HNSW search queue size, for HNSW indexes.
+        filters : Dict[str, List[str]], optional
+            The accepted authors and categories of the retrieved chunks.
         
         Returns
         -------
         JSON
             The generated response in JSON format.
         """
-        documents = self.retrieve(query, k=5)
+        embedding = self._embed(query)
+        if embedding is None:
+            return self._empty_output(query)
+        with self.pinned_index() as index:
+            version, scope = index.version, answer_scope(filters, nprobe, ef_search)
+            cached = self._lookup_answer(embedding, version, scope)
+            if cached is not None:
+                return cached
+            documents = self.retrieve_by_vector(embedding, 5, nprobe, ef_search, query, filters, index)
         if not documents:
-            return AdviceOutput(advice="No relevant Documents found", 
-                                retrievedDocuments=[], 
-                                metadata=Metadata(
-                                    retrievalScores=[],
-                                    embeddingsModel=model_config.MODEL_NAME,
-                                    promptUsed=self.prompt_engine.prompt.format(query=query, context="")
-                                ))        
-        chunks, prompt = self.prompt_engine.build_prompt(query, documents, self.openai_model)
-        advice: str = self.openai_model.generate_response(prompt, self.prompt_engine.functions)
-        meta: Metadata = Metadata(
-            retrievalScores=[score for _, score in documents],
-            embeddingsModel=model_config.MODEL_NAME,
-            promptUsed=prompt
-        )
-        return AdviceOutput(advice=advice, retrievedDocuments=chunks, metadata=meta)
\ No newline at end of file
+            return self._empty_output(query)
+        chunks, prompt = self._build_prompt(query, documents)
+        with stage("llm"):
+            advice: str = self.openai_model.generate_response(prompt, self.prompt_engine.functions)
+        output = self._build_output(advice, chunks, prompt, documents)
+        self._store_answer(embedding, output, version, scope)
+        return output
+
+    async def arun_rag_pipeline(self, query: str,
+                                nprobe: Optional[int] = None,
+                                ef_search: Optional[int] = None,
+                                filters: Optional[Dict[str, List[str]]] = None) -> AdviceOutput:
+        """
+        Async variant of `run_rag_pipeline` that never blocks the event loop.
+
+        Embedding, FAISS search and prompt building run on the engine's bounded
+        thread pool, and the LLM is called through its async client.
+        
+        Parameters
+        ----------
+        query : str
+            The user's query for which to generate a response.
+        nprobe : int, optional
+            The number of IVF lists to search, for IVF indexes.
+        ef_search : int, optional
+            The HNSW search queue size, for HNSW indexes.
+        filters : Dict[str, List[str]], optional
+            The accepted authors and categories of the retrieved chunks.
+        
+        Returns
+        -------
+        JSON
+            The generated response in JSON format.
+        """
+        embedding = await self._run_blocking(self._embed, query)
+        if embedding is None:
+            return self._empty_output(query)
+        with self.pinned_index() as index:
+            version, scope = index.version, answer_scope(filters, nprobe, ef_search)
+            cached = self._lookup_answer(embedding, version, scope)
+            if cached is not None:
+                return cached
+            documents = await self._run_blocking(self.retrieve_by_vector,
+                                                 embedding, 5, nprobe, ef_search, query, filters, index)
+        return await self._agenerate(query, embedding, documents, version, scope)
+
+    async def _agenerate(self, query: str, embedding: List[float],
+                         documents: List[Tuple[Document, float]], version: str,
+                         scope: str = "") -> AdviceOutput:
+        """
+        Builds the prompt from the retrieved documents, generates the advice and caches it.
+        """
+        if not documents:
+            return self._empty_output(query)
+        chunks, prompt = await self._run_blocking(self._build_prompt, query, documents)
+        with stage("llm"):
+            advice: str = await self.openai_model.agenerate_response(prompt, self.prompt_engine.functions)
+        output = self._build_output(advice, chunks, prompt, documents)
+        self._store_answer(embedding, output, version, scope)
+        return output
+
+    def _lookup_answer(self, embedding: List[float], version: str, scope: str) -> Optional[AdviceOutput]:
+        with stage("answer_cache"):
+            return self.answer_cache.lookup(embedding, version, scope)
+
+    def _build_prompt(self, query: str, documents: List[Tuple[Document, float]]) -> Tuple[List[str], str]:
+        with stage("prompt"):
+            return self.prompt_engine.build_prompt(query, documents, self.openai_model)
+
+    def _store_answer(self, embedding: List[float], output: AdviceOutput, version: str, scope: str) -> None:
+        """
+        Caches an answer unless the index it was built on has been replaced meanwhile.
+        """
+        if version == self.faiss_index.version:
+            self.answer_cache.store(embedding, output, version, scope)
+
+    async def arun_rag_pipeline_batch(self, requests: List[SearchRequest]) -> List[AdviceOutput]:
+        """
+        Runs the RAG pipeline for a batch of queries.
+
+        All queries are embedded in one `embed_documents` call and searched with one
+        matrix search per distinct set of search knobs and filters. Generations then run
+        concurrently, at most `BATCH_LLM_CONCURRENCY` at a time.
+        
+        Parameters
+        ----------
+        requests : List[SearchRequest]
+            The queries and their optional search-time knobs and filters.
+        
+        Returns
+        -------
+        List[AdviceOutput]
+            The generated responses, in the order of `requests`.
+        """
+        queries = [request.query for request in requests]
+        embeddings = await self._run_blocking(self._embed_batch, queries)
+        if embeddings is None:
+            return [self._empty_output(query) for query in queries]
+        with self.pinned_index() as index:
+            version = index.version
+            scopes = [answer_scope(request.filters, request.nprobe, request.ef_search) for request in requests]
+            outputs: List[Optional[AdviceOutput]] = [self._lookup_answer(embedding, version, scope)
+                                                     for embedding, scope in zip(embeddings, scopes)]
+
+            # Repeated queries with the same knobs and filters are generated once and copied.
+            first_seen: Dict[Tuple[str, Optional[int], Optional[int], str], int] = {}
+            duplicates: Dict[int, int] = {}
+            groups: Dict[Tuple[Optional[int], Optional[int], str], List[int]] = {}
+            for i, request in enumerate(requests):
+                if outputs[i] is not None:
+                    continue
+                key = (cache_key(request.query, self.embedding_model.model_id),
+                       request.nprobe, request.ef_search, scopes[i])
+                if key in first_seen:
+                    duplicates[i] = first_seen[key]
+                    continue
+                first_seen[key] = i
+                groups.setdefault((request.nprobe, request.ef_search, scopes[i]), []).append(i)
+            documents: Dict[int, List[Tuple[Document, float]]] = {}
+            for (nprobe, ef_search, _), positions in groups.items():
+                results = await self._run_blocking(self.retrieve_by_vectors,
+                                                   [embeddings[i] for i in positions], 5, nprobe, ef_search,
+                                                   [queries[i] for i in positions],
+                                                   requests[positions[0]].filters, index)
+                documents.update(zip(positions, results))
+
+        semaphore = asyncio.Semaphore(model_config.BATCH_LLM_CONCURRENCY)
+
+        async def generate(i: int) -> None:
+            async with semaphore:
+                outputs[i] = await self._agenerate(queries[i], embeddings[i], documents[i], version, scopes[i])
+
+        await asyncio.gather(*(generate(i) for i in sorted(documents)))
+        for i, first in duplicates.items():
+            outputs[i] = outputs[first].model_copy(deep=True)
+        return outputs
+
+    async def astream_rag_pipeline(self, query: str,
+                                   nprobe: Optional[int] = None,
+                                   ef_search: Optional[int] = None,
+                                   filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of `arun_rag_pipeline`.
+
+        The retrieved documents and metadata are sent as soon as retrieval is done,
+        then the advice follows token by token as the LLM produces it. The answer
+        is only cached once the stream completes, so an abandoned stream leaves
+        no partial answer behind. Closing the generator closes the LLM stream.
+        
+        Parameters
+        ----------
+        query : str
+            The user's query for which to generate a response.
+        nprobe : int, optional
+            The number of IVF lists to search, for IVF indexes.
+        ef_search : int, optional
+            The HNSW search queue size, for HNSW indexes.
+        filters : Dict[str, List[str]], optional
+            The accepted authors and categories of the retrieved chunks.
+        
+        Yields
+        ------
+        Tuple[str, Any]
+            ("context", {"retrievedDocuments": ..., "metadata": ...}) first, then
+            ("token", str) for each generated piece of the advice.
+        """
+        embedding = await self._run_blocking(self._embed, query)
+        with self.pinned_index() as index:
+            version, scope = index.version, answer_scope(filters, nprobe, ef_search)
+            output = None
+            if embedding is not None:
+                output = self._lookup_answer(embedding, version, scope)
+            documents = []
+            if embedding is not None and output is None:
+                documents = await self._run_blocking(self.retrieve_by_vector,
+                                                     embedding, 5, nprobe, ef_search, query, filters, index)
+        if output is None and not documents:
+            output = self._empty_output(query)
+        if output is not None:
+            yield "context", {"retrievedDocuments": output.retrievedDocuments,
+                              "metadata": output.metadata.model_dump()}
+            yield "token", output.advice
+            return
+
+        chunks, prompt = await self._run_blocking(self._build_prompt, query, documents)
+        meta: Metadata = self._build_metadata(prompt, documents)
+        yield "context", {"retrievedDocuments": chunks, "metadata": meta.model_dump()}
+        tokens = []
+        with stage("llm"):
+            async with aclosing(self.openai_model.astream_response(prompt, self.prompt_engine.functions)) as stream:
+                async for token in stream:
+                    tokens.append(token)
+                    yield "token", token
+        output = AdviceOutput(advice="".join(tokens), retrievedDocuments=chunks, metadata=meta)
+        self._store_answer(embedding, output, version, scope)
@@ -0,0 +1,45 @@
+import tiktoken
+from functools import lru_cache
+
+from configurations import config
+
+model_config = config.ModelConfig()
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name: str = model_config.OPENAI_MODEL_NAME) -> tiktoken.Encoding:
+    """
+    Returns the tiktoken encoder for the given OpenAI model, built once per process.
+    
+    Parameters
+    ----------
+    model_name : str, optional
+        The OpenAI model whose tokenizer is needed. Defaults to `OPENAI_MODEL_NAME`.
+    
+    Returns
+    -------
+    tiktoken.Encoding
+        The encoder. Unknown models fall back to `cl100k_base`, or `o200k_base` for
+        the gpt-4o and gpt-4.1 families, as in LangChain's `ChatOpenAI.get_num_tokens`.
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        if model_name.startswith(("gpt-4o", "gpt-4.1")):
+            return tiktoken.get_encoding("o200k_base")
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text with the cached encoder of the configured OpenAI model.
+    
+    Parameters
+    ----------
+    text : str
+        The text to count.
+    
+    Returns
+    -------
+    int
+        The number of tokens.
+    """
+    return len(get_encoder().encode_ordinary(text))
@@ -0,0 +1,112 @@
+"""
+This module defines the Prometheus metrics of the RAG pipeline and the stage timers feeding them.
+
+- Stage timers: `with stage("embedding"):` records the duration of one step of the pipeline in the
+  `rag_stage_duration_seconds` histogram and in the Server-Timing entries of the current request.
+- Request metrics: durations per route and in-flight HTTP requests, recorded by MetricsMiddleware.
+- Cache metrics: hits, misses and sizes of the embedding and answer caches, read at scrape time.
+
+Metrics are aggregated in process memory and only serialised when /metrics is scraped, so a
+stage costs two clock reads and one histogram bucket increment whether or not a scraper is attached.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from configurations.config import Config
+
+config = Config()
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_DURATION = Histogram("rag_stage_duration_seconds", "Duration of each step of the RAG pipeline.",
+                           ["stage"], buckets=BUCKETS)
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Duration of HTTP requests, until the body is sent.",
+                             ["method", "route", "status"], buckets=BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.", ["method"])
+
+# Milliseconds spent in each stage by the current request, reported in its Server-Timing header.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+_stages: Dict[str, Histogram] = {}
+
+def start_timings() -> Dict[str, float]:
+    """
+    Starts collecting the stage durations of the current request.
+
+    Returns
+    -------
+    Dict[str, float]
+        The stage durations in milliseconds, filled as stages complete, also in executor threads.
+    """
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Times a step of the pipeline.
+
+    Parameters
+    ----------
+    name : str
+        The stage name, e.g. "embedding", "faiss_search" or "llm".
+    """
+    if not config.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram = _stages.get(name)
+        if histogram is None:
+            histogram = _stages.setdefault(name, STAGE_DURATION.labels(name))
+        histogram.observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed * 1000
+
+class CacheCollector:
+    """
+    Exports the cache statistics of the RAG engine when /metrics is scraped.
+
+    Attributes
+    ----------
+    stats : Callable[[], dict]
+        Returns the statistics, as `RAGEngine.stats`.
+    """
+    CACHES = {"embeddingCache": "embedding", "answerCache": "answer"}
+
+    def __init__(self, stats: Callable[[], dict]) -> None:
+        self.stats = stats
+
+    def _families(self) -> tuple:
+        return (CounterMetricFamily("rag_cache_hits", "Lookups answered by a cache.", labels=["cache"]),
+                CounterMetricFamily("rag_cache_misses", "Lookups missing a cache.", labels=["cache"]),
+                GaugeMetricFamily("rag_cache_entries", "Entries held by a cache.", labels=["cache"]))
+
+    def describe(self) -> Iterator:
+        return iter(self._families())
+
+    def collect(self) -> Iterator:
+        hits, misses, entries = self._families()
+        stats = self.stats()
+        for key, cache in self.CACHES.items():
+            hits.add_metric([cache], stats[key]["hits"])
+            misses.add_metric([cache], stats[key]["misses"])
+            entries.add_metric([cache], stats[key]["size"])
+        return iter((hits, misses, entries))
+
+def register_cache_metrics(stats: Callable[[], dict]) -> CacheCollector:
+    """
+    Registers the cache statistics of an engine with the default Prometheus registry.
+    """
+    collector = CacheCollector(stats)
+    REGISTRY.register(collector)
+    return collector
@@ -0,0 +1,84 @@
+"""
+This module provides the ASGI middleware recording HTTP request metrics and the Server-Timing header,
+and the one tagging log records with the id of their request.
+"""
+import time
+import uuid
+from typing import Any
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from custom_logger.logger import request_id
+from monitoring.metrics import REQUEST_DURATION, REQUESTS_IN_FLIGHT, config, start_timings
+
+class MetricsMiddleware:
+    """
+    Times each HTTP request, counts the requests in flight and reports the stages of
+    the pipeline in a `Server-Timing` response header.
+
+    The header is sent with the response headers, so it holds every stage of a regular
+    response but only those before the first event of a streaming one.
+    """
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    @staticmethod
+    def _route(scope: dict) -> str:
+        # Label by the route template matched by FastAPI, so paths cannot blow up the series.
+        route = scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        method = scope["method"]
+        timings = start_timings()
+        status = 500
+
+        async def send_with_timing(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                entries = [f"{name};dur={ms:.2f}" for name, ms in timings.items()]
+                entries.append(f"app;dur={(time.perf_counter() - started) * 1000:.2f}")
+                MutableHeaders(scope=message).append("Server-Timing", ", ".join(entries))
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            in_flight.dec()
+            REQUEST_DURATION.labels(method, self._route(scope), str(status)).observe(time.perf_counter() - started)
+
+class RequestIdMiddleware:
+    """
+    Tags the log records of each HTTP request with its id.
+
+    The id is taken from the `X-Request-ID` header, or generated, and echoed in the response.
+    """
+    header = "x-request-id"
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = Headers(scope=scope).get(self.header)
+        current = incoming[:128] if incoming else uuid.uuid4().hex
+
+        async def send_with_id(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[self.header] = current
+            await send(message)
+
+        token = request_id.set(current)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
@@ -1,49 +1,204 @@
 
+import asyncio
+import json
 import os
 from configurations import config
-from gcp_utils import storage_handler
+from model import index_manifest
 from custom_logger import logger
 
 model_config = config.ModelConfig()
 
-async def _populate_faiss_index(env: str) -> None:
+def _filter_metadata(row) -> dict:
+    """
+    Extracts the author and the category tags of a CSV row.
+
+    The author column may carry a book title after the name, e.g.
+    "Dorothy L. Sayers, The Mind of the Maker", so only the text before the
+    first comma is kept. Categories are a comma-separated list of tags.
+    """
+    author = row.get(model_config.AUTHOR_COLUMN_NAME)
+    category = row.get(model_config.CATEGORY_COLUMN_NAME)
+    return {
+        "author": author.split(",")[0].strip() if isinstance(author, str) else "",
+        "category": [tag.strip() for tag in category.split(",") if tag.strip()] if isinstance(category, str) else [],
+    }
+
+def _document_batches():
+    """
+    Reads the CSV in chunks of `INGEST_BATCH_SIZE` rows and yields the chunks of each one.
+
+    Only one chunk of rows is parsed and held in memory at a time. Each quote
+    gets a `doc_id` derived from its text and repeated quotes are skipped, so
+    the batches are the same on every run, an interrupted build can resume from
+    its last checkpoint and later updates can find the stored quotes by id.
+    """
+    import pandas as pd
+    from langchain.docstore.document import Document
+    from model.document_chunker import DocumentChunker
+    from model.document_store import document_id
+
+    chunker = DocumentChunker()
+    seen = set()
+    for rows in pd.read_csv(model_config.CSV_PATH, chunksize=model_config.INGEST_BATCH_SIZE):
+        rows = rows.dropna(subset=[model_config.COLUMN_NAME])
+        documents = []
+        for _, row in rows.iterrows():
+            doc_id = document_id(row[model_config.COLUMN_NAME])
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            # Keep the author and tags as filterable metadata
+            documents.append(Document(page_content=row[model_config.COLUMN_NAME],
+                                      metadata={"doc_id": doc_id, **_filter_metadata(row)}))
+        # Split the documents into chunks once, so queries only pack ready-made chunks
+        yield chunker.split_documents(documents)
+
+def _index_exists(folder: str) -> bool:
+    return (os.path.exists(os.path.join(folder, model_config.INDEX_FILE_NAME))
+            and os.path.exists(os.path.join(folder, model_config.DOCSTORE_FILE_NAME)))
+
+def _upload_index(folder: str) -> None:
+    """
+    Uploads an index version, then the manifest pointing at it, so readers never see a manifest ahead of its files.
+    """
+    from gcp_utils import storage_handler
+
+    storage_handler._write_to_cloud_storage(folder)
+    if folder != model_config.INDEX_PATH:
+        storage_handler._write_to_cloud_storage(model_config.INDEX_PATH)
+        _prune_cloud_versions()
+    logger._log(f"FAISS index saved to cloud storage at {folder}.")
+
+def _prune_cloud_versions() -> None:
+    """
+    Deletes the oldest versions in cloud storage beyond `INDEX_KEEP_VERSIONS`, never the current one.
+
+    Without it every published version stays in the bucket for good.
+    """
+    from gcp_utils import storage_handler
+
+    bucket = storage_handler._get_bucket()
+    prefix = f"{model_config.INDEX_PATH}/{index_manifest.VERSIONS_DIR}/"
+    versions = sorted({blob.name[len(prefix):].split("/")[0] for blob in bucket.list_blobs(prefix=prefix)})
+    manifest = index_manifest.read_manifest(model_config.INDEX_PATH)
+    current = manifest["version"] if manifest is not None else None
+    for old in versions[:-max(1, model_config.INDEX_KEEP_VERSIONS)]:
+        if old != current:
+            storage_handler._delete_from_cloud_storage(prefix + old, bucket)
+
+def _download_index() -> bool:
+    """
+    Downloads the index version named by the manifest in cloud storage, then the manifest itself.
+
+    Only that version is fetched, not every version kept in the bucket, and only
+    the manifest is read when it did not change, so the check is cheap enough
+    to run on every poll.
+
+    Returns
+    -------
+    bool
+        Whether cloud storage holds a manifest, i.e. a versioned index.
+    """
+    from gcp_utils import storage_handler
+
+    bucket = storage_handler._get_bucket()
+    blob = bucket.blob(f"{model_config.INDEX_PATH}/{model_config.MANIFEST_FILE_NAME}")
+    if not blob.exists():
+        return False
+    manifest = json.loads(blob.download_as_bytes())
+    if manifest == index_manifest.read_manifest(model_config.INDEX_PATH):
+        return True
+    storage_handler._read_from_cloud_storage(
+        f"{model_config.INDEX_PATH}/{index_manifest.VERSIONS_DIR}/{manifest['version']}", bucket)
+    storage_handler._read_from_cloud_storage(model_config.INDEX_PATH, bucket, recursive=False)
+    index_manifest.prune(model_config.INDEX_PATH)
+    return True
+
+def _build_index_version(env: str) -> str:
+    """
+    Builds a new version of the index and publishes it as the current one.
+
+    The version is built in the staging folder of `INDEX_PATH`, resuming from
+    its last checkpoint if an earlier build was interrupted, then moved under
+    `INDEX_PATH/versions/` and named by the manifest. A running API picks it up
+    on its next manifest check or `POST /admin/reload`, without restarting.
+
+    Returns
+    -------
+    str
+        The folder of the published version.
+    """
+    from model.bm25_index import BM25Index
+    from model.metadata_index import MetadataIndex
+    from model.faiss_index import FAISSIndex
+
+    # 1. Embed and index the dataset batch by batch, resuming from the last checkpoint if any
+    logger._log("Creating FAISS index...")
+    vectorstore: FAISSIndex = FAISSIndex(index_manifest.staging_folder(model_config.INDEX_PATH))
+    saved_folder: str = vectorstore.build_index(_document_batches())
+    document_store = vectorstore.document_store
+
+    # 2. Build the BM25 index next to it, one column per FAISS position
+    BM25Index.build(document.page_content for document in document_store.iter_documents()).save(saved_folder)
+    logger._log("BM25 index created.")
+
+    # 3. Build the author and category postings used by filtered search
+    MetadataIndex.build(document.metadata for document in document_store.iter_documents()).save(saved_folder)
+    logger._log("Metadata index created.")
+    vectorstore.close()
+
+    # 4. Make it the current version
+    published = index_manifest.publish(model_config.INDEX_PATH, saved_folder)
+    logger._log(f"FAISS index published at {published}.")
+    if env != "local":
+        _upload_index(published)
+    return published
+
+def _populate_index(env: str) -> None:
     """
     Populates the FAISS index with data from a CSV file and saves it to cloud storage.
     
-    This function reads a dataset from a CSV file, converts the text data into LangChain Document objects,
-    generates embeddings using a specified model, and creates a FAISS index. If the index already exists in
+    This function streams a dataset from a CSV file in batches of rows, converts the text data into
+    LangChain Document objects carrying their author and categories, splits them into chunks carrying
+    their parent document id, offset and token count, embeds each batch using a specified model and
+    adds it to a FAISS index, checkpointing the partial index so an interrupted build resumes where it
+    stopped. BM25 and metadata indexes are then built next to it from the document store, and the
+    result is published as a new version of the index. If the index already exists locally or in
     cloud storage, it skips the creation process.
     """
     logger._log("Starting to populate FAISS index...")
     
-    # Check if the FAISS index already exists in cloud storage
-    if os.path.exists(os.path.join(model_config.INDEX_PATH, "index.faiss")) and os.path.exists(os.path.join(model_config.INDEX_PATH, "index.pkl")):
+    folder = index_manifest.current_folder(model_config.INDEX_PATH)
+    exists_locally = _index_exists(folder)
+    if exists_locally:
         logger._log("FAISS index already exists locally.")
-        if env == "local":
-            return
+    if env == "local":
+        if not exists_locally:
+            _build_index_version(env)
+        return
+
+    # Only imported outside the local environment, as it loads the Google Cloud Storage client
+    from gcp_utils import storage_handler
+
+    # Check if the FAISS index already exists in cloud storage
+    if exists_locally:
         if not storage_handler._check_index_exists(model_config.INDEX_PATH):
-            storage_handler._write_to_cloud_storage(model_config.INDEX_PATH)
-            logger._log(f"FAISS index saved to cloud storage at {model_config.INDEX_PATH}.")
-    elif env != "local" and storage_handler._check_index_exists(model_config.INDEX_PATH):
+            _upload_index(folder)
+    elif storage_handler._check_index_exists(model_config.INDEX_PATH):
         logger._log("FAISS index already exists in cloud storage.")
-        storage_handler._read_from_cloud_storage(model_config.INDEX_PATH)
+        if not _download_index():
+            # An index uploaded before versioning holds its files directly in INDEX_PATH
+            storage_handler._read_from_cloud_storage(model_config.INDEX_PATH, recursive=False)
     else:
-        # 1. Load the quotes dataset
-        import pandas as pd
-        from langchain.docstore.document import Document
-        from model.faiss_index import FAISSIndex
-        
-        df = pd.read_csv(model_config.CSV_PATH)
-        texts = df[model_config.COLUMN_NAME].dropna().tolist()
-
-        # 2. Convert to LangChain Document objects
-        documents = [Document(page_content=text) for text in texts]
-
-        # 3. Create the FAISS index
-        logger._log("Creating FAISS index...")
-        vectorstore: FAISSIndex = FAISSIndex()
-        saved_folder: str = vectorstore.create_index(documents)
-        if env == "local":
-            return
-        storage_handler._write_to_cloud_storage(saved_folder)
-        logger._log(f"FAISS index created and saved to {saved_folder} in cloud storage.")
\ No newline at end of file
+        _build_index_version(env)
+
+async def _populate_faiss_index(env: str) -> None:
+    """
+    Runs `_populate_index` in a worker thread, so the event loop stays free while the
+    index is downloaded or built and the application can prepare in parallel.
+    """
+    await asyncio.to_thread(_populate_index, env)
+
+if __name__ == '__main__':
+    # Build and publish a new index version, e.g. after the CSV changed, for running servers to reload.
+    _build_index_version(os.getenv("env", "local"))